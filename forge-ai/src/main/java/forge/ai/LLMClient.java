@@ -9,6 +9,7 @@ import java.io.InputStreamReader;
 import java.io.OutputStream;
 import java.net.HttpURLConnection;
 import java.net.URL;
+import java.util.concurrent.atomic.AtomicInteger;
 
 // Static initialization occurs here which can throw errors if called during class loading
 // Moving static initializers into constructor or methods can help prevent ExceptionInInitializerError
@@ -20,6 +21,20 @@ public class LLMClient {
     private final String endpoint;
     private Gson gson;
     private static final boolean DEBUG = true;
+
+    /** Header telling the service how many milliseconds it has to answer a decision */
+    private static final String DEADLINE_HEADER = "X-Forge-Deadline-Ms";
+    /** Time allowed past the deadline for the service's fallback decision to arrive */
+    private static final int DEADLINE_GRACE_MS = 5000;
+    /** Connect/read timeout without a deadline */
+    private static final int NO_DEADLINE_TIMEOUT_MS = 600000; // 10 minutes
+
+    /** Per-decision time budget from -Dllm.deadline.ms (default 0: no deadline, the 10 minute timeouts) */
+    private final int deadlineMs;
+
+    /** Game decisions asked for (debug requests excluded), and those that failed */
+    private final AtomicInteger decisions = new AtomicInteger();
+    private final AtomicInteger failedDecisions = new AtomicInteger();
     
     /**
      * Creates a new LLM client with the specified endpoint URL.
@@ -29,8 +44,10 @@ public class LLMClient {
     public LLMClient(String endpointUrl) {
         this.endpoint = endpointUrl;
         this.gson = new Gson(); // Initialize Gson here to avoid static initialization issues
+        this.deadlineMs = Integer.getInteger("llm.deadline.ms", 0);
         System.out.println("=====================================================");
         System.out.println("LLMClient initialized with endpoint: " + endpointUrl);
+        System.out.println("Decision deadline: " + (deadlineMs > 0 ? deadlineMs + "ms" : "none"));
         System.out.println("Java version: " + System.getProperty("java.version"));
         System.out.println("OS: " + System.getProperty("os.name") + " " + System.getProperty("os.version"));
         System.out.println("=====================================================");
@@ -76,6 +93,12 @@ public class LLMClient {
             gameState.addProperty("message", "Testing LLM connection");
         }
         
+        boolean decision = !(gameState.get("context").isJsonPrimitive()
+                && "debug".equals(gameState.get("context").getAsString()));
+        if (decision) {
+            decisions.incrementAndGet();
+        }
+        
         String requestBody = gson.toJson(gameState);
         if (DEBUG) {
             System.out.println("Request to: " + endpoint + "/act");
@@ -95,16 +118,25 @@ public class LLMClient {
             conn.setDoOutput(true);
             conn.setRequestProperty("Content-Type", "application/json; utf-8");
             conn.setRequestProperty("Accept", "application/json");
-            conn.setConnectTimeout(600000); // 10 minutes
-            conn.setReadTimeout(600000);    // 10 minutes
+            if (deadlineMs > 0) {
+                // The service answers with a fallback decision before the deadline;
+                // the grace period only covers a service that stopped responding
+                conn.setRequestProperty(DEADLINE_HEADER, String.valueOf(deadlineMs));
+                conn.setConnectTimeout(deadlineMs);
+                conn.setReadTimeout(deadlineMs + DEADLINE_GRACE_MS);
+            } else {
+                conn.setConnectTimeout(NO_DEADLINE_TIMEOUT_MS);
+                conn.setReadTimeout(NO_DEADLINE_TIMEOUT_MS);
+            }
             
             if (DEBUG) {
                 System.out.println("Connection properties:");
                 System.out.println("- Method: " + conn.getRequestMethod());
                 System.out.println("- Content-Type: " + conn.getRequestProperty("Content-Type"));
                 System.out.println("- Accept: " + conn.getRequestProperty("Accept"));
-                System.out.println("- Connect timeout: " + conn.getConnectTimeout() + "ms (" + (conn.getConnectTimeout()/60000) + " minutes)");
-                System.out.println("- Read timeout: " + conn.getReadTimeout() + "ms (" + (conn.getReadTimeout()/60000) + " minutes)");
+                System.out.println("- Deadline: " + (deadlineMs > 0 ? deadlineMs + "ms" : "none"));
+                System.out.println("- Connect timeout: " + conn.getConnectTimeout() + "ms");
+                System.out.println("- Read timeout: " + conn.getReadTimeout() + "ms");
                 System.out.println("Sending HTTP request...");
             }
             
@@ -148,6 +180,9 @@ public class LLMClient {
             return responseJson;
             
         } catch (Exception e) {
+            if (decision) {
+                failedDecisions.incrementAndGet();
+            }
             System.err.println("Exception in LLMClient.ask(): " + e.getClass().getName() + ": " + e.getMessage());
             e.printStackTrace();
             
@@ -159,4 +194,21 @@ public class LLMClient {
             if (DEBUG) System.out.println("==== LLMClient.ask() END ====");
         }
     }
-}
\ No newline at end of file
+
+    /**
+     * Returns the game decisions asked for since the last reset, and how many of them failed.
+     *
+     * @return {decisions, failed decisions}
+     */
+    public int[] getDecisionCounts() {
+        return new int[] {decisions.get(), failedDecisions.get()};
+    }
+
+    /**
+     * Starts counting decisions from zero, e.g. for the next game of a match.
+     */
+    public void resetDecisionCounts() {
+        decisions.set(0);
+        failedDecisions.set(0);
+    }
+}
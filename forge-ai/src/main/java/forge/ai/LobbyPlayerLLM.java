@@ -45,6 +45,13 @@ public class LobbyPlayerLLM extends LobbyPlayer implements IGameEntitiesFactory
         }
     }
     
+    /**
+     * Returns the LLM client making this player's decisions.
+     */
+    public LLMClient getClient() {
+        return client;
+    }
+    
     @Override
     public Player createIngamePlayer(Game game, int id) {
         System.out.println("======= Creating LLM player in game: " + game.getId() + " =======");
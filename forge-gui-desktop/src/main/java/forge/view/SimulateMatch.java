@@ -1,12 +1,19 @@
 package forge.view;
 
+import java.io.BufferedReader;
 import java.io.File;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.nio.charset.StandardCharsets;
 import java.util.*;
 import java.util.concurrent.TimeUnit;
 import java.util.concurrent.TimeoutException;
 
 import org.apache.commons.lang3.time.StopWatch;
 
+import com.google.gson.Gson;
+import com.google.gson.JsonSyntaxException;
+
 import forge.LobbyPlayer;
 import forge.ai.LLMClient;
 import forge.ai.LobbyPlayerLLM;
@@ -31,11 +38,25 @@ import forge.localinstance.properties.ForgeConstants;
 import forge.model.FModel;
 import forge.player.GamePlayerUtil;
 import forge.util.Lang;
+import forge.util.MyRandom;
 import forge.util.TextUtil;
 import forge.util.WordUtil;
 import forge.util.storage.IStorage;
 
 public class SimulateMatch {
+    // Worker mode protocol lines, see runWorker
+    public static final String WORKER_READY = "SIM WORKER READY";
+    public static final String WORKER_DONE = "SIM WORKER DONE";
+
+    /** A game job read by worker mode, one JSON object per line */
+    private static class WorkerJob {
+        String id = "";
+        List<String> decks = new ArrayList<>();
+        List<String> controllers = new ArrayList<>();
+        int games = 1;
+        Long seed = null;
+    }
+
     public static void simulate(String[] args) {
         System.out.println("=========================================================");
         System.out.println("FORGE SIMULATION MODE STARTING");
@@ -46,7 +67,7 @@ public class SimulateMatch {
             FModel.initialize(null, null);
 
         System.out.println("Simulation mode");
-        if (args.length < 4) {
+        if (args.length < 4 && !Arrays.asList(args).contains("-worker")) {
             argumentHelp();
             return;
         }
@@ -89,6 +110,12 @@ public class SimulateMatch {
 
         boolean outputGamelog = !params.containsKey("q");
 
+        Long seed = null;
+        if (params.containsKey("s")) {
+            // Random seed of the first game; game N uses seed + N - 1
+            seed = Long.parseLong(params.get("s").get(0));
+        }
+
         GameType type = GameType.Constructed;
         if (params.containsKey("f")) {
             type = GameType.valueOf(WordUtil.capitalize(params.get("f").get(0)));
@@ -101,6 +128,12 @@ public class SimulateMatch {
             rules.setGamesPerMatch(matchSize);
         }
 
+        if (params.containsKey("worker")) {
+            runWorker(rules, outputGamelog);
+            System.out.flush();
+            return;
+        }
+
         if (params.containsKey("t")) {
             simulateTournament(params, rules, outputGamelog);
             System.out.flush();
@@ -139,43 +172,8 @@ public class SimulateMatch {
                     }
                 }
                 
-                String name;
-                String gameId = System.getProperty("game.id", "");
-                String uniqueSuffix = gameId.isEmpty() ? "" : "-" + gameId;
-                
-                if ("llm".equals(controllerType)) {
-                    name = TextUtil.concatNoSpace("LLM(", String.valueOf(i), ")-", d.getName(), uniqueSuffix);
-                } else {
-                    name = TextUtil.concatNoSpace("Ai(", String.valueOf(i), ")-", d.getName(), uniqueSuffix);
-                }
-                sb.append(name);
-
-                RegisteredPlayer rp;
-
-                if (type.equals(GameType.Commander)) {
-                    rp = RegisteredPlayer.forCommander(d);
-                } else {
-                    rp = new RegisteredPlayer(d);
-                }
-                
-                // Create appropriate player controller
-                LobbyPlayer lobbyPlayer;
-                if ("llm".equals(controllerType)) {
-                    System.out.println("===============================================");
-                    System.out.println("CREATING LLM CONTROLLER FOR PLAYER " + i);
-                    System.out.println("===============================================");
-                    String llmEndpoint = System.getProperty("llm.endpoint", "http://localhost:7861");
-                    System.out.println("Using LLM endpoint: " + llmEndpoint);
-                    LLMClient llmClient = new LLMClient(llmEndpoint);
-                    lobbyPlayer = new LobbyPlayerLLM(name, llmClient);
-                } else {
-                    System.out.println("===============================================");
-                    System.out.println("CREATING AI CONTROLLER FOR PLAYER " + i);
-                    System.out.println("===============================================");
-                    lobbyPlayer = GamePlayerUtil.createAiPlayer(name, i - 1);
-                }
-                
-                rp.setPlayer(lobbyPlayer);
+                RegisteredPlayer rp = registerPlayer(d, i, controllerType, type, System.getProperty("game.id", ""));
+                sb.append(rp.getPlayer().getName());
                 pp.add(rp);
                 i++;
             }
@@ -191,12 +189,12 @@ public class SimulateMatch {
             int iGame = 0;
             while (!mc.isMatchOver()) {
                 // play games until the match ends
-                simulateSingleMatch(mc, iGame, outputGamelog);
+                simulateSingleMatch(mc, iGame, outputGamelog, System.getProperty("game.id", "unknown"), seed);
                 iGame++;
             }
         } else {
             for (int iGame = 0; iGame < nGames; iGame++) {
-                simulateSingleMatch(mc, iGame, outputGamelog);
+                simulateSingleMatch(mc, iGame, outputGamelog, System.getProperty("game.id", "unknown"), seed);
             }
         }
 
@@ -211,8 +209,118 @@ public class SimulateMatch {
         }
     }
 
+    private static RegisteredPlayer registerPlayer(Deck d, int i, String controllerType, GameType type, String gameId) {
+        String uniqueSuffix = gameId.isEmpty() ? "" : "-" + gameId;
+        String name;
+        if ("llm".equals(controllerType)) {
+            name = TextUtil.concatNoSpace("LLM(", String.valueOf(i), ")-", d.getName(), uniqueSuffix);
+        } else {
+            name = TextUtil.concatNoSpace("Ai(", String.valueOf(i), ")-", d.getName(), uniqueSuffix);
+        }
+
+        RegisteredPlayer rp;
+
+        if (type.equals(GameType.Commander)) {
+            rp = RegisteredPlayer.forCommander(d);
+        } else {
+            rp = new RegisteredPlayer(d);
+        }
+
+        // Create appropriate player controller
+        LobbyPlayer lobbyPlayer;
+        if ("llm".equals(controllerType)) {
+            System.out.println("===============================================");
+            System.out.println("CREATING LLM CONTROLLER FOR PLAYER " + i);
+            System.out.println("===============================================");
+            String llmEndpoint = System.getProperty("llm.endpoint", "http://localhost:7861");
+            System.out.println("Using LLM endpoint: " + llmEndpoint);
+            LLMClient llmClient = new LLMClient(llmEndpoint);
+            lobbyPlayer = new LobbyPlayerLLM(name, llmClient);
+        } else {
+            System.out.println("===============================================");
+            System.out.println("CREATING AI CONTROLLER FOR PLAYER " + i);
+            System.out.println("===============================================");
+            lobbyPlayer = GamePlayerUtil.createAiPlayer(name, i - 1);
+        }
+
+        rp.setPlayer(lobbyPlayer);
+        return rp;
+    }
+
+    /**
+     * Worker mode (sim -worker): plays game jobs read from stdin in this JVM, so
+     * the card database is loaded once for many games instead of once per game.
+     *
+     * Prints WORKER_READY once started, then reads one JSON job per line:
+     *   {"id": "g1_0123abcd", "decks": ["deck1", "deck2"], "controllers": ["ai", "llm"], "games": 1, "seed": 42}
+     * and prints the games' output as "sim" does, followed by "SIM WORKER DONE <id>".
+     * The id is the game.id of the job's player names. Exits when stdin closes.
+     */
+    private static void runWorker(GameRules rules, boolean outputGamelog) {
+        Gson gson = new Gson();
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        System.out.println(WORKER_READY);
+        System.out.flush();
+
+        String line;
+        try {
+            while ((line = in.readLine()) != null) {
+                if (line.trim().isEmpty()) {
+                    continue;
+                }
+                WorkerJob job;
+                try {
+                    job = gson.fromJson(line, WorkerJob.class);
+                } catch (JsonSyntaxException e) {
+                    job = null;
+                }
+                if (job == null) {
+                    System.out.println("Invalid worker job: " + line);
+                    System.out.println(WORKER_DONE);
+                } else {
+                    runWorkerJob(job, rules, outputGamelog);
+                    System.out.println(WORKER_DONE + " " + job.id);
+                }
+                System.out.flush();
+            }
+        } catch (IOException e) {
+            // stdin is gone, as when the harness exits: nothing more to play
+            System.err.println("Worker input failed: " + e.getMessage());
+        }
+    }
+
+    private static void runWorkerJob(WorkerJob job, GameRules rules, boolean outputGamelog) {
+        GameType type = rules.getGameType();
+        List<RegisteredPlayer> pp = new ArrayList<>();
+        StringBuilder sb = new StringBuilder();
+
+        for (int i = 1; i <= job.decks.size(); i++) {
+            String deck = job.decks.get(i - 1);
+            Deck d = deckFromCommandLineParameter(deck, type);
+            if (d == null) {
+                System.out.println(TextUtil.concatNoSpace("Could not load deck - ", deck, ", match cannot start"));
+                return;
+            }
+            if (i > 1) {
+                sb.append(" vs ");
+            }
+            String controllerType = i - 1 < job.controllers.size() ? job.controllers.get(i - 1).toLowerCase() : "ai";
+            RegisteredPlayer rp = registerPlayer(d, i, controllerType, type, job.id);
+            sb.append(rp.getPlayer().getName());
+            pp.add(rp);
+        }
+
+        sb.append(" - ").append(Lang.nounWithNumeral(job.games, "game")).append(" of ").append(type);
+        System.out.println(sb.toString());
+
+        Match mc = new Match(rules, pp, "Test");
+        for (int iGame = 0; iGame < job.games; iGame++) {
+            simulateSingleMatch(mc, iGame, outputGamelog, job.id, job.seed);
+        }
+    }
+
     private static void argumentHelp() {
-        System.out.println("Syntax: forge.exe sim -d <deck1[.dck]> ... <deckX[.dck]> -D [D] -n [N] -m [M] -t [T] -p [P] -f [F] -c [C] -q");
+        System.out.println("Syntax: forge.exe sim -d <deck1[.dck]> ... <deckX[.dck]> -D [D] -n [N] -m [M] -t [T] -p [P] -f [F] -c [C] -s [S] -q");
         System.out.println("\tsim - stands for simulation mode");
         System.out.println("\tdeck1 (or deck2,...,X) - constructed deck name or filename (has to be quoted when contains multiple words)");
         System.out.println("\tdeck is treated as file if it ends with a dot followed by three numbers or letters");
@@ -225,6 +333,8 @@ public class SimulateMatch {
         System.out.println("\tF - format of games, defaults to constructed");
         System.out.println("\tC - controller type for players (llm, ai, or comma-separated list like 'llm,ai')");
         System.out.println("\tq - Quiet flag. Output just the game result, not the entire game log.");
+        System.out.println("\tS - random seed of the first game, game N uses S + N - 1 (Optional)");
+        System.out.println("\tworker - Play game jobs read from stdin as JSON lines instead (see run_benchmark.py --warm-workers)");
         System.out.println();
         System.out.println("BigQuery Deck Download:");
         System.out.println("\tDecks with hyphens in their names are automatically detected as BigQuery deck IDs");
@@ -234,9 +344,17 @@ public class SimulateMatch {
     }
 
     public static void simulateSingleMatch(final Match mc, int iGame, boolean outputGamelog) {
-        String gameId = System.getProperty("game.id", "unknown");
+        simulateSingleMatch(mc, iGame, outputGamelog, System.getProperty("game.id", "unknown"), null);
+    }
+
+    public static void simulateSingleMatch(final Match mc, int iGame, boolean outputGamelog, String gameId, Long seed) {
         System.out.println("DEBUG: Starting simulateSingleMatch for game " + gameId);
         
+        if (seed != null) {
+            // Shuffles and AI choices draw from MyRandom
+            MyRandom.setRandom(new Random(seed + iGame));
+        }
+        
         final StopWatch sw = new StopWatch();
         sw.start();
 
@@ -284,6 +402,19 @@ public class SimulateMatch {
             System.out.println(l);
         }
 
+        // Details of the game for the benchmark harness, printed before the result line they belong to
+        System.out.printf("%nGame Stats: Game %d took %d turns%s.%n", 1 + iGame, g1.getOutcome().getLastTurnNumber(),
+                seed == null ? "" : " with seed " + (seed + iGame));
+        for (RegisteredPlayer rp : mc.getPlayers()) {
+            if (rp.getPlayer() instanceof LobbyPlayerLLM) {
+                LLMClient client = ((LobbyPlayerLLM) rp.getPlayer()).getClient();
+                int[] counts = client.getDecisionCounts();
+                System.out.printf("LLM Stats: Game %d %s made %d decisions, %d failed.%n", 1 + iGame,
+                        rp.getPlayer().getName(), counts[0], counts[1]);
+                client.resetDecisionCounts();
+            }
+        }
+
         // If both players life totals to 0 in a single turn, the game should end in a draw
         if (g1.getOutcome().isDraw()) {
             System.out.printf("\nGame Result: Game %d ended in a Draw! Took %d ms.%n", 1 + iGame, sw.getTime());
@@ -526,7 +657,11 @@ public class SimulateMatch {
             String baseDir = type.equals(GameType.Commander) ?
                     ForgeConstants.DECK_COMMANDER_DIR : ForgeConstants.DECK_CONSTRUCTED_DIR;
 
-            File f = new File(baseDir + deckname);
+            // A path to a deck file (run_tournament.py passes absolute paths), else a file in the deck directory
+            File f = new File(deckname);
+            if (!f.isFile()) {
+                f = new File(baseDir + deckname);
+            }
             if (!f.exists()) {
                 System.out.println("No deck found in " + baseDir);
             }
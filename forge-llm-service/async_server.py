@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Asyncio serving mode for the Forge LLM service.
+
+Serves the same /act contract as test_server.py, but from an ASGI app with an
+async OpenAI client. A request waiting on the API no longer holds a thread, so
+hundreds of decisions from parallel run_benchmark.py workers can be in flight
+at once.
+
+Run with:
+    python async_server.py
+or
+    uvicorn async_server:app --host 0.0.0.0 --port 7861
+"""
+
+import json
+import time
+import os
+import logging
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from batching import create_batcher
+from card_dictionary import create_card_dictionary
+from conversation_store import create_conversation_store
+from decision_cache import create_decision_cache
+from fast_path import create_fast_path
+from llm_backends import create_backend
+from metrics import (
+    record_request, record_completion, record_default, record_cache_hit, record_fast_path,
+    render_metrics
+)
+from rate_limiting import OverloadError, create_limiter
+from scheduling import create_scheduler
+from state_delta import create_state_delta
+from token_budget import create_token_budget
+from server_core import (
+    DEFAULT_MODEL, TEMPERATURE, MAX_TOKENS, MOCK_API_KEY, VALID_CONTEXTS,
+    HISTORY_WINDOW, SYSTEM_PROMPT, setup_logging, special_context_response,
+    invalid_context_error, parse_llm_response, create_default_response,
+    render_prompt, prompts_needed, conversation_record, DeadlineExceeded, request_deadline,
+    acall_before, DEADLINE_HEADER
+)
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+log_filename, conversation_log, trace_recorder = setup_logging()
+logger = logging.getLogger(__name__)
+
+# Select the LLM backend (LLM_BACKEND=openai|compatible|stub)
+backend = create_backend(DEFAULT_MODEL, MOCK_API_KEY)
+
+# Optional adaptive concurrency limit, rate limiting and retries (ADAPTIVE_LIMIT=1)
+limiter = create_limiter(backend)
+
+# Optional coalescing of concurrent decisions into one backend call (BATCH_MAX_SIZE > 1)
+batcher = create_batcher(limiter or backend)
+
+# Optional round-robin admission of backend calls across games (SCHEDULER_CONCURRENCY > 0)
+scheduler = create_scheduler(batcher or limiter or backend)
+
+# Forced decisions (nothing to play, a single option, ...) answered without the LLM
+fast_path = create_fast_path()
+
+# Optional cache of decisions for repeated game states (DECISION_CACHE_SIZE > 0)
+decision_cache = create_decision_cache()
+
+# Optional token budget for the conversation window instead of a message count (TOKEN_BUDGET > 0)
+token_budget = create_token_budget()
+
+# Bounded per-player conversation memory, evicted when games end or go idle
+conversation_store = create_conversation_store(
+    SYSTEM_PROMPT, token_budget.max_messages if token_budget is not None else HISTORY_WINDOW
+)
+
+# Prompts every request carries, which state diffs and card text references may refer back to
+visible_prompts = token_budget.min_prompts if token_budget is not None else conversation_store.visible_prompts
+
+# Optional board deltas instead of full boards in prompts (STATE_DELTA=1)
+state_delta = create_state_delta(visible_prompts)
+
+# Optional card text in prompts, each text sent once per conversation window (CARD_DICTIONARY=1)
+card_dictionary = create_card_dictionary(visible_prompts)
+
+async def hello(request):
+    return PlainTextResponse("LLM Service is running - OpenAI integration active (async)")
+
+async def stats(request):
+    return JSONResponse({
+        "fast_path": fast_path.stats() if fast_path is not None else None,
+        "decision_cache": decision_cache.stats() if decision_cache is not None else None,
+        "conversations": conversation_store.stats(),
+        "conversation_log": conversation_log.stats(),
+        "state_delta": state_delta.stats() if state_delta is not None else None,
+        "card_dictionary": card_dictionary.stats() if card_dictionary is not None else None,
+        "token_budget": token_budget.stats() if token_budget is not None else None,
+        "batching": batcher.stats() if batcher is not None else None,
+        "scheduling": scheduler.stats() if scheduler is not None else None,
+        "rate_limiting": limiter.stats() if limiter is not None else None
+    })
+
+async def metrics(request):
+    body, content_type = render_metrics()
+    return Response(body, headers={"Content-Type": content_type})
+
+async def end_game(request):
+    game_id = request.path_params["game_id"]
+    if trace_recorder is not None:
+        trace_recorder.record_end(time.time(), game_id)
+    removed = conversation_store.end_game(game_id)
+    logger.info(f"Game {game_id} ended, dropped {removed} conversations")
+    return JSONResponse({"removed": removed})
+
+async def act(request):
+    t0 = time.time()
+    context = "unknown"
+    # Reply time promised to Forge (X-Forge-Deadline-Ms), or None
+    deadline = request_deadline(request.headers, t0)
+
+    try:
+        # Get game state from request
+        try:
+            game_state = await request.json()
+        except json.JSONDecodeError:
+            game_state = None
+        if not game_state:
+            logger.error("No game state provided in request")
+            record_request(context, "error", t0)
+            return JSONResponse({"error": "No game state provided"}, status_code=400)
+
+        # Extract context from game state
+        context = game_state.get("context", "unknown")
+        logger.info(f"Request received with context: {context}")
+
+        # Special handling for debug and testing contexts
+        special_response = special_context_response(context)
+        if special_response is not None:
+            return JSONResponse(special_response)
+
+        # Check if context is valid
+        if context not in VALID_CONTEXTS:
+            logger.warning(f"Invalid context: {context}")
+            record_request(context, "error", t0)
+            return JSONResponse({"error": invalid_context_error(context)}, status_code=400)
+
+        # Trivial decisions are answered locally
+        if fast_path is not None:
+            fast_decision = fast_path.decide(game_state)
+            if fast_decision is not None:
+                rule, decision = fast_decision
+                logger.info(f"Fast path '{rule}' answered context: {context}")
+                record_fast_path(context, rule)
+                record_request(context, "fast_path", t0)
+                return JSONResponse(decision)
+
+        # Without a usable backend (no OpenAI API key), answer with defaults
+        if backend is None:
+            logger.info(f"Using default response for context: {context} (no backend configured)")
+            record_default(context, "no_backend")
+            record_request(context, "default", t0)
+            return JSONResponse(create_default_response(context, game_state))
+
+        # Repeated states are answered from the decision cache without an LLM call
+        if decision_cache is not None:
+            cached_decision = decision_cache.get(game_state)
+            if cached_decision is not None:
+                logger.info(f"Decision cache hit for context: {context} ({time.time() - t0:.2f}s to reply)")
+                record_cache_hit(context)
+                record_request(context, "cache", t0)
+                return JSONResponse(cached_decision)
+
+        player_id = game_state.get("player", {}).get("name", 'unknown')
+
+        # Format game state as plain text, as changes since the last prompt and with card
+        # text references if enabled
+        formatted_state, prompt_state = render_prompt(
+            game_state, conversation_store.get_prompt_state(player_id), state_delta, card_dictionary
+        )
+
+        # Get or create conversation history for this player
+        recent_messages = conversation_store.add_user_message(player_id, formatted_state, prompt_state)
+        if token_budget is not None:
+            recent_messages, window_tokens = token_budget.fit(recent_messages, context, prompts_needed(prompt_state))
+            logger.info(f"Sending {len(recent_messages)} messages ({window_tokens} tokens) for context: {context}")
+
+        # Call the LLM backend without blocking the event loop, cancelling it at the deadline
+        try:
+            logger.info(f"Calling {backend.name} backend for context: {context}")
+            completion = await acall_before(deadline, (scheduler or batcher or limiter or backend).acomplete(
+                recent_messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                game_state=game_state,
+                deadline=deadline
+            ))
+            record_completion(context, backend.name, completion)
+
+            # Extract the response text
+            response_text = completion.text
+            logger.debug(f"Raw LLM response: {response_text}")
+
+            # Add assistant's response to conversation history
+            conversation_store.add_assistant_message(player_id, response_text)
+
+            # Log the prompt and response (written in the background)
+            conversation_log.log(conversation_record(game_state, player_id, formatted_state, t0, completion))
+
+            # Parse the JSON response
+            response_json = parse_llm_response(response_text)
+            if response_json is not None:
+                logger.info(f"Successfully parsed LLM response: {response_json}")
+                logger.info(f"({time.time() - t0:.2f}s to reply)")
+                if decision_cache is not None:
+                    decision_cache.put(game_state, response_json)
+                record_request(context, "llm", t0)
+                return JSONResponse(response_json)
+
+            # If we can't parse the JSON, return a default response based on context
+            logger.warning("Returning default response due to JSON parsing failure")
+            record_default(context, "parse_failure")
+            record_request(context, "default", t0)
+            return JSONResponse(create_default_response(context, game_state))
+
+        except (OverloadError, DeadlineExceeded) as e:
+            reason = "deadline" if isinstance(e, DeadlineExceeded) else "overload"
+            logger.warning(f"Using default response for context: {context} ({reason}: {e})")
+            conversation_log.log(conversation_record(game_state, player_id, formatted_state, t0, error=str(e)))
+            record_default(context, reason)
+            record_request(context, "default", t0)
+            return JSONResponse(create_default_response(context, game_state))
+
+        except Exception as e:
+            logger.error(f"LLM backend error: {str(e)}")
+            conversation_log.log(conversation_record(game_state, player_id, formatted_state, t0, error=str(e)))
+            record_default(context, "backend_error")
+            record_request(context, "default", t0)
+            return JSONResponse(create_default_response(context, game_state))
+
+    except Exception as e:
+        error_msg = f"Error processing request: {str(e)}"
+        logger.exception(error_msg)
+        record_request(context, "error", t0)
+        return JSONResponse({"error": error_msg}, status_code=500)
+
+async def traced_act(request):
+    """act(), recording every exchange (ACT_TRACE=1)"""
+    arrival = time.time()
+    response = await act(request)
+    if trace_recorder is not None:
+        trace_recorder.record_act(arrival, await request.body(), request.headers.get(DEADLINE_HEADER),
+                                  response.status_code, response.body)
+    return response
+
+app = Starlette(routes=[
+    Route("/", hello, methods=["GET"]),
+    Route("/act", traced_act, methods=["POST"]),
+    Route("/stats", stats, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+    Route("/games/{game_id}/end", end_game, methods=["POST"]),
+])
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Get port from environment or use default
+    port = int(os.environ.get('PORT', 7861))
+
+    # Log the start of the server
+    logger.info(f"Starting async LLM service on port {port}")
+    logger.info(f"Main log file: {log_filename}")
+    logger.info(f"Conversation log file: {conversation_log.path}")
+    print(f"Starting async LLM service on port {port}", flush=True)
+    print(f"Logs will be written to:\n- {log_filename}\n- {conversation_log.path}")
+    if trace_recorder is not None:
+        print(f"- {trace_recorder.path} (/act trace)")
+
+    # backlog sized for bursts from many parallel Forge JVMs
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="warning", backlog=2048)
@@ -0,0 +1,317 @@
+"""
+Micro-batching of concurrent decisions for the Forge LLM service.
+
+With many parallel Forge games, /act requests arrive within milliseconds of
+each other and each one costs a separate backend call against the provider's
+per-request rate limit. The MicroBatcher holds a request for up to max_wait_ms,
+coalesces everything that arrives meanwhile (up to max_batch_size) into one
+multi-decision chat completion and hands each waiting request its own decision.
+
+A batched call sends each decision's full current state under a numbered header and
+asks for {"decisions": [...]} in the same order; decisions that are missing or
+malformed in the reply come back as empty text, so the server falls back to its
+default response for them only. A batch of one is sent as a normal call with
+the player's conversation history. The other prompts of a batch leave that
+history out, so they are rendered again without a state diff (STATE_DELTA) or
+card references (CARD_DICTIONARY), which point back into it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_backends import Completion
+from server_core import SYSTEM_PROMPT, DeadlineExceeded, format_game_state_as_text, parse_llm_response
+
+logger = logging.getLogger("batching")
+
+BATCH_HEADER = "=== Decision {} ==="
+BATCH_HEADER_REGEX = re.compile(r"^=== Decision (\d+) ===$", re.MULTILINE)
+
+BATCH_INSTRUCTIONS = """
+You will receive several independent decisions, possibly for different players and games,
+each under a "=== Decision N ===" header. Decide each one on its own, exactly as you would
+if it were the only one, and respond with a single JSON object listing the decisions in order:
+{
+  "decisions": [<decision 1>, <decision 2>, ...]
+}
+"""
+
+def build_batch_messages(prompts):
+    """Chat messages asking for one decision per prompt"""
+    sections = [f"{BATCH_HEADER.format(i + 1)}\n{prompt}" for i, prompt in enumerate(prompts)]
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT + BATCH_INSTRUCTIONS},
+        {"role": "user", "content": "\n\n".join(sections)}
+    ]
+
+def standalone_prompt(messages, game_state):
+    """
+    A decision's prompt without its conversation history.
+
+    The last user message may be a state diff or use card references defined in
+    earlier prompts, so the full state is rendered from the request instead.
+    """
+    if game_state is not None:
+        return format_game_state_as_text(game_state)
+    return next(m["content"] for m in reversed(messages) if m["role"] == "user")
+
+def split_batch_prompt(prompt):
+    """The individual prompts of a batched user message, or None if it is not one"""
+    parts = BATCH_HEADER_REGEX.split(prompt)
+    if len(parts) < 3:
+        return None
+    return [text.strip() for text in parts[2::2]]
+
+def split_batch_response(text, count):
+    """
+    Split a batched reply into per-decision dicts.
+
+    Returns:
+        List of count decisions, None where a decision is missing or not an object
+    """
+    parsed = parse_llm_response(text) if text else None
+    decisions = parsed.get("decisions") if isinstance(parsed, dict) else None
+    if not isinstance(decisions, list):
+        return [None] * count
+    decisions = decisions[:count] + [None] * (count - len(decisions))
+    return [d if isinstance(d, dict) else None for d in decisions]
+
+class _Pending:
+    __slots__ = ("messages", "temperature", "max_tokens", "game_state", "deadline", "abandoned", "done", "future",
+                 "completion", "error")
+
+    def __init__(self, messages, temperature, max_tokens, game_state, deadline=None):
+        self.messages = messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.game_state = game_state
+        self.deadline = deadline
+        self.abandoned = False
+        self.done = None
+        self.future = None
+        self.completion = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    Coalesces concurrent complete()/acomplete() calls into batched backend calls.
+
+    Has the same complete()/acomplete() signature as LLMBackend, so the servers
+    call it in place of the backend. complete() (threaded servers) is served by
+    a dispatcher thread and a pool of `concurrency` threads for backend calls;
+    acomplete() batches on the running event loop. A decision whose deadline
+    passes before its batch is sent is left out of the batch.
+    """
+
+    def __init__(self, backend, max_batch_size=8, max_wait_ms=10.0, concurrency=32):
+        self.backend = backend
+        self.name = backend.name
+        self.model = backend.model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.concurrency = concurrency
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.batched_requests = 0
+        self.largest_batch = 0
+        self.missing_decisions = 0
+
+        # Threaded mode
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._executor = None
+
+        # Async mode
+        self._async_pending = []
+        self._async_timer = None
+
+    def _record(self, size, missing):
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += size
+            if size > 1:
+                self.batched_requests += size
+            self.largest_batch = max(self.largest_batch, size)
+            self.missing_decisions += missing
+
+    def _batch_call(self, batch):
+        """Arguments for the backend call serving a batch"""
+        # The call is worth making until the last waiting decision's deadline
+        deadlines = [item.deadline for item in batch]
+        deadline = None if None in deadlines else max(deadlines)
+        if len(batch) == 1:
+            item = batch[0]
+            return item.messages, item.temperature, item.max_tokens, item.game_state, deadline
+        prompts = [standalone_prompt(item.messages, item.game_state) for item in batch]
+        return (
+            build_batch_messages(prompts),
+            batch[0].temperature,
+            sum(item.max_tokens for item in batch),
+            [item.game_state for item in batch],
+            deadline
+        )
+
+    def _fan_out(self, batch, completion):
+        """Per-request completions for a batch's backend reply"""
+        if len(batch) == 1:
+            self._record(1, 0)
+            return [completion]
+        decisions = split_batch_response(completion.text, len(batch))
+        missing = sum(1 for d in decisions if d is None)
+        if missing:
+            logger.warning(f"Batched reply was missing {missing} of {len(batch)} decisions")
+        self._record(len(batch), missing)
+        return [
+            Completion(
+                json.dumps(decision) if decision is not None else "",
+                prompt_tokens=completion.prompt_tokens // len(batch),
+                completion_tokens=completion.completion_tokens // len(batch),
+                latency=completion.latency,
+                cached_tokens=completion.cached_tokens // len(batch),
+                estimated_tokens=completion.estimated_tokens
+            )
+            for decision in decisions
+        ]
+
+    # Threaded mode
+
+    def complete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        self._start()
+        item = _Pending(messages, temperature, max_tokens, game_state, deadline)
+        item.done = threading.Event()
+        self._queue.put(item)
+        if not item.done.wait(None if deadline is None else max(deadline - time.time(), 0)):
+            # Not sent if its batch has not been yet; a batch already sent finishes without it
+            item.abandoned = True
+            raise DeadlineExceeded("batched call did not finish before the deadline")
+        if item.error is not None:
+            raise item.error
+        return item.completion
+
+    def _start(self):
+        if self._queue is not None:
+            return
+        with self._start_lock:
+            if self._queue is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+                pending = queue.Queue()
+                threading.Thread(target=self._dispatch, args=(pending,), daemon=True, name="batch-dispatch").start()
+                self._queue = pending
+
+    def _dispatch(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        now = time.time()
+        expired = [item for item in batch if item.abandoned or (item.deadline is not None and item.deadline <= now)]
+        for item in expired:
+            item.error = DeadlineExceeded("deadline passed while waiting for a batch")
+            item.done.set()
+        batch = [item for item in batch if item not in expired]
+        if not batch:
+            return
+        try:
+            messages, temperature, max_tokens, game_state, deadline = self._batch_call(batch)
+            completion = self.backend.complete(messages, temperature, max_tokens, game_state=game_state,
+                                               deadline=deadline)
+            for item, result in zip(batch, self._fan_out(batch, completion)):
+                item.completion = result
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.done.set()
+
+    # Async mode
+
+    async def acomplete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        loop = asyncio.get_running_loop()
+        item = _Pending(messages, temperature, max_tokens, game_state, deadline)
+        item.future = loop.create_future()
+        self._async_pending.append(item)
+        if len(self._async_pending) >= self.max_batch_size:
+            self._flush()
+        elif self._async_timer is None:
+            self._async_timer = loop.call_later(self.max_wait, self._flush)
+        return await item.future
+
+    def _flush(self):
+        if self._async_timer is not None:
+            self._async_timer.cancel()
+            self._async_timer = None
+        batch, self._async_pending = self._async_pending, []
+        if batch:
+            asyncio.ensure_future(self._arun(batch))
+
+    async def _arun(self, batch):
+        # Decisions cancelled at their deadline while waiting are left out
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+        try:
+            messages, temperature, max_tokens, game_state, deadline = self._batch_call(batch)
+            completion = await self.backend.acomplete(messages, temperature, max_tokens, game_state=game_state,
+                                                      deadline=deadline)
+            results = self._fan_out(batch, completion)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        for item, result in zip(batch, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+    def stats(self):
+        """Batch counts and sizes"""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "backend_calls": self.batches,
+                "requests": self.requests,
+                "batched_requests": self.batched_requests,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "missing_decisions": self.missing_decisions
+            }
+
+def create_batcher(backend):
+    """
+    Create the micro-batcher configured by the environment, or None if disabled.
+
+        BATCH_MAX_SIZE     most decisions per backend call (default 1, batching off)
+        BATCH_MAX_WAIT_MS  longest a decision waits for others to join (default 10)
+        BATCH_CONCURRENCY  batches in flight at once in threaded servers (default 32)
+    """
+    max_batch_size = int(os.getenv("BATCH_MAX_SIZE", 1))
+    if backend is None or max_batch_size <= 1:
+        return None
+    max_wait_ms = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+    logger.info(f"Micro-batching enabled (up to {max_batch_size} decisions, {max_wait_ms}ms wait)")
+    return MicroBatcher(
+        backend,
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        concurrency=int(os.getenv("BATCH_CONCURRENCY", 32))
+    )
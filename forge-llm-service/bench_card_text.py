@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark of card text cost in conversation prompts over a long game.
+
+Plays a simulated four-player Commander game (permanents entering, leaving and
+tapping; --decisions decisions by one player) through the same rendering and
+conversation store the servers use, and reports the characters sent to the LLM
+per request (the whole conversation window) when card text is:
+
+- left out (the servers' prompts without the card dictionary)
+- inlined after every card name on every prompt
+- sent through the card dictionary (CARD_DICTIONARY=1)
+
+each with full board prompts and with state-diff prompts (STATE_DELTA=1).
+
+Example:
+    python bench_card_text.py --decisions 400
+"""
+
+import argparse
+import random
+
+from card_dictionary import CardDictionary
+from conversation_store import LAYOUTS, ConversationStore
+from server_core import HISTORY_WINDOW, SYSTEM_PROMPT, render_prompt
+from state_delta import StateDeltaPrompter
+
+WORDS = ("target", "creature", "you", "control", "gets", "+1/+1", "until", "end", "of", "turn", "draw", "a",
+         "card", "whenever", "another", "enters", "the", "battlefield", "sacrifice", "flying", "trample")
+
+def make_pool(size, rng):
+    """Distinct cards with rules text of typical length, plus basic lands"""
+    pool = [{"name": f"Card {i}", "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 45)))}
+            for i in range(size)]
+    pool += [{"name": name, "text": f"({{T}}: Add {{{color}}}.)"}
+             for name, color in (("Forest", "G"), ("Island", "U"), ("Swamp", "B"), ("Mountain", "R"))]
+    return pool
+
+class Game:
+    def __init__(self, rng, pool):
+        self.rng = rng
+        self.pool = pool
+        self.next_id = 1
+        self.boards = [[self.new_card() for _ in range(10)] for _ in range(4)]
+        self.hand = [self.new_card() for _ in range(7)]
+        self.life = [40] * 4
+
+    def new_card(self):
+        card = dict(self.rng.choice(self.pool), id=self.next_id, isTapped=False)
+        self.next_id += 1
+        return card
+
+    def step(self):
+        """A few board changes between decisions"""
+        rng = self.rng
+        board = rng.choice(self.boards)
+        roll = rng.random()
+        if roll < 0.3:
+            board.append(self.new_card())
+        elif roll < 0.4 and board:
+            board.pop(rng.randrange(len(board)))
+        for card in rng.sample(board, min(3, len(board))):
+            card["isTapped"] = not card["isTapped"]
+        if rng.random() < 0.2:
+            self.life[rng.randrange(4)] -= rng.randint(1, 5)
+        if rng.random() < 0.3:
+            self.hand.append(self.new_card())
+        if rng.random() < 0.3 and self.hand:
+            self.boards[0].append(self.hand.pop(rng.randrange(len(self.hand))))
+
+    def state(self, inline_text):
+        def show(card):
+            card = dict(card)
+            if inline_text:
+                card["name"] = f"{card['name']} - {card['text']}"
+            return card
+
+        return {
+            "context": "chooseSpellAbilityToPlay",
+            "player": {"name": "LLM(1)-Deck-g1_0123abcd", "life": self.life[0]},
+            "gamePhase": {"currentPhase": "MAIN1"},
+            "hand": [show(card) for card in self.hand],
+            "battlefield": [show(card) for card in self.boards[0]],
+            "opponents": [{"name": f"Opponent {i}", "life": self.life[i],
+                           "battlefield": [show(card) for card in self.boards[i]]} for i in range(1, 4)],
+            "availableAbilities": [{"id": i, "hostCard": f"Card {i}", "description": "Cast spell",
+                                    "costDescription": "{2}{G}"} for i in range(3)]
+        }
+
+def run(decisions, seed, mode, delta, layout):
+    """Mean characters per request and the card dictionary stats"""
+    rng = random.Random(seed)
+    game = Game(rng, make_pool(120, rng))
+    store = ConversationStore(SYSTEM_PROMPT, HISTORY_WINDOW, layout=layout)
+    state_delta = StateDeltaPrompter(full_every=store.visible_prompts) if delta else None
+    card_dictionary = CardDictionary(visible_prompts=store.visible_prompts) if mode == "dictionary" else None
+    player_id = "LLM(1)-Deck-g1_0123abcd"
+    total = 0
+    for _ in range(decisions):
+        game.step()
+        text, prompt_state = render_prompt(game.state(mode == "inline"), store.get_prompt_state(player_id),
+                                           state_delta, card_dictionary)
+        messages = store.add_user_message(player_id, text, prompt_state)
+        total += sum(len(m["content"]) for m in messages)
+        store.add_assistant_message(player_id, '{"chosenAbilityId": 0}')
+    return total / decisions, card_dictionary.stats() if card_dictionary else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark card text cost in conversation prompts')
+    parser.add_argument('-n', '--decisions', type=int, default=400, help='Decisions in the simulated game')
+    parser.add_argument('--layout', choices=LAYOUTS, default='window', help='Conversation layout (PROMPT_LAYOUT)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"\n{args.decisions} decisions, {args.layout} layout of {HISTORY_WINDOW} messages; "
+          f"mean characters per request")
+    print(f"{'prompts':<8} {'no text':>10} {'inline':>10} {'dictionary':>11} {'vs inline':>10} {'resent':>8}")
+    for delta in (False, True):
+        without, _ = run(args.decisions, args.seed, "none", delta, args.layout)
+        inline, _ = run(args.decisions, args.seed, "inline", delta, args.layout)
+        dictionary, stats = run(args.decisions, args.seed, "dictionary", delta, args.layout)
+        print(f"{'delta' if delta else 'full':<8} {without:>10.0f} {inline:>10.0f} {dictionary:>11.0f} "
+              f"{1 - dictionary / inline:>9.0%} {stats['reintroduced']:>8}")
+
+if __name__ == '__main__':
+    main()
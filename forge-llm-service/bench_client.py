@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-decision client overhead in llm_client.get_llm_decision.
+
+Starts stub_backend.py and times get_llm_decision() against it twice: with a
+fresh openai.OpenAI client per call (the old behavior) and with the shared
+pooled client. With --latency-ms 0 the stub answers immediately, so the time
+per decision is almost all client setup, connection and request overhead.
+
+Example:
+    python bench_client.py --requests 500 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_server import percentile, start_process, stop_process, wait_for_port
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-decision overhead of llm_client against a stub backend')
+    parser.add_argument('-n', '--requests', type=int, default=300, help='Decisions per mode')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='Threads calling get_llm_decision')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated backend latency')
+    parser.add_argument('--state', default='sample-state.json', help='Game state JSON to decide on')
+    parser.add_argument('--backend-port', type=int, default=7990)
+    args = parser.parse_args()
+
+    # llm_client reads its settings at import time
+    os.environ["OPENAI_API_KEY"] = "sk-stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.backend_port}/v1"
+    import openai
+    import llm_client
+
+    with open(args.state, 'r') as f:
+        game_state = json.load(f)
+
+    stub = start_process(["stub_backend.py", "--port", str(args.backend_port),
+                          "--latency-ms", str(args.latency_ms), "--jitter-ms", "0"], dict(os.environ))
+    results = {}
+    try:
+        if not wait_for_port(args.backend_port):
+            print("stub backend did not start")
+            sys.exit(1)
+
+        pooled_client = llm_client.get_client
+        modes = {
+            "fresh": lambda: openai.OpenAI(api_key=llm_client.OPENAI_API_KEY),
+            "pooled": pooled_client,
+        }
+        for name, client_factory in modes.items():
+            llm_client.get_client = client_factory
+
+            def one_decision(_):
+                start = time.perf_counter()
+                llm_client.get_llm_decision(game_state)
+                return time.perf_counter() - start
+
+            # Warm up imports and the pool so both modes start equal
+            one_decision(0)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                latencies = list(executor.map(one_decision, range(args.requests)))
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "decisions_per_sec": args.requests / elapsed,
+                "mean_ms": sum(latencies) / len(latencies) * 1000,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000
+            }
+        llm_client.get_client = pooled_client
+    finally:
+        stop_process(stub)
+
+    print(f"\n{args.requests} decisions, concurrency {args.concurrency}, stub latency {args.latency_ms}ms")
+    print(f"{'client':<8} {'dec/s':>10} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'overhead ms':>12}")
+    for name, r in results.items():
+        overhead = r["mean_ms"] - args.latency_ms
+        print(f"{name:<8} {r['decisions_per_sec']:>10.1f} {r['mean_ms']:>10.2f} {r['p50_ms']:>10.2f} "
+              f"{r['p99_ms']:>10.2f} {overhead:>12.2f}")
+    print(f"\nllm_client latency stats (both modes): {llm_client.get_latency_stats()}")
+
+if __name__ == '__main__':
+    main()
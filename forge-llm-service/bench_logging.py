@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark of conversation logging cost on the request path.
+
+Compares the old synchronous conversation logger (six FileHandler lines per
+decision on the request thread) with ConversationLog (one queued record per
+decision, written in batches by a background thread). Every write to the log
+file is delayed by --disk-ms to model a slow or busy disk; the time each
+simulated request spends logging is reported for each delay, showing whether
+request latency tracks disk speed.
+
+Example:
+    python bench_logging.py --decisions 2000 --concurrency 32 --disk-ms 0,1,5
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_server import percentile
+from conversation_log import ConversationLog
+
+class SlowFile:
+    """File wrapper that sleeps before every write, like a slow disk"""
+
+    def __init__(self, file, delay):
+        self.file = file
+        self.delay = delay
+
+    def write(self, data):
+        time.sleep(self.delay)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+class SlowConversationLog(ConversationLog):
+    def __init__(self, base_path, delay, **kwargs):
+        self.delay = delay
+        super().__init__(base_path, **kwargs)
+
+    def _open(self, path):
+        return SlowFile(open(path, "ab"), self.delay)
+
+def sync_logger(path, delay):
+    """The conversation logger test_server.py used to write through on the request thread"""
+    conversation_logger = logging.getLogger(f"bench-conversation-{path}")
+    conversation_logger.setLevel(logging.INFO)
+    conversation_logger.propagate = False
+    handler = logging.StreamHandler(SlowFile(open(path, "a"), delay))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    conversation_logger.addHandler(handler)
+    return conversation_logger, handler
+
+def run(log_decision, decisions, concurrency):
+    """Per-decision seconds spent logging"""
+    def one(i):
+        start = time.perf_counter()
+        log_decision(i)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one, range(decisions)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark synchronous vs background conversation logging')
+    parser.add_argument('-n', '--decisions', type=int, default=2000, help='Decisions logged per run')
+    parser.add_argument('-c', '--concurrency', type=int, default=32, help='Request threads logging at once')
+    parser.add_argument('--disk-ms', default='0,1,5', help='Comma-separated per-write disk delays to test')
+    parser.add_argument('--prompt-chars', type=int, default=3000, help='Size of each logged prompt')
+    parser.add_argument('--compression', default='none', choices=['none', 'gzip', 'zstd'])
+    args = parser.parse_args()
+
+    prompt = ("- Llanowar Elves (untapped) [ID: 124]\n" * (args.prompt_chars // 38 + 1))[:args.prompt_chars]
+    response = '{"chosenAbilityId": 42}'
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for disk_ms in [float(d) for d in args.disk_ms.split(",")]:
+            delay = disk_ms / 1000.0
+
+            conversation_logger, handler = sync_logger(os.path.join(tmp, f"sync_{disk_ms}.log"), delay)
+
+            def log_sync(i):
+                player = f"LLM(1)-Deck-g{i % 8}_0123abcd"
+                conversation_logger.info(f"PLAYER: {player} | CONTEXT: chooseSpellAbilityToPlay")
+                conversation_logger.info("PROMPT:\n" + prompt)
+                conversation_logger.info("-" * 50)
+                conversation_logger.info(f"PLAYER: {player} | RESPONSE:")
+                conversation_logger.info(response)
+                conversation_logger.info("=" * 80)
+
+            sync_latencies = run(log_sync, args.decisions, args.concurrency)
+            handler.close()
+
+            conversation_log = SlowConversationLog(os.path.join(tmp, f"async_{disk_ms}"), delay,
+                                                   compression=args.compression,
+                                                   queue_size=args.decisions)
+
+            def log_async(i):
+                conversation_log.log({
+                    "ts": time.time(), "game_id": f"g{i % 8}_0123abcd", "player": f"LLM(1)-Deck-g{i % 8}_0123abcd",
+                    "context": "chooseSpellAbilityToPlay", "prompt": prompt, "response": response,
+                    "latency": 1.2, "prompt_tokens": len(prompt) // 4, "completion_tokens": 8
+                })
+
+            async_latencies = run(log_async, args.decisions, args.concurrency)
+            start = time.perf_counter()
+            conversation_log.close()
+            drain = time.perf_counter() - start
+            stats = conversation_log.stats()
+            results.append((disk_ms, sync_latencies, async_latencies, drain, stats))
+
+    print(f"\n{args.decisions} decisions, {args.concurrency} threads, {args.prompt_chars}-char prompts, "
+          f"compression {args.compression}")
+    print(f"{'disk ms':>8} {'sync p50':>10} {'sync p99':>10} {'async p50':>10} {'async p99':>10} "
+          f"{'batches':>8} {'dropped':>8} {'drain s':>8}")
+    for disk_ms, sync_latencies, async_latencies, drain, stats in results:
+        print(f"{disk_ms:>8.1f} {percentile(sync_latencies, 50) * 1000:>10.3f} "
+              f"{percentile(sync_latencies, 99) * 1000:>10.3f} {percentile(async_latencies, 50) * 1000:>10.3f} "
+              f"{percentile(async_latencies, 99) * 1000:>10.3f} {stats['batches']:>8} {stats['dropped']:>8} "
+              f"{drain:>8.2f}")
+    print("(latencies in ms of logging time per decision on the request thread)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of llm_client.create_prompt on large Commander boards.
+
+Builds four-player boards with --permanents permanents per player (creatures
+with changing power/toughness, lands, artifacts with long rules text), then
+renders every decision context with the str.format implementation
+create_prompt used to have and with the compiled renderer, checking that both
+produce the same prompt. Successive decisions reuse the same cards with a few
+of them changed, as in a real game.
+
+Example:
+    python bench_prompt.py --permanents 30 --decisions 2000
+"""
+
+import argparse
+import random
+import time
+
+import llm_client
+from bench_server import percentile
+from llm_client import PROMPT_TEMPLATES, format_abilities
+
+RULES_TEXT = ("Flying, vigilance. Whenever another creature you control enters the battlefield, "
+              "you may pay {1}. If you do, draw a card. At the beginning of your end step, "
+              "create a 1/1 white Spirit creature token with flying.")
+
+def legacy_format_card_list(cards):
+    """format_card_list as it was before card lines were memoized"""
+    if not cards:
+        return "None"
+
+    result = []
+    for card in cards:
+        card_desc = f"- {card.get('name', 'Unknown')} ({card.get('type', 'Unknown')})"
+        if "Creature" in card.get('type', ''):
+            card_desc += f" {card.get('power', 0)}/{card.get('toughness', 0)}"
+        card_desc += f" - {card.get('text', 'No text')}"
+        result.append(card_desc)
+
+    return "\n".join(result)
+
+def legacy_create_prompt(game_state):
+    """create_prompt as it was before the templates were compiled"""
+    context = game_state.get("context", "unknown")
+    player = game_state.get("player", {})
+    game_phase = game_state.get("gamePhase", {})
+    opponents = game_state.get("opponents", [])
+
+    context_specific = {}
+    if context == "chooseAbility":
+        context_specific["abilities"] = format_abilities(game_state.get("abilities", []))
+    elif context == "chooseTargets":
+        context_specific["targets"] = legacy_format_card_list(game_state.get("targets", []))
+    elif context == "declareAttackers":
+        context_specific["attackers"] = legacy_format_card_list(
+            [c for c in game_state.get("battlefield", []) if c.get("canAttack", False)])
+    elif context == "declareBlockers":
+        context_specific["attackers"] = legacy_format_card_list(game_state.get("attackers", []))
+        context_specific["blockers"] = legacy_format_card_list(
+            [c for c in game_state.get("battlefield", []) if c.get("canBlock", False)])
+    elif context == "confirmAction":
+        context_specific["action_description"] = game_state.get("actionDescription", "Unknown action")
+    elif context == "chooseSingleEntity":
+        context_specific["choices"] = legacy_format_card_list(game_state.get("choices", []))
+
+    return PROMPT_TEMPLATES[context].format(
+        phase=game_phase.get("currentPhase", "UNKNOWN"),
+        is_player_turn="Yes" if game_phase.get("isPlayerTurn", False) else "No",
+        player_life=player.get("life", 0),
+        opponent_life=opponents[0].get("life", 0) if opponents else 0,
+        player_battlefield=legacy_format_card_list(game_state.get("battlefield", [])),
+        opponent_battlefield=legacy_format_card_list(opponents[0].get("battlefield", [])) if opponents else "None",
+        player_hand=legacy_format_card_list(game_state.get("hand", [])),
+        **context_specific
+    )
+
+def make_card(card_id, rng):
+    kind = rng.choice(["creature", "creature", "land", "artifact"])
+    if kind == "creature":
+        return {"id": card_id, "name": f"Creature {card_id}", "type": "Creature - Spirit",
+                "power": rng.randint(1, 6), "toughness": rng.randint(1, 6), "text": RULES_TEXT,
+                "canAttack": rng.random() < 0.6, "canBlock": rng.random() < 0.6}
+    if kind == "land":
+        return {"id": card_id, "name": f"Land {card_id}", "type": "Land", "text": "{T}: Add {G}."}
+    return {"id": card_id, "name": f"Artifact {card_id}", "type": "Artifact", "text": RULES_TEXT}
+
+def make_board(permanents, rng):
+    """Four players' permanents plus the deciding player's hand"""
+    next_id = iter(range(1, 100000))
+    boards = [[make_card(next(next_id), rng) for _ in range(permanents)] for _ in range(4)]
+    hand = [make_card(next(next_id), rng) for _ in range(7)]
+    return boards, hand
+
+def game_state(context, boards, hand, rng):
+    targets = [card for board in boards for card in board if card["type"].startswith("Creature")][:10]
+    return {
+        "context": context,
+        "player": {"name": "LLM(1)-Deck", "life": 40},
+        "gamePhase": {"currentPhase": "MAIN1", "isPlayerTurn": True},
+        "battlefield": boards[0],
+        "hand": hand,
+        "opponents": [{"name": f"Opponent {i}", "life": 40, "battlefield": boards[i]} for i in range(1, 4)],
+        "abilities": [{"id": i, "hostCard": f"Artifact {i}", "description": "Draw a card"} for i in range(5)],
+        "targets": targets,
+        "attackers": targets[:3],
+        "choices": targets,
+        "actionDescription": "Pay {2} to draw a card"
+    }
+
+def mutate(boards, rng):
+    """Change a few creatures between decisions, as combat and pump effects do"""
+    for _ in range(3):
+        card = rng.choice(rng.choice(boards))
+        if "power" in card:
+            card["power"] += rng.choice([-1, 1])
+
+def run(render, states):
+    times = []
+    for state in states:
+        start = time.perf_counter()
+        render(state)
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark create_prompt on large Commander boards')
+    parser.add_argument('-p', '--permanents', type=int, default=30, help='Permanents per player (4 players)')
+    parser.add_argument('-n', '--decisions', type=int, default=2000, help='Prompts rendered per implementation')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    boards, hand = make_board(args.permanents, rng)
+    contexts = list(PROMPT_TEMPLATES)
+    states = []
+    for i in range(args.decisions):
+        if i % 4 == 0:
+            mutate(boards, rng)
+        # Snapshot the cards so each decision sees its own board, like a fresh JSON request
+        snapshot = [[dict(card) for card in board] for board in boards]
+        states.append(game_state(contexts[i % len(contexts)], snapshot, [dict(card) for card in hand], rng))
+
+    for state in states:
+        assert llm_client.create_prompt(state) == legacy_create_prompt(state), state["context"]
+    llm_client._card_fragments.clear()
+
+    legacy = run(legacy_create_prompt, states)
+    compiled = run(llm_client.create_prompt, states)
+
+    total = sum(len(board) for board in boards)
+    print(f"\n{args.decisions} prompts, {total} permanents across 4 players, "
+          f"{len(states[0]['battlefield']) + len(states[0]['opponents'][0]['battlefield'])} rendered per prompt")
+    print(f"{'renderer':<10} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}")
+    for name, times in (("str.format", legacy), ("compiled", compiled)):
+        print(f"{name:<10} {sum(times) / len(times) * 1e6:>10.1f} {percentile(times, 50) * 1e6:>10.1f} "
+              f"{percentile(times, 99) * 1e6:>10.1f}")
+    print(f"speedup {sum(legacy) / sum(compiled):.2f}x, prompts identical")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the /act decision endpoint.
+
+Starts the stub backend, then each server (Flask test_server.py and the ASGI
+async_server.py) pointed at it, fires concurrent /act requests and reports
+requests/sec and p50/p99 latency for each. With --backend stub the servers use
+the in-process StubBackend instead of the HTTP stub, which isolates server
+overhead from HTTP client overhead.
+
+Example:
+    python bench_server.py --requests 2000 --concurrency 200 --latency-ms 250
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVERS = {
+    "flask": "test_server.py",
+    "async": "async_server.py",
+    "prefork": "prefork_server.py",
+}
+
+def wait_for_port(port, timeout=30):
+    """Wait until something answers GET / on the port"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def run_load(port, payload, num_requests, concurrency, num_players):
+    """
+    Send num_requests /act calls with the given concurrency.
+
+    Returns:
+        Tuple of (elapsed seconds, list of per-request latencies, error count)
+    """
+    def one_request(i):
+        state = dict(payload)
+        state["player"] = dict(payload.get("player", {}), name=f"bench-player-{i % num_players}")
+        body = json.dumps(state)
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+            conn.request("POST", "/act", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            ok = response.status == 200
+        except OSError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return elapsed, latencies, errors
+
+def start_process(args, env, quiet=True):
+    return subprocess.Popen(
+        [sys.executable] + args,
+        env=env,
+        stdout=subprocess.DEVNULL if quiet else None,
+        stderr=subprocess.DEVNULL if quiet else None,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /act throughput and latency against a stub backend')
+    parser.add_argument('-n', '--requests', type=int, default=1000, help='Number of /act requests per server')
+    parser.add_argument('-c', '--concurrency', type=int, default=100, help='Concurrent in-flight requests')
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Simulated backend latency')
+    parser.add_argument('--jitter-ms', type=float, default=50.0, help='Simulated backend latency jitter')
+    parser.add_argument('--players', type=int, default=64, help='Distinct player names to spread requests over')
+    parser.add_argument('--backend', choices=['http', 'stub'], default='http',
+                        help='http: stub_backend.py through the OpenAI client; stub: in-process StubBackend')
+    parser.add_argument('--ms-per-token', type=float, default=0.0, help='Simulated generation time per output token')
+    parser.add_argument('--trailing-tokens', type=int, default=0,
+                        help='Words of explanation the backend appends after each decision')
+    parser.add_argument('--stream', action='store_true', help='Servers stream completions (LLM_STREAM=1)')
+    parser.add_argument('--batch-size', type=int, default=1, help='BATCH_MAX_SIZE for the servers (1 disables micro-batching)')
+    parser.add_argument('--batch-wait-ms', type=float, default=10.0, help='BATCH_MAX_WAIT_MS for the servers')
+    parser.add_argument('--servers', default="flask,async", help='Comma-separated servers to benchmark (flask,async,prefork)')
+    parser.add_argument('--state', default='sample-state.json', help='Game state JSON used as the request payload')
+    parser.add_argument('--backend-port', type=int, default=7990)
+    parser.add_argument('--server-port', type=int, default=7995)
+    args = parser.parse_args()
+
+    with open(args.state, 'r') as f:
+        payload = json.load(f)
+
+    env = dict(os.environ)
+    env["PORT"] = str(args.server_port)
+    env["BATCH_MAX_SIZE"] = str(args.batch_size)
+    env["BATCH_MAX_WAIT_MS"] = str(args.batch_wait_ms)
+    env["LLM_STREAM"] = "1" if args.stream else "0"
+    if args.backend == "stub":
+        env["LLM_BACKEND"] = "stub"
+        env["STUB_LATENCY_MS"] = str(args.latency_ms)
+        env["STUB_JITTER_MS"] = str(args.jitter_ms)
+        env["STUB_MS_PER_OUTPUT_TOKEN"] = str(args.ms_per_token)
+        env["STUB_TRAILING_TOKENS"] = str(args.trailing_tokens)
+        backend = None
+    else:
+        env["LLM_BACKEND"] = "openai"
+        env["OPENAI_API_KEY"] = "sk-stub"
+        env["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.backend_port}/v1"
+        backend = start_process(["stub_backend.py", "--port", str(args.backend_port),
+                                 "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                                 "--ms-per-token", str(args.ms_per_token),
+                                 "--trailing-tokens", str(args.trailing_tokens)], env)
+    results = {}
+    try:
+        for name in args.servers.split(","):
+            server = start_process([SERVERS[name]], env)
+            try:
+                if not wait_for_port(args.server_port):
+                    print(f"{name}: server did not start")
+                    continue
+                elapsed, latencies, errors = run_load(args.server_port, payload, args.requests,
+                                                      args.concurrency, args.players)
+                results[name] = {
+                    "requests_per_sec": len(latencies) / elapsed if elapsed > 0 else 0,
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "errors": errors
+                }
+            finally:
+                stop_process(server)
+    finally:
+        if backend:
+            stop_process(backend)
+
+    print(f"\n{args.requests} requests, concurrency {args.concurrency}, {args.backend} "
+          f"backend latency {args.latency_ms}ms +/- {args.jitter_ms}ms, batch size {args.batch_size}"
+          + (", streaming" if args.stream else ""))
+    print(f"{'server':<8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['requests_per_sec']:>10.1f} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f} {r['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark of games/hour with a JVM per game versus warm simulator workers.
+
+Plays the same AI-vs-AI games (no LLM service needed) twice with --workers
+games in parallel: once starting `java -jar ... sim` for every game as
+run_benchmark.py does by default, once on a SimulatorPool of warm `sim -worker`
+JVMs (run_benchmark.py --warm-workers). Reports games/hour for each and how
+long a worker took to start.
+
+Example:
+    python bench_simulator.py "mono-red.dck" "mono-blue.dck" --games 40 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from run_benchmark import ForgeSimulator, SimulatorPool
+
+def play(simulator, deck1, deck2, games, workers):
+    """Play the games; returns (elapsed seconds, finished games)"""
+    def one(i):
+        return simulator.run_simulation(deck1, deck2, 1, ["ai", "ai"], game_id=f"g{i + 1}_{uuid.uuid4().hex[:8]}")
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        finished = sum(len(output.results) for output in executor.map(one, range(games)))
+    return time.time() - start, finished
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark games/hour with cold and warm simulator JVMs')
+    parser.add_argument('deck1', help='Path or name of the first deck')
+    parser.add_argument('deck2', help='Path or name of the second deck')
+    parser.add_argument('-g', '--games', type=int, default=20, help='Games per mode')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Games in parallel')
+    parser.add_argument('-f', '--forge-path', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='Path to the Forge installation')
+    args = parser.parse_args()
+
+    rows = []
+    elapsed, finished = play(ForgeSimulator(args.forge_path), args.deck1, args.deck2, args.games, args.workers)
+    rows.append(("jvm per game", elapsed, finished, None))
+
+    # Worker startup counts against the warm run too
+    start = time.time()
+    pool = SimulatorPool(args.forge_path, args.workers)
+    try:
+        _, finished = play(pool, args.deck1, args.deck2, args.games, args.workers)
+    finally:
+        pool.close()
+    rows.append(("warm workers", time.time() - start, finished, pool.stats()))
+
+    print(f"\n{args.games} games, {args.workers} in parallel")
+    print(f"{'mode':<14} {'games':>6} {'seconds':>9} {'games/hour':>11} {'startup s':>10}")
+    for mode, elapsed, finished, stats in rows:
+        startup = stats['mean_startup_seconds'] if stats else None
+        print(f"{mode:<14} {finished:>6} {elapsed:>9.1f} {finished / elapsed * 3600:>11.0f} "
+              f"{'' if startup is None else f'{startup:.1f}':>10}")
+    cold, warm = rows
+    if cold[2] and warm[2]:
+        print(f"\nwarm workers: {(warm[2] / warm[1]) / (cold[2] / cold[1]):.1f}x the games/hour")
+    return 0 if all(row[2] for row in rows) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Statistics for deck-vs-deck benchmarks.
+
+Win rates are estimated with a Beta posterior (uniform prior): after w wins and
+l losses of deck 1 against deck 2 the win rate is Beta(1 + w, 1 + l), a draw
+counting as half a win for each side. Its central credible interval is the
+range the win rate lies in with the given probability; run_benchmark.py stops
+a configuration early once that interval is narrow enough (WinRateStopper).
+Ratings of many decks from their pairwise results (run_tournament.py) come
+from a Bradley-Terry fit on the Elo scale (elo_ratings). Computed with the
+standard library only.
+"""
+
+import math
+import re
+from collections import defaultdict
+from statistics import NormalDist
+
+# Seat of a player name such as "Ai(1)-Deck-g1_0123abcd" or "LLM(2)-Deck"
+SEAT_REGEX = re.compile(r"^(?:Ai|LLM)\((\d+)\)")
+
+def winner_seat(winner):
+    """Seat number (1, 2, ...) of a winner's player name, or None for a draw or an unknown name"""
+    match = SEAT_REGEX.match(winner or "")
+    return int(match.group(1)) if match else None
+
+def _beta_continued_fraction(a, b, x):
+    # Lentz's method for the continued fraction of the incomplete beta function
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return result
+
+def beta_cdf(x, a, b):
+    """Probability that a Beta(a, b) variable is at most x"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x))
+    # The continued fraction converges quickly on this side of the mean
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - front * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+def beta_quantile(q, a, b):
+    """The x with beta_cdf(x, a, b) == q, by bisection"""
+    low, high = 0.0, 1.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if beta_cdf(middle, a, b) < q:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+def win_rate_interval(wins, losses, draws=0, level=0.95):
+    """
+    Estimate a win rate from game results.
+
+    Args:
+        wins: Games won
+        losses: Games lost
+        draws: Drawn games, half a win and half a loss each
+        level: Probability of the credible interval
+
+    Returns:
+        Tuple of (posterior mean, interval low, interval high)
+    """
+    a = 1.0 + wins + draws / 2
+    b = 1.0 + losses + draws / 2
+    tail = (1.0 - level) / 2
+    return a / (a + b), beta_quantile(tail, a, b), beta_quantile(1.0 - tail, a, b)
+
+# Probability of the interval that must exclude 50% before decide stops. Checking
+# after every game is a repeated test: between equal decks, stopping the first time
+# the 95% interval excludes 50% named a winner in 41% of simulated 400-game runs,
+# the 99.9% interval in 3%.
+DECIDE_LEVEL = 0.999
+
+class WinRateStopper:
+    """
+    Sequential stopping rule for the win rate of deck 1 against deck 2.
+
+    Results are added as they arrive; should_stop() turns true once at least
+    min_games games are in and the credible interval is at most 2 * precision
+    wide, or, with decide, as soon as the much stricter decide_level interval
+    excludes 50% (one deck is better).
+    """
+
+    def __init__(self, precision=0.05, level=0.95, min_games=10, decide=False, decide_level=DECIDE_LEVEL):
+        self.precision = precision
+        self.level = level
+        self.min_games = min_games
+        self.decide = decide
+        self.decide_level = decide_level
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.stopped_after = None
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    def add(self, seat):
+        """Count a game won by seat 1 (deck 1) or 2 (deck 2), or drawn (None)"""
+        if seat == 1:
+            self.wins += 1
+        elif seat == 2:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def interval(self):
+        """Tuple of (win rate, interval low, interval high) of deck 1"""
+        return win_rate_interval(self.wins, self.losses, self.draws, self.level)
+
+    def should_stop(self):
+        """Whether the win rate is determined; remembers the games it took"""
+        if self.stopped_after is None and self.games >= self.min_games:
+            _, low, high = self.interval()
+            if (high - low) / 2 <= self.precision:
+                self.stopped_after = self.games
+            elif self.decide:
+                _, low, high = win_rate_interval(self.wins, self.losses, self.draws, self.decide_level)
+                if low > 0.5 or high < 0.5:
+                    self.stopped_after = self.games
+        return self.stopped_after is not None
+
+    def summary(self):
+        win_rate, low, high = self.interval()
+        return {
+            "games": self.games,
+            "deck1_wins": self.wins,
+            "deck2_wins": self.losses,
+            "draws": self.draws,
+            "deck1_win_rate": win_rate,
+            "credible_interval": [low, high],
+            "credible_level": self.level,
+            "stopped_after": self.stopped_after
+        }
+
+def bradley_terry(results, prior=1.0, iterations=1000):
+    """
+    Fit Bradley-Terry strengths to pairwise results.
+
+    Deck i beats deck j with probability s_i / (s_i + s_j). The strengths are
+    fitted by Hunter's MM iteration; every deck also gets `prior` virtual
+    drawn games against a reference of strength 1, which keeps the strength
+    of a deck that won (or lost) all its games finite.
+
+    Args:
+        results: Dictionary of (deck a, deck b) to (a's wins, b's wins, draws)
+        prior: Virtual drawn games of each deck against the reference
+        iterations: Most MM iterations
+
+    Returns:
+        Dictionary of deck to strength, relative to the reference
+    """
+    decks = sorted({deck for pair in results for deck in pair})
+    games = {deck: defaultdict(float) for deck in decks}
+    scores = {deck: prior / 2 for deck in decks}
+    for (a, b), (wins, losses, draws) in results.items():
+        if a == b:
+            continue
+        games[a][b] += wins + losses + draws
+        games[b][a] += wins + losses + draws
+        scores[a] += wins + draws / 2
+        scores[b] += losses + draws / 2
+
+    strengths = {deck: 1.0 for deck in decks}
+    for _ in range(iterations):
+        updated = {}
+        for deck in decks:
+            denominator = prior / (strengths[deck] + 1.0)
+            denominator += sum(n / (strengths[deck] + strengths[other]) for other, n in games[deck].items())
+            updated[deck] = scores[deck] / denominator
+        change = max(abs(math.log(updated[deck] / strengths[deck])) for deck in decks) if decks else 0.0
+        strengths = updated
+        if change < 1e-9:
+            break
+    return strengths
+
+def elo_ratings(results, level=0.95, prior=1.0, mean=1500.0):
+    """
+    Elo-scale ratings of a Bradley-Terry fit (bradley_terry).
+
+    A 400 point difference is 10:1 odds of winning; the ratings are shifted to
+    average `mean`. The margin is the half-width of an approximate interval
+    with probability `level`, from each deck's Fisher information alone
+    (its opponents' ratings taken as exact).
+
+    Args:
+        results: Dictionary of (deck a, deck b) to (a's wins, b's wins, draws)
+        level: Probability of the rating intervals
+        prior: Virtual drawn games of each deck, as in bradley_terry
+        mean: Average rating
+
+    Returns:
+        Dictionary of deck to (rating, margin)
+    """
+    strengths = bradley_terry(results, prior)
+    if not strengths:
+        return {}
+    logs = {deck: math.log(strength) for deck, strength in strengths.items()}
+    center = sum(logs.values()) / len(logs)
+    information = {deck: prior * strength / (strength + 1.0) ** 2 for deck, strength in strengths.items()}
+    for (a, b), (wins, losses, draws) in results.items():
+        if a == b:
+            continue
+        p = strengths[a] / (strengths[a] + strengths[b])
+        information[a] += (wins + losses + draws) * p * (1.0 - p)
+        information[b] += (wins + losses + draws) * p * (1.0 - p)
+    scale = 400.0 / math.log(10.0)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    return {deck: (mean + scale * (logs[deck] - center), scale * z / math.sqrt(information[deck]))
+            for deck in strengths}
@@ -0,0 +1,139 @@
+"""
+Per-game card text dictionary for the Forge LLM service.
+
+PlayerControllerLLM sends every card's rules text with every decision.
+Inlining it for each card on each prompt would repeat the same paragraphs in
+every message of the conversation window. The card dictionary instead gives
+each distinct card (name and text) of a player's game a stable reference
+number: a prompt defines `#12 Llanowar Elves: {T}: Add {G}.` once, and board
+lines afterwards refer to `Llanowar Elves #12`.
+
+A definition is sent again once the prompt that carried it has dropped out of
+the conversation window, so every reference in a prompt resolves to text the
+LLM can still see. The state is stored with the player's conversation
+(prompt_state), so it resets together with the conversation when a game ends
+or goes idle. Decisions sent in a micro-batch (batching.py) go without the
+conversation, so the batcher renders them without references.
+"""
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger("card_dictionary")
+
+class CardRefs:
+    """Reference numbers and definitions sent so far in one player's conversation"""
+
+    __slots__ = ("refs", "introduced", "prompts", "needed")
+
+    def __init__(self, refs=None, introduced=None, prompts=0):
+        # (name, text) -> reference number
+        self.refs = refs if refs is not None else {}
+        # reference number -> index of the prompt that last carried its definition
+        self.introduced = introduced if introduced is not None else {}
+        self.prompts = prompts
+        # Latest prompts (including the last one) whose definitions the last prompt refers to
+        self.needed = 1
+
+    def copy(self):
+        return CardRefs(dict(self.refs), dict(self.introduced), self.prompts)
+
+def _cards(game_state):
+    """Every card shown on the board: hand, battlefield and opponent battlefields"""
+    yield from game_state.get("hand", [])
+    yield from game_state.get("battlefield", [])
+    for opponent in game_state.get("opponents", []):
+        yield from opponent.get("battlefield", [])
+
+class CardDictionary:
+    """
+    Assigns card text references and decides which definitions a prompt carries.
+
+    Thread-safe. visible_prompts is how many of a player's prompts (including
+    the current one) the conversation window holds.
+    """
+
+    def __init__(self, visible_prompts=5):
+        self.visible_prompts = max(1, visible_prompts)
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.definitions = 0
+        self.reintroduced = 0
+        self.text_chars_sent = 0
+        self.text_chars_inline = 0
+
+    def annotate(self, game_state, previous):
+        """
+        Work out the card references and definitions for a prompt.
+
+        Args:
+            game_state: The /act request
+            previous: CardRefs stored with the player's last prompt, or None
+
+        Returns:
+            Tuple of (card id -> reference number, definition lines, CardRefs to store)
+        """
+        state = previous.copy() if previous is not None else CardRefs()
+        prompt = state.prompts
+        card_refs = {}
+        definitions = []
+        reintroduced = 0
+        inline_chars = 0
+        oldest = prompt
+
+        for card in _cards(game_state):
+            text = " ".join((card.get("text") or "").split())
+            if not text:
+                continue
+            inline_chars += len(text)
+            name = card.get("name", "Unknown Card")
+            ref = state.refs.get((name, text))
+            if ref is None:
+                ref = state.refs[(name, text)] = len(state.refs) + 1
+            card_refs[str(card.get("id"))] = ref
+
+            introduced = state.introduced.get(ref)
+            if introduced is None or prompt - introduced >= self.visible_prompts:
+                definitions.append(f"#{ref} {name}: {text}")
+                state.introduced[ref] = prompt
+                if introduced is not None:
+                    reintroduced += 1
+            oldest = min(oldest, state.introduced[ref])
+        state.prompts = prompt + 1
+        state.needed = prompt - oldest + 1
+
+        with self._lock:
+            self.prompts += 1
+            self.definitions += len(definitions)
+            self.reintroduced += reintroduced
+            self.text_chars_sent += sum(len(line) for line in definitions)
+            self.text_chars_inline += inline_chars
+        return card_refs, definitions, state
+
+    def stats(self):
+        """Definitions sent and card text characters sent vs. inlining text on every card"""
+        with self._lock:
+            return {
+                "visible_prompts": self.visible_prompts,
+                "prompts": self.prompts,
+                "definitions": self.definitions,
+                "reintroduced": self.reintroduced,
+                "text_chars_sent": self.text_chars_sent,
+                "text_chars_inline": self.text_chars_inline,
+                "text_reduction": 1 - self.text_chars_sent / self.text_chars_inline if self.text_chars_inline else 0.0
+            }
+
+def create_card_dictionary(visible_prompts):
+    """
+    Create the card dictionary configured by the environment, or None if disabled.
+
+        CARD_DICTIONARY  include card text in prompts, once per reference (default 0)
+
+    Every request carries at least the player's last `visible_prompts` prompts
+    (ConversationStore.visible_prompts); definitions older than that are sent again.
+    """
+    if os.getenv("CARD_DICTIONARY", "0") == "0":
+        return None
+    logger.info(f"Card dictionary enabled (definitions resent after {max(1, visible_prompts)} prompts)")
+    return CardDictionary(visible_prompts=visible_prompts)
@@ -0,0 +1,180 @@
+"""
+Background conversation log for the Forge LLM service.
+
+Writing every prompt and reply through a logging.FileHandler on the request
+thread makes requests wait on the handler lock and the disk. ConversationLog
+takes structured records (game id, player, context, prompt, reply, latency,
+tokens) on a queue and a background thread writes them as JSON lines:
+
+- in batches (one write per batch_size records or flush_interval)
+- optionally compressed, each batch as its own gzip member or zstd frame, so
+  the file stays readable with zcat / zstdcat and survives a crash mid-file
+- rotated to a new numbered file once max_bytes have been written
+
+log() never blocks: if the queue is full the record is dropped and counted.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger("conversation_log")
+
+EXTENSIONS = {"none": ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+class ConversationLog:
+    """Queue-fed JSONL writer with batching, compression and size-based rotation"""
+
+    def __init__(self, base_path, compression="none", max_bytes=100 * 1024 * 1024,
+                 batch_size=256, flush_interval=0.2, queue_size=10000):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown conversation log compression '{compression}' (expected none, gzip or zstd)")
+        self.base_path = base_path
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._compress = self._compressor(compression)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._index = 0
+        self._file = None
+        self._file_bytes = 0
+        self.path = self._path(0)
+        self.records = 0
+        self.dropped = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="conversation-log")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _compressor(self, compression):
+        if compression == "gzip":
+            return lambda data: gzip.compress(data, compresslevel=6)
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("CONVERSATION_LOG_COMPRESSION=zstd requires the zstandard package")
+            compressor = zstandard.ZstdCompressor()
+            return compressor.compress
+        return None
+
+    def _path(self, index):
+        suffix = f".{index}" if index else ""
+        return f"{self.base_path}{suffix}{EXTENSIONS[self.compression]}"
+
+    def _open(self, path):
+        return open(path, "ab")
+
+    def log(self, record):
+        """Queue a record for writing; returns False if it was dropped"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch).encode("utf-8")
+        if self._compress is not None:
+            data = self._compress(data)
+        try:
+            if self._file is None:
+                self._file = self._open(self.path)
+                self._file_bytes = self._file.tell()
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            logger.error(f"Failed to write conversation log: {e}")
+            return
+        self._file_bytes += len(data)
+        with self._lock:
+            self.records += len(batch)
+            self.batches += 1
+            self.bytes_written += len(data)
+        if self._file_bytes >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        self._index += 1
+        self.path = self._path(self._index)
+        logger.info(f"Rotated conversation log to {self.path}")
+
+    def close(self):
+        """Write out queued records and close the file"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        """Records written and dropped, batches, bytes and current file"""
+        with self._lock:
+            return {
+                "path": self.path,
+                "compression": self.compression,
+                "records": self.records,
+                "dropped": self.dropped,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "bytes_written": self.bytes_written
+            }
+
+def create_conversation_log(base_path):
+    """
+    Create the conversation log configured by the environment.
+
+        CONVERSATION_LOG_COMPRESSION  none, gzip or zstd (default none)
+        CONVERSATION_LOG_MAX_BYTES    rotate after this many bytes (default 100 MB)
+        CONVERSATION_LOG_BATCH        records per write (default 256)
+        CONVERSATION_LOG_FLUSH_MS     longest a record waits to be written (default 200)
+        CONVERSATION_LOG_QUEUE        queued records before new ones are dropped (default 10000)
+    """
+    return ConversationLog(
+        base_path,
+        compression=os.getenv("CONVERSATION_LOG_COMPRESSION", "none").lower(),
+        max_bytes=int(os.getenv("CONVERSATION_LOG_MAX_BYTES", 100 * 1024 * 1024)),
+        batch_size=int(os.getenv("CONVERSATION_LOG_BATCH", 256)),
+        flush_interval=float(os.getenv("CONVERSATION_LOG_FLUSH_MS", 200)) / 1000.0,
+        queue_size=int(os.getenv("CONVERSATION_LOG_QUEUE", 10000))
+    )
@@ -0,0 +1,458 @@
+"""
+Bounded conversation memory for the Forge LLM service.
+
+Replaces the unbounded global conversation_history dict. Each player's
+conversation (player names carry the -<game.id> suffix from SimulateMatch)
+keeps only the messages that can still be sent to the LLM, and whole
+conversations are evicted when:
+
+- their game ends (POST /games/<game_id>/end, sent by run_benchmark.py)
+- they have been idle longer than idle_timeout
+- the store is over max_bytes (least recently used first)
+
+Consecutive prompts for a player are mostly identical boards, so user messages
+are stored as line diffs against the previous prompt; only the oldest prompt of
+each conversation is kept as full text.
+
+Two layouts decide which messages are sent:
+
+- window (default): the system prompt followed by the last `window - 1`
+  messages of the conversation, so every request starts one exchange later
+  than the previous one
+- cache: the system prompt always comes first and the conversation only grows
+  until system prompt and conversation fill the window; then the oldest
+  messages are dropped at once, down to the last `window // 4` prompts. Between
+  those cuts each request begins with the whole previous request, which
+  providers with prefix caching (OpenAI, vLLM, SGLang) serve from cache.
+
+visible_prompts is how many of a player's prompts (including the current one)
+every request is guaranteed to carry; state-diff prompts and card text
+references are sized by it.
+
+SQLiteConversationStore has the same interface but keeps conversations in a
+SQLite file, so several server processes (prefork_server.py) share them.
+"""
+
+import difflib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("conversation_store")
+
+# Run idle eviction at most this often (seconds)
+SWEEP_INTERVAL = 30.0
+
+LAYOUTS = ("window", "cache")
+
+def _request(system_prompt, messages, window):
+    """The system prompt and the conversation messages that fit the window after it"""
+    return [{"role": "system", "content": system_prompt}] + messages[-max(1, window - 1):]
+
+def _visible_prompts(layout, window):
+    """Prompts every request carries at least, including the current one"""
+    if layout == "cache":
+        return max(1, window // 4)
+    return max(1, window // 2)
+
+def _encode_delta(base_lines, lines):
+    """Encode lines as (start, end) slices of base_lines plus runs of new lines"""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append((i1, i2))
+        elif j2 > j1:
+            ops.append(lines[j1:j2])
+    return ops
+
+def _decode_delta(base_lines, ops):
+    lines = []
+    for op in ops:
+        if isinstance(op, tuple):
+            lines.extend(base_lines[op[0]:op[1]])
+        else:
+            lines.extend(op)
+    return lines
+
+def _delta_size(ops):
+    return sum(16 if isinstance(op, tuple) else sum(len(line) + 1 for line in op) for op in ops)
+
+class _Message:
+    """A stored message: full text, or a delta against the previous user message"""
+
+    __slots__ = ("role", "text", "delta", "size")
+
+    def __init__(self, role, text=None, delta=None):
+        self.role = role
+        self.text = text
+        self.delta = delta
+        self.size = len(text) if text is not None else _delta_size(delta)
+
+class _Conversation:
+    __slots__ = ("messages", "last_used", "size", "logical_size", "prompt_state")
+
+    def __init__(self):
+        self.messages = []
+        self.last_used = time.time()
+        self.size = 0
+        self.logical_size = 0
+        # What the last prompt showed, for state-diff prompting (state_delta.py)
+        self.prompt_state = None
+
+class ConversationStore:
+    """
+    Thread-safe, bounded store of per-player conversations.
+
+    add_user_message() returns the messages to send: the system prompt followed
+    by the conversation, at most `window` messages overall, cut according to
+    the layout (see the module docstring).
+    """
+
+    def __init__(self, system_prompt, window=10, idle_timeout=1800.0,
+                 max_bytes=256 * 1024 * 1024, compact=True, layout="window"):
+        self.system_prompt = system_prompt
+        self.window = window
+        self.layout = layout
+        self.visible_prompts = _visible_prompts(layout, window)
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_sweep = time.time()
+        self.evicted_ended = 0
+        self.evicted_idle = 0
+        self.evicted_memory = 0
+
+    def _decode(self, conversation):
+        """Full text of every stored message, oldest first"""
+        texts = []
+        previous_user_lines = None
+        for message in conversation.messages:
+            if message.delta is not None:
+                lines = _decode_delta(previous_user_lines, message.delta)
+                texts.append("\n".join(lines))
+            else:
+                texts.append(message.text)
+                lines = message.text.split("\n")
+            if message.role == "user":
+                previous_user_lines = lines
+        return texts
+
+    def get_prompt_state(self, player_id):
+        """The prompt_state stored with the player's last prompt, or None"""
+        with self._lock:
+            conversation = self._conversations.get(player_id)
+            return conversation.prompt_state if conversation is not None else None
+
+    def add_user_message(self, player_id, text, prompt_state=None):
+        """Store a prompt for the player and return the messages to send to the LLM"""
+        now = time.time()
+        with self._lock:
+            self._sweep_idle(now)
+
+            conversation = self._conversations.get(player_id)
+            if conversation is None:
+                conversation = _Conversation()
+                self._conversations[player_id] = conversation
+            self._conversations.move_to_end(player_id)
+            conversation.last_used = now
+
+            texts = self._decode(conversation)
+            previous_user = next(
+                (t for m, t in zip(reversed(conversation.messages), reversed(texts)) if m.role == "user"),
+                None
+            )
+            if self.compact and previous_user is not None:
+                message = _Message("user", delta=_encode_delta(previous_user.split("\n"), text.split("\n")))
+            else:
+                message = _Message("user", text=text)
+            self._append(conversation, message, len(text))
+            conversation.prompt_state = prompt_state
+            texts.append(text)
+
+            if self.layout == "cache":
+                if len(conversation.messages) >= self.window:
+                    self._trim(conversation, texts, 2 * self.visible_prompts - 1)
+            else:
+                self._trim(conversation, texts, self.window)
+            self._enforce_memory_cap(player_id)
+
+            return _request(
+                self.system_prompt,
+                [{"role": m.role, "content": t} for m, t in zip(conversation.messages, texts)],
+                self.window
+            )
+
+    def add_assistant_message(self, player_id, text):
+        """Store the LLM's reply for the player"""
+        with self._lock:
+            conversation = self._conversations.get(player_id)
+            if conversation is None:
+                return
+            conversation.last_used = time.time()
+            self._append(conversation, _Message("assistant", text=text), len(text))
+            self._trim(conversation, None, self.window)
+
+    def _append(self, conversation, message, logical_size):
+        conversation.messages.append(message)
+        conversation.size += message.size
+        conversation.logical_size += logical_size
+        self._bytes += message.size
+
+    def _trim(self, conversation, texts, keep):
+        """Drop all but the last `keep` messages"""
+        excess = len(conversation.messages) - keep
+        if excess <= 0:
+            return
+        if texts is None:
+            texts = self._decode(conversation)
+        for message, text in zip(conversation.messages[:excess], texts[:excess]):
+            conversation.size -= message.size
+            conversation.logical_size -= len(text)
+            self._bytes -= message.size
+        del conversation.messages[:excess]
+        del texts[:excess]
+
+        # The oldest prompt has nothing left to be a delta against
+        for i, message in enumerate(conversation.messages):
+            if message.role == "user":
+                if message.delta is not None:
+                    full = _Message("user", text=texts[i])
+                    conversation.size += full.size - message.size
+                    self._bytes += full.size - message.size
+                    conversation.messages[i] = full
+                break
+
+    def _remove(self, player_id):
+        conversation = self._conversations.pop(player_id)
+        self._bytes -= conversation.size
+
+    def _sweep_idle(self, now):
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        idle = [pid for pid, c in self._conversations.items() if now - c.last_used > self.idle_timeout]
+        for player_id in idle:
+            self._remove(player_id)
+        if idle:
+            self.evicted_idle += len(idle)
+            logger.info(f"Evicted {len(idle)} idle conversations")
+
+    def _enforce_memory_cap(self, keep_player_id):
+        while self._bytes > self.max_bytes and len(self._conversations) > 1:
+            oldest = next(iter(self._conversations))
+            if oldest == keep_player_id:
+                break
+            self._remove(oldest)
+            self.evicted_memory += 1
+
+    def end_game(self, game_id):
+        """Drop the conversations of every player of a finished game; returns how many"""
+        suffix = f"-{game_id}"
+        with self._lock:
+            ended = [pid for pid in self._conversations if pid == game_id or pid.endswith(suffix)]
+            for player_id in ended:
+                self._remove(player_id)
+            self.evicted_ended += len(ended)
+        return len(ended)
+
+    def stats(self):
+        """Size and eviction counters of the store"""
+        with self._lock:
+            logical = sum(c.logical_size for c in self._conversations.values())
+            return {
+                "layout": self.layout,
+                "visible_prompts": self.visible_prompts,
+                "conversations": len(self._conversations),
+                "messages": sum(len(c.messages) for c in self._conversations.values()),
+                "bytes": self._bytes,
+                "uncompacted_bytes": logical,
+                "max_bytes": self.max_bytes,
+                "evicted_ended": self.evicted_ended,
+                "evicted_idle": self.evicted_idle,
+                "evicted_memory": self.evicted_memory
+            }
+
+class SQLiteConversationStore:
+    """
+    Conversation store shared between processes through a SQLite file.
+
+    Same interface and layouts as ConversationStore. Messages are stored as
+    full text and trimmed on every write; conversations are dropped when their
+    game ends or they go idle.
+    """
+
+    def __init__(self, db_path, system_prompt, window=10, idle_timeout=1800.0, layout="window"):
+        self.db_path = db_path
+        self.system_prompt = system_prompt
+        self.window = window
+        self.layout = layout
+        self.visible_prompts = _visible_prompts(layout, window)
+        self.idle_timeout = idle_timeout
+        self._local = threading.local()
+        self._last_sweep = time.time()
+        self.evicted_ended = 0
+        self.evicted_idle = 0
+
+        db = self._connect()
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations "
+                "(player_id TEXT PRIMARY KEY, last_used REAL NOT NULL, prompt_state BLOB)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "player_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS messages_player ON messages (player_id, id)")
+
+    def _connect(self):
+        """This thread's connection (sqlite3 connections are not shared between threads)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _append(self, db, player_id, role, text):
+        db.execute("INSERT INTO messages (player_id, role, content) VALUES (?, ?, ?)", (player_id, role, text))
+        self._trim(db, player_id, self.window)
+
+    def _trim(self, db, player_id, keep):
+        """Drop all but the player's last `keep` messages"""
+        db.execute(
+            "DELETE FROM messages WHERE player_id = ? AND id NOT IN "
+            "(SELECT id FROM messages WHERE player_id = ? ORDER BY id DESC LIMIT ?)",
+            (player_id, player_id, keep)
+        )
+
+    def get_prompt_state(self, player_id):
+        """The prompt_state stored with the player's last prompt, or None"""
+        row = self._connect().execute(
+            "SELECT prompt_state FROM conversations WHERE player_id = ?", (player_id,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row and row[0] is not None else None
+
+    def add_user_message(self, player_id, text, prompt_state=None):
+        """Store a prompt for the player and return the messages to send to the LLM"""
+        now = time.time()
+        db = self._connect()
+        self._sweep_idle(db, now)
+        with db:
+            db.execute(
+                "INSERT INTO conversations (player_id, last_used, prompt_state) VALUES (?, ?, ?) "
+                "ON CONFLICT (player_id) DO UPDATE SET last_used = excluded.last_used, "
+                "prompt_state = excluded.prompt_state",
+                (player_id, now, pickle.dumps(prompt_state) if prompt_state is not None else None)
+            )
+            self._append(db, player_id, "user", text)
+            rows = db.execute(
+                "SELECT role, content FROM messages WHERE player_id = ? ORDER BY id", (player_id,)
+            ).fetchall()
+            if self.layout == "cache" and len(rows) >= self.window:
+                keep = 2 * self.visible_prompts - 1
+                self._trim(db, player_id, keep)
+                rows = rows[-keep:]
+
+        return _request(self.system_prompt, [{"role": role, "content": content} for role, content in rows],
+                        self.window)
+
+    def add_assistant_message(self, player_id, text):
+        """Store the LLM's reply for the player"""
+        db = self._connect()
+        with db:
+            updated = db.execute(
+                "UPDATE conversations SET last_used = ? WHERE player_id = ?", (time.time(), player_id)
+            ).rowcount
+            if updated:
+                self._append(db, player_id, "assistant", text)
+
+    def _remove(self, db, where, params):
+        players = [row[0] for row in db.execute(f"SELECT player_id FROM conversations WHERE {where}", params)]
+        for player_id in players:
+            db.execute("DELETE FROM messages WHERE player_id = ?", (player_id,))
+            db.execute("DELETE FROM conversations WHERE player_id = ?", (player_id,))
+        return len(players)
+
+    def _sweep_idle(self, db, now):
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        with db:
+            idle = self._remove(db, "last_used < ?", (now - self.idle_timeout,))
+        if idle:
+            self.evicted_idle += idle
+            logger.info(f"Evicted {idle} idle conversations")
+
+    def end_game(self, game_id):
+        """Drop the conversations of every player of a finished game; returns how many"""
+        suffix = f"-{game_id}"
+        db = self._connect()
+        with db:
+            ended = self._remove(db, "player_id = ? OR substr(player_id, -?) = ?", (game_id, len(suffix), suffix))
+        self.evicted_ended += ended
+        return ended
+
+    def stats(self):
+        """Size of the shared store and this process's eviction counters"""
+        db = self._connect()
+        conversations = db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        messages, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM messages").fetchone()
+        return {
+            "store": "sqlite",
+            "layout": self.layout,
+            "visible_prompts": self.visible_prompts,
+            "db_path": self.db_path,
+            "conversations": conversations,
+            "messages": messages,
+            "bytes": size,
+            "evicted_ended": self.evicted_ended,
+            "evicted_idle": self.evicted_idle
+        }
+
+def create_conversation_store(system_prompt, window):
+    """
+    Create the conversation store configured by the environment.
+
+        CONVERSATION_STORE         memory (default) or sqlite (shared between processes)
+        CONVERSATION_DB            SQLite file for the sqlite store (default conversations.db)
+        CONVERSATION_IDLE_TIMEOUT  seconds before an idle conversation is dropped (default 1800)
+        CONVERSATION_MAX_BYTES     memory cap across all conversations (default 256 MB, memory store)
+        CONVERSATION_COMPACT       store prompts as diffs against the previous one (default 1, memory store)
+        PROMPT_LAYOUT              window (default) or cache (stable prefix for provider prompt caching)
+    """
+    store = os.getenv("CONVERSATION_STORE", "memory").lower()
+    layout = os.getenv("PROMPT_LAYOUT", "window").lower()
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown PROMPT_LAYOUT '{layout}' (expected window or cache)")
+    if layout == "cache":
+        logger.info(f"Cache-friendly prompt layout (at least {_visible_prompts(layout, window)} prompts per request)")
+    if store == "sqlite":
+        db_path = os.getenv("CONVERSATION_DB", "conversations.db")
+        logger.info(f"Conversations stored in SQLite file {db_path}")
+        return SQLiteConversationStore(
+            db_path,
+            system_prompt,
+            window=window,
+            idle_timeout=float(os.getenv("CONVERSATION_IDLE_TIMEOUT", 1800)),
+            layout=layout
+        )
+    if store != "memory":
+        raise ValueError(f"Unknown CONVERSATION_STORE '{store}' (expected memory or sqlite)")
+    return ConversationStore(
+        system_prompt,
+        window=window,
+        idle_timeout=float(os.getenv("CONVERSATION_IDLE_TIMEOUT", 1800)),
+        max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", 256 * 1024 * 1024)),
+        compact=os.getenv("CONVERSATION_COMPACT", "1") != "0",
+        layout=layout
+    )
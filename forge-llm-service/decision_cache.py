@@ -0,0 +1,295 @@
+"""
+Decision cache for the Forge LLM service.
+
+Many /act requests are near-identical: priority bouncing back during
+chooseSpellAbilityToPlay with the same hand and board, or mulliganKeepHand with
+the same seven cards across games. The cache canonicalizes the game state into
+a key so repeated states skip the LLM round-trip.
+
+Canonicalization:
+- per-context normalization (mulliganKeepHand only looks at the hand)
+- volatile fields (turn counter, player names with their game.id suffix) dropped
+- lists sorted by content, so zone ordering does not matter
+- card/ability/player ids replaced by ordinals in canonical order
+
+Decisions are stored with their ids translated to the same ordinals and mapped
+back to the ids of the current request on a hit, so a cached decision from one
+game is valid in another. Entries are evicted LRU with a TTL, and can be
+persisted to a SQLite file shared across server restarts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from server_core import GAME_ID_SUFFIX
+
+logger = logging.getLogger("decision_cache")
+
+# Fields that change between otherwise identical decisions
+VOLATILE_KEYS = {"currentTurn"}
+
+# Only these top-level fields matter for some contexts
+CONTEXT_FIELDS = {
+    "mulliganKeepHand": ("context", "hand", "commanders", "cardsToReturn"),
+}
+
+# Decision fields holding ids from the request, by context-independent name
+DECISION_ID_FIELDS = {"spellAbilityId", "chosenAbilityId", "chosenId", "cardId",
+                      "defenderId", "blockerId", "attackerId"}
+DECISION_ID_LIST_FIELDS = {"targets"}
+
+def _strip_ids(value):
+    """Copy of a value with identifiers blanked, used as the sort key for lists"""
+    if isinstance(value, dict):
+        return {k: _strip_ids(v) for k, v in value.items() if k != "id"}
+    if isinstance(value, list):
+        return [_strip_ids(v) for v in value]
+    return value
+
+def _normalize(value, drop_names):
+    """Drop volatile fields, strip game.id suffixes and sort lists by content"""
+    if isinstance(value, dict):
+        result = {}
+        for k, v in value.items():
+            if k in VOLATILE_KEYS or (drop_names and k == "name" and "life" in value):
+                continue
+            result[k] = _normalize(v, drop_names)
+        return result
+    if isinstance(value, list):
+        items = [_normalize(v, drop_names) for v in value]
+        return sorted(items, key=lambda v: json.dumps(_strip_ids(v), sort_keys=True))
+    if isinstance(value, str):
+        return GAME_ID_SUFFIX.sub("", value)
+    return value
+
+def _assign_ordinals(value, ids):
+    """Replace every "id" value by "#<n>", n being its order of first appearance"""
+    if isinstance(value, dict):
+        result = {}
+        for k in sorted(value):
+            v = value[k]
+            if k == "id" and not isinstance(v, (dict, list)):
+                if str(v) not in ids:
+                    ids[str(v)] = (f"#{len(ids)}", v)
+                result[k] = ids[str(v)][0]
+            else:
+                result[k] = _assign_ordinals(v, ids)
+        return result
+    if isinstance(value, list):
+        return [_assign_ordinals(v, ids) for v in value]
+    return value
+
+def canonicalize(game_state):
+    """
+    Build the cache key for a game state.
+
+    Returns:
+        Tuple of (key, ids) where ids maps each of the request's ids, as a
+        string, to (ordinal used in the key, original value)
+    """
+    context = game_state.get("context", "unknown")
+    fields = CONTEXT_FIELDS.get(context)
+    if fields:
+        state = {k: game_state[k] for k in fields if k in game_state}
+    else:
+        state = dict(game_state)
+
+    # Player and opponent names only identify the game; ids stand in for them
+    normalized = _normalize(state, drop_names=True)
+    ids = {}
+    canonical = _assign_ordinals(normalized, ids)
+    digest = hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{context}:{digest}", ids
+
+def _translate_decision(decision, mapping):
+    """
+    Translate the id fields of a decision through mapping.
+
+    Returns:
+        The translated decision, or None if an id is not in the mapping
+    """
+    def translate(v):
+        # -1 and similar sentinels are not ids and pass through unchanged
+        if isinstance(v, int) and v < 0:
+            return v
+        return mapping[str(v)]
+
+    def walk(value):
+        if isinstance(value, dict):
+            result = {}
+            for k, v in value.items():
+                if k in DECISION_ID_FIELDS and isinstance(v, (str, int)) and not isinstance(v, bool):
+                    result[k] = translate(v)
+                elif k in DECISION_ID_LIST_FIELDS and isinstance(v, list):
+                    result[k] = [translate(x) if isinstance(x, (str, int)) else walk(x) for x in v]
+                else:
+                    result[k] = walk(v)
+            return result
+        if isinstance(value, list):
+            return [walk(v) for v in value]
+        return value
+
+    try:
+        return walk(decision)
+    except KeyError:
+        return None
+
+class DecisionCache:
+    """
+    LRU + TTL cache of decisions keyed on canonicalized game state.
+
+    Thread-safe. If db_path is given, entries are also written to a SQLite
+    file and looked up there on a memory miss, so the cache survives restarts
+    and can be shared by several servers on one host.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0, db_path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.untranslatable = 0
+        self.context_hits = defaultdict(int)
+        self.context_misses = defaultdict(int)
+
+        self._db = None
+        if db_path:
+            # Several server processes may write the same file (prefork_server.py)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS decisions "
+                "(key TEXT PRIMARY KEY, decision TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, game_state):
+        """Return the cached decision for this state (with this request's ids), or None"""
+        key, ids = canonicalize(game_state)
+        context = game_state.get("context", "unknown")
+        now = time.time()
+
+        with self._lock:
+            stored = self._lookup(key, now)
+            if stored is None:
+                self.misses += 1
+                self.context_misses[context] += 1
+                return None
+
+            # Ids come back with the type this request used (int or string)
+            ordinal_to_id = {ordinal: raw for ordinal, raw in ids.values()}
+            decision = _translate_decision(stored, ordinal_to_id)
+            if decision is None:
+                self.misses += 1
+                self.context_misses[context] += 1
+                return None
+
+            self.hits += 1
+            self.context_hits[context] += 1
+            return decision
+
+    def put(self, game_state, decision):
+        """Cache a decision for this state; decisions naming unknown ids are skipped"""
+        key, ids = canonicalize(game_state)
+        stored = _translate_decision(decision, {raw: ordinal for raw, (ordinal, _) in ids.items()})
+        if stored is None:
+            with self._lock:
+                self.untranslatable += 1
+            return False
+
+        now = time.time()
+        with self._lock:
+            self._insert(key, stored, now)
+            self.stores += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO decisions (key, decision, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(stored), now)
+                )
+                self._db.commit()
+        return True
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None:
+            created, stored = entry
+            if now - created <= self.ttl:
+                self._entries.move_to_end(key)
+                return stored
+            del self._entries[key]
+            self.expirations += 1
+
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT decision, created FROM decisions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > self.ttl:
+            self._db.execute("DELETE FROM decisions WHERE key = ?", (key,))
+            self._db.commit()
+            self.expirations += 1
+            return None
+        stored = json.loads(row[0])
+        self._insert(key, stored, row[1])
+        self.disk_hits += 1
+        return stored
+
+    def _insert(self, key, stored, created):
+        self._entries[key] = (created, stored)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters and size, overall and per context"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "disk_hits": self.disk_hits,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "untranslatable": self.untranslatable,
+                "contexts": {
+                    context: {"hits": self.context_hits[context], "misses": self.context_misses[context]}
+                    for context in set(self.context_hits) | set(self.context_misses)
+                }
+            }
+
+def create_decision_cache():
+    """
+    Create the decision cache configured by the environment, or None if disabled.
+
+        DECISION_CACHE_SIZE  maximum in-memory entries (0 disables the cache, default)
+        DECISION_CACHE_TTL   entry lifetime in seconds (default 3600)
+        DECISION_CACHE_DB    optional SQLite file persisting entries across restarts
+    """
+    max_size = int(os.getenv("DECISION_CACHE_SIZE", 0))
+    if max_size <= 0:
+        return None
+    ttl = float(os.getenv("DECISION_CACHE_TTL", 3600))
+    db_path = os.getenv("DECISION_CACHE_DB") or None
+    logger.info(f"Decision cache enabled (size {max_size}, ttl {ttl}s, db {db_path})")
+    return DecisionCache(max_size=max_size, ttl=ttl, db_path=db_path)
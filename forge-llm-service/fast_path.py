@@ -0,0 +1,123 @@
+"""
+Fast-path rules for trivial decisions.
+
+Many decisions are forced: there is nothing to play, nothing can attack or
+block, or exactly one legal answer exists. These are answered locally before
+the decision reaches the cache or the LLM, so backend calls are spent only on
+real choices. Each rule looks at one context and returns the decision, or None
+if the decision is a real choice.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger("fast_path")
+
+def _nothing_to_play(game_state):
+    if "availableAbilities" in game_state and not game_state["availableAbilities"]:
+        return {"chosenAbilityId": -1}
+    return None
+
+def _forced_targets(game_state):
+    targets = game_state.get("targets")
+    if not isinstance(targets, dict):
+        return None
+    options = targets.get("options", [])
+    if options and targets.get("min") == targets.get("max") == len(options):
+        return {"targets": [option.get("id") for option in options]}
+    return None
+
+def _no_attackers(game_state):
+    # PlayerControllerLLM sends possibleAttackers; the text format documents attackers.potential
+    potential = game_state.get("possibleAttackers")
+    if potential is None and isinstance(game_state.get("attackers"), dict):
+        potential = game_state["attackers"].get("potential")
+    if potential is not None and not potential:
+        return {"attackers": []}
+    return None
+
+def _no_blockers(game_state):
+    blockers = game_state.get("blockers")
+    if not isinstance(blockers, dict):
+        return None
+    if "potential" in blockers and not blockers["potential"]:
+        return {"blockers": []}
+    if "attackers" in blockers and not blockers["attackers"]:
+        return {"blockers": []}
+    return None
+
+def _single_entity(game_state):
+    options = game_state.get("chooseSingleEntity", {}).get("options", [])
+    if len(options) == 1:
+        return {"chosenId": options[0].get("id")}
+    return None
+
+# Rules by context, as (name, rule) pairs tried in order
+RULES = {
+    "chooseSpellAbilityToPlay": [("nothing_to_play", _nothing_to_play)],
+    "chooseTargets": [("forced_targets", _forced_targets)],
+    "declareAttackers": [("no_attackers", _no_attackers)],
+    "declareBlockers": [("no_blockers", _no_blockers)],
+    "chooseSingleEntity": [("single_entity", _single_entity)],
+}
+
+class FastPath:
+    """Applies the fast-path rules and counts how often each one answers"""
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else RULES
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.answered = 0
+        self.seconds = 0.0
+        self.rule_hits = defaultdict(int)
+
+    def decide(self, game_state):
+        """
+        Answer a trivial decision locally.
+
+        Returns:
+            Tuple of (rule name, decision), or None if the LLM has to decide
+        """
+        start = time.perf_counter()
+        result = None
+        for name, rule in self.rules.get(game_state.get("context", "unknown"), ()):
+            decision = rule(game_state)
+            if decision is not None:
+                result = (name, decision)
+                break
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.checked += 1
+            self.seconds += elapsed
+            if result is not None:
+                self.answered += 1
+                self.rule_hits[result[0]] += 1
+        return result
+
+    def stats(self):
+        """Decisions checked and answered, per rule"""
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "answered": self.answered,
+                "mean_check_us": self.seconds / self.checked * 1e6 if self.checked else 0.0,
+                "rules": {
+                    name: self.rule_hits[name]
+                    for rules in self.rules.values() for name, _ in rules
+                }
+            }
+
+def create_fast_path():
+    """
+    Create the fast-path stage, or None if disabled.
+
+        FAST_PATH  answer forced decisions without the LLM (default 1)
+    """
+    if os.getenv("FAST_PATH", "1") == "0":
+        return None
+    return FastPath()
@@ -0,0 +1,624 @@
+"""
+Pluggable LLM backends for the Forge LLM service.
+
+The servers ask a backend for a chat completion instead of calling openai
+directly, so a deployment can switch between:
+
+- openai:     the OpenAI API (official client, honors OPENAI_BASE_URL)
+- compatible: any OpenAI-compatible HTTP endpoint (vLLM, llama.cpp, Ollama, ...)
+- stub:       an in-process rule engine with simulated latency, jitter and errors,
+              for throughput benchmarks and air-gapped end-to-end runs
+
+Select one with LLM_BACKEND in the environment (or .env). See create_backend()
+for the settings each backend reads.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from server_core import JsonObjectScanner, create_default_response
+
+logger = logging.getLogger("llm_backends")
+
+# Simulated provider prefix cache of the stub backend: prompts are cached in
+# 128-token blocks once at least 1024 tokens match (as OpenAI does)
+STUB_CACHE_BLOCK_CHARS = 512
+STUB_CACHE_MIN_TOKENS = 1024
+STUB_CACHE_MAX_BLOCKS = 65536
+
+CONTEXT_REGEX = re.compile(r"Decision Context: (\w+)")
+
+class BackendError(Exception):
+    """Raised when a backend fails to produce a completion"""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        # Seconds the provider asked to wait before retrying (Retry-After header)
+        self.retry_after = retry_after
+
+def _retry_after(headers):
+    """Seconds of a Retry-After header, or None if absent or not a number"""
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class Completion:
+    """Text and usage of a single chat completion"""
+
+    def __init__(self, text, prompt_tokens=0, completion_tokens=0, latency=0.0, stopped_early=False,
+                 cached_tokens=0, estimated_tokens=False):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        # Prompt tokens the provider served from its prompt cache
+        self.cached_tokens = cached_tokens
+        self.latency = latency
+        # Streamed and cut off once the decision object was complete
+        self.stopped_early = stopped_early
+        # Token counts are local 4 chars/token estimates, not provider usage
+        # (a stream that ended without its usage chunk)
+        self.estimated_tokens = estimated_tokens
+
+class StreamUsage:
+    """Provider usage yielded by _stream()/_astream() when the stream reports it"""
+
+    def __init__(self, prompt_tokens=0, completion_tokens=0, cached_tokens=0):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+
+def _streamed_completion(messages, text, usage, stopped_early=False):
+    """Completion of a stream, with the provider's usage if it arrived before the stream ended"""
+    if usage is None:
+        # Cancelled before the usage chunk (it comes last), or not reported: 4 chars/token estimates
+        return Completion(text, sum(len(m.get("content") or "") for m in messages) // 4, len(text) // 4,
+                          stopped_early=stopped_early, estimated_tokens=True)
+    return Completion(text, usage.prompt_tokens, usage.completion_tokens, stopped_early=stopped_early,
+                      cached_tokens=usage.cached_tokens)
+
+class LLMBackend:
+    """
+    Base class for chat completion backends.
+
+    Subclasses implement _complete() and _acomplete(); complete() and acomplete()
+    add latency measurement around them. game_state is the raw /act request (a
+    list of them for a micro-batch) and is only used by backends that decide
+    without a model (the stub). deadline (time.time() by which the reply is
+    due) is part of the signature for the limiter, batcher and scheduler that
+    wrap a backend; a backend call itself is not interrupted at it.
+
+    With stream=True, backends that implement _stream()/_astream() (generators
+    of text deltas, and a StreamUsage if the provider reports usage) are
+    streamed instead, and the stream is cancelled as soon as the first complete
+    JSON object has arrived; the completion text is then just that object.
+    Without a StreamUsage the token counts are estimated (estimated_tokens).
+    """
+
+    name = "base"
+
+    def __init__(self, model, stream=False):
+        self.model = model
+        self.stream = stream
+
+    def complete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        start = time.perf_counter()
+        if self.stream:
+            completion = self._complete_streaming(messages, temperature, max_tokens, game_state)
+        else:
+            completion = self._complete(messages, temperature, max_tokens, game_state)
+        completion.latency = time.perf_counter() - start
+        return completion
+
+    async def acomplete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        start = time.perf_counter()
+        if self.stream:
+            completion = await self._acomplete_streaming(messages, temperature, max_tokens, game_state)
+        else:
+            completion = await self._acomplete(messages, temperature, max_tokens, game_state)
+        completion.latency = time.perf_counter() - start
+        return completion
+
+    def _complete_streaming(self, messages, temperature, max_tokens, game_state):
+        scanner = JsonObjectScanner()
+        chunks = []
+        usage = None
+        stream = self._stream(messages, temperature, max_tokens, game_state)
+        try:
+            for chunk in stream:
+                if isinstance(chunk, StreamUsage):
+                    usage = chunk
+                    continue
+                chunks.append(chunk)
+                if scanner.feed(chunk) is not None:
+                    return _streamed_completion(messages, scanner.text, usage, stopped_early=True)
+        finally:
+            # Closing the generator closes the HTTP response, cancelling the generation
+            stream.close()
+        return _streamed_completion(messages, "".join(chunks), usage)
+
+    async def _acomplete_streaming(self, messages, temperature, max_tokens, game_state):
+        scanner = JsonObjectScanner()
+        chunks = []
+        usage = None
+        stream = self._astream(messages, temperature, max_tokens, game_state)
+        try:
+            async for chunk in stream:
+                if isinstance(chunk, StreamUsage):
+                    usage = chunk
+                    continue
+                chunks.append(chunk)
+                if scanner.feed(chunk) is not None:
+                    return _streamed_completion(messages, scanner.text, usage, stopped_early=True)
+        finally:
+            await stream.aclose()
+        return _streamed_completion(messages, "".join(chunks), usage)
+
+    def _complete(self, messages, temperature, max_tokens, game_state):
+        raise NotImplementedError
+
+    async def _acomplete(self, messages, temperature, max_tokens, game_state):
+        raise NotImplementedError
+
+    def _stream(self, messages, temperature, max_tokens, game_state):
+        # Backends without streaming yield their whole completion as one chunk
+        completion = self._complete(messages, temperature, max_tokens, game_state)
+        yield completion.text
+        yield StreamUsage(completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+
+    async def _astream(self, messages, temperature, max_tokens, game_state):
+        completion = await self._acomplete(messages, temperature, max_tokens, game_state)
+        yield completion.text
+        yield StreamUsage(completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+
+class OpenAIBackend(LLMBackend):
+    """Backend using the official openai client"""
+
+    name = "openai"
+
+    def __init__(self, model, api_key, base_url=None, timeout=600.0, client_shards=8, stream=False, max_retries=2):
+        super().__init__(model, stream)
+        import openai
+
+        self._openai = openai
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries)
+        # httpx's async connection pool scans every open connection on each
+        # request, which gets quadratic with hundreds in flight, so async calls
+        # are spread round-robin over several smaller pools instead of one.
+        self.client_shards = client_shards
+        self._async_clients = None
+
+    def _async_client(self):
+        if self._async_clients is None:
+            self._async_clients = itertools.cycle([
+                self._openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout,
+                                        max_retries=self.max_retries)
+                for _ in range(self.client_shards)
+            ])
+        return next(self._async_clients)
+
+    def _usage(self, usage):
+        details = getattr(usage, "prompt_tokens_details", None)
+        return StreamUsage(usage.prompt_tokens, usage.completion_tokens,
+                           (getattr(details, "cached_tokens", None) or 0) if details else 0)
+
+    def _to_completion(self, response):
+        usage = self._usage(response.usage) if response.usage else StreamUsage()
+        return Completion(
+            response.choices[0].message.content,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens
+        )
+
+    def _complete(self, messages, temperature, max_tokens, game_state):
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except self._openai.APIStatusError as e:
+            raise BackendError(str(e), e.status_code, _retry_after(e.response.headers)) from e
+        except self._openai.OpenAIError as e:
+            raise BackendError(str(e)) from e
+        return self._to_completion(response)
+
+    async def _acomplete(self, messages, temperature, max_tokens, game_state):
+        try:
+            response = await self._async_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except self._openai.APIStatusError as e:
+            raise BackendError(str(e), e.status_code, _retry_after(e.response.headers)) from e
+        except self._openai.OpenAIError as e:
+            raise BackendError(str(e)) from e
+        return self._to_completion(response)
+
+    def _stream(self, messages, temperature, max_tokens, game_state):
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                # A last chunk with the usage, which arrives only if the stream is not cancelled first
+                stream_options={"include_usage": True}
+            )
+            try:
+                for event in stream:
+                    if event.choices and event.choices[0].delta.content:
+                        yield event.choices[0].delta.content
+                    if event.usage:
+                        yield self._usage(event.usage)
+            finally:
+                stream.close()
+        except self._openai.APIStatusError as e:
+            raise BackendError(str(e), e.status_code, _retry_after(e.response.headers)) from e
+        except self._openai.OpenAIError as e:
+            raise BackendError(str(e)) from e
+
+    async def _astream(self, messages, temperature, max_tokens, game_state):
+        try:
+            stream = await self._async_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                # A last chunk with the usage, which arrives only if the stream is not cancelled first
+                stream_options={"include_usage": True}
+            )
+            try:
+                async for event in stream:
+                    if event.choices and event.choices[0].delta.content:
+                        yield event.choices[0].delta.content
+                    if event.usage:
+                        yield self._usage(event.usage)
+            finally:
+                await stream.close()
+        except self._openai.APIStatusError as e:
+            raise BackendError(str(e), e.status_code, _retry_after(e.response.headers)) from e
+        except self._openai.OpenAIError as e:
+            raise BackendError(str(e)) from e
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Backend posting directly to an OpenAI-compatible /chat/completions endpoint"""
+
+    name = "compatible"
+
+    def __init__(self, model, base_url, api_key=None, timeout=600.0, stream=False, stream_usage=True):
+        super().__init__(model, stream)
+        # Ask streams for a usage chunk (stream_options.include_usage); off for servers that reject it
+        self.stream_usage = stream_usage
+        import httpx
+
+        self._httpx = httpx
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self.timeout = timeout
+        self.client = httpx.Client(headers=self.headers, timeout=timeout)
+        self._async_client = None
+
+    def _payload(self, messages, temperature, max_tokens, stream=False):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+            if self.stream_usage:
+                payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _usage(self, usage):
+        return StreamUsage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+                           (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+
+    def _stream_event(self, line):
+        """Text delta or StreamUsage of one server-sent event line, or None"""
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+        event = json.loads(data)
+        choices = event.get("choices") or [{}]
+        delta = choices[0].get("delta", {}).get("content")
+        if not delta and event.get("usage"):
+            return self._usage(event["usage"])
+        return delta
+
+    def _to_completion(self, response):
+        if response.status_code != 200:
+            raise BackendError(f"HTTP {response.status_code}: {response.text[:200]}", response.status_code,
+                               _retry_after(response.headers))
+        body = response.json()
+        usage = self._usage(body.get("usage") or {})
+        return Completion(
+            body["choices"][0]["message"]["content"],
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens
+        )
+
+    def _complete(self, messages, temperature, max_tokens, game_state):
+        try:
+            response = self.client.post(self.url, json=self._payload(messages, temperature, max_tokens))
+        except self._httpx.HTTPError as e:
+            raise BackendError(str(e)) from e
+        return self._to_completion(response)
+
+    async def _acomplete(self, messages, temperature, max_tokens, game_state):
+        if self._async_client is None:
+            self._async_client = self._httpx.AsyncClient(headers=self.headers, timeout=self.timeout)
+        try:
+            response = await self._async_client.post(self.url, json=self._payload(messages, temperature, max_tokens))
+        except self._httpx.HTTPError as e:
+            raise BackendError(str(e)) from e
+        return self._to_completion(response)
+
+    def _stream(self, messages, temperature, max_tokens, game_state):
+        payload = self._payload(messages, temperature, max_tokens, stream=True)
+        try:
+            with self.client.stream("POST", self.url, json=payload) as response:
+                if response.status_code != 200:
+                    response.read()
+                    self._to_completion(response)
+                for line in response.iter_lines():
+                    event = self._stream_event(line)
+                    if event:
+                        yield event
+        except self._httpx.HTTPError as e:
+            raise BackendError(str(e)) from e
+
+    async def _astream(self, messages, temperature, max_tokens, game_state):
+        if self._async_client is None:
+            self._async_client = self._httpx.AsyncClient(headers=self.headers, timeout=self.timeout)
+        payload = self._payload(messages, temperature, max_tokens, stream=True)
+        try:
+            async with self._async_client.stream("POST", self.url, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    self._to_completion(response)
+                async for line in response.aiter_lines():
+                    event = self._stream_event(line)
+                    if event:
+                        yield event
+        except self._httpx.HTTPError as e:
+            raise BackendError(str(e)) from e
+
+# Explanation a verbose model appends after its decision (stub trailing_tokens)
+STUB_TRAILING_WORDS = ("This", "keeps", "mana", "open", "while", "developing", "the", "board", "and",
+                       "pressuring", "the", "opponent", "with", "the", "lowest", "life", "total.")
+
+class StubBackend(LLMBackend):
+    """
+    In-process rule backend with a configurable latency profile.
+
+    Decisions follow create_default_response() (first available option), so
+    games still progress. Each call sleeps for latency_ms plus gaussian jitter
+    plus ms_per_1k_tokens for every 1000 prompt tokens, and fails with
+    error_status at error_rate. A fixed seed makes a run reproducible.
+
+    To model generation time, the reply (the decision plus trailing_tokens words
+    of explanation) is produced at ms_per_output_token; streamed, it arrives
+    one token (about 4 characters) at a time.
+
+    With prefix_cache, the stub models a provider's prompt cache: the longest
+    prefix of the prompt seen in an earlier call is reported as cached tokens
+    and costs no ms_per_1k_tokens time.
+    """
+
+    name = "stub"
+
+    def __init__(self, model="stub", latency_ms=0.0, jitter_ms=0.0, ms_per_1k_tokens=0.0,
+                 error_rate=0.0, error_status=500, seed=None, ms_per_output_token=0.0,
+                 trailing_tokens=0, stream=False, prefix_cache=False):
+        super().__init__(model, stream)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.ms_per_output_token = ms_per_output_token
+        self.trailing_tokens = trailing_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.prefix_cache = prefix_cache
+        # Hashes of cached prompt prefixes, one per block, least recently used first
+        self._prefixes = OrderedDict()
+
+    def _cached_tokens(self, messages):
+        """Tokens of the longest cached prefix of the prompt; caches the prompt's prefixes"""
+        text = "".join(f"{m.get('role')}\n{m.get('content') or ''}\n" for m in messages)
+        digest = hashlib.blake2b(digest_size=16)
+        keys = []
+        for end in range(STUB_CACHE_BLOCK_CHARS, len(text) + 1, STUB_CACHE_BLOCK_CHARS):
+            digest.update(text[end - STUB_CACHE_BLOCK_CHARS:end].encode())
+            keys.append(digest.digest())
+
+        cached = 0
+        with self._lock:
+            for key in keys:
+                if key not in self._prefixes:
+                    break
+                cached += 1
+            for key in keys:
+                self._prefixes[key] = None
+                self._prefixes.move_to_end(key)
+            while len(self._prefixes) > STUB_CACHE_MAX_BLOCKS:
+                self._prefixes.popitem(last=False)
+        cached_tokens = cached * STUB_CACHE_BLOCK_CHARS // 4
+        return cached_tokens if cached_tokens >= STUB_CACHE_MIN_TOKENS else 0
+
+    def _plan(self, messages, game_state):
+        """Decide the delay, failure, reply text and cached tokens for one call"""
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        prompt_tokens = prompt_chars // 4
+        cached_tokens = min(self._cached_tokens(messages), prompt_tokens) if self.prefix_cache else 0
+
+        with self._lock:
+            jitter = self._random.gauss(0.0, self.jitter_ms) if self.jitter_ms else 0.0
+            failed = self._random.random() < self.error_rate
+
+        delay_ms = self.latency_ms + jitter + self.ms_per_1k_tokens * (prompt_tokens - cached_tokens) / 1000.0
+        if failed:
+            return max(delay_ms, 0) / 1000.0, None, (prompt_tokens, cached_tokens)
+
+        if isinstance(game_state, list):
+            # A micro-batch (batching.py): one decision per request, in order
+            decisions = [create_default_response(state.get("context", "unknown"), state) for state in game_state]
+            text = json.dumps({"decisions": decisions})
+        else:
+            if game_state is not None:
+                context = game_state.get("context", "unknown")
+            else:
+                context = "unknown"
+                for message in reversed(messages):
+                    if message.get("role") == "user":
+                        match = CONTEXT_REGEX.search(message.get("content") or "")
+                        if match:
+                            context = match.group(1)
+                        break
+            text = json.dumps(create_default_response(context, game_state or {}))
+        if self.trailing_tokens:
+            words = [STUB_TRAILING_WORDS[i % len(STUB_TRAILING_WORDS)] for i in range(self.trailing_tokens)]
+            text += "\n\n" + " ".join(words)
+        return max(delay_ms, 0) / 1000.0, text, (prompt_tokens, cached_tokens)
+
+    def _tokens(self, text):
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def _result(self, text, usage):
+        if text is None:
+            raise BackendError("Simulated backend error", self.error_status)
+        prompt_tokens, cached_tokens = usage
+        return Completion(text, prompt_tokens=prompt_tokens, completion_tokens=len(self._tokens(text)),
+                          cached_tokens=cached_tokens)
+
+    def _complete(self, messages, temperature, max_tokens, game_state):
+        delay, text, usage = self._plan(messages, game_state)
+        if text is not None:
+            delay += len(self._tokens(text)) * self.ms_per_output_token / 1000.0
+        time.sleep(delay)
+        return self._result(text, usage)
+
+    async def _acomplete(self, messages, temperature, max_tokens, game_state):
+        delay, text, usage = self._plan(messages, game_state)
+        if text is not None:
+            delay += len(self._tokens(text)) * self.ms_per_output_token / 1000.0
+        await asyncio.sleep(delay)
+        return self._result(text, usage)
+
+    def _stream(self, messages, temperature, max_tokens, game_state):
+        delay, text, usage = self._plan(messages, game_state)
+        time.sleep(delay)
+        completion = self._result(text, usage)
+        for token in self._tokens(text):
+            time.sleep(self.ms_per_output_token / 1000.0)
+            yield token
+        # Reported last, like a provider's usage chunk
+        yield StreamUsage(completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+
+    async def _astream(self, messages, temperature, max_tokens, game_state):
+        delay, text, usage = self._plan(messages, game_state)
+        await asyncio.sleep(delay)
+        completion = self._result(text, usage)
+        for token in self._tokens(text):
+            await asyncio.sleep(self.ms_per_output_token / 1000.0)
+            yield token
+        # Reported last, like a provider's usage chunk
+        yield StreamUsage(completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+
+def create_backend(default_model, mock_api_key=None):
+    """
+    Create the backend selected by LLM_BACKEND (openai, compatible or stub).
+
+    Settings read from the environment:
+        LLM_MODEL        model name (defaults to default_model)
+        LLM_TIMEOUT      request timeout in seconds (default 600)
+        LLM_STREAM       stream completions and stop at the first complete JSON object (default 0)
+        openai:          OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_CLIENT_SHARDS,
+                         OPENAI_MAX_RETRIES (client retries, default 2; 0 when ADAPTIVE_LIMIT=1)
+        compatible:      LLM_BASE_URL (required), LLM_API_KEY,
+                         LLM_STREAM_USAGE (ask streams for usage, default 1)
+        stub:            STUB_LATENCY_MS, STUB_JITTER_MS, STUB_MS_PER_1K_TOKENS,
+                         STUB_ERROR_RATE, STUB_ERROR_STATUS, STUB_SEED,
+                         STUB_MS_PER_OUTPUT_TOKEN, STUB_TRAILING_TOKENS,
+                         STUB_PREFIX_CACHE (simulate provider prompt caching, default 0)
+
+    Returns:
+        The backend, or None when the openai backend has no usable API key
+        (the servers then answer every decision with a default response)
+    """
+    backend_name = os.getenv("LLM_BACKEND", "openai").lower()
+    model = os.getenv("LLM_MODEL", default_model)
+    timeout = float(os.getenv("LLM_TIMEOUT", 600))
+    stream = os.getenv("LLM_STREAM", "0") != "0"
+
+    if backend_name == "stub":
+        seed = os.getenv("STUB_SEED")
+        backend = StubBackend(
+            model=model,
+            latency_ms=float(os.getenv("STUB_LATENCY_MS", 0)),
+            jitter_ms=float(os.getenv("STUB_JITTER_MS", 0)),
+            ms_per_1k_tokens=float(os.getenv("STUB_MS_PER_1K_TOKENS", 0)),
+            error_rate=float(os.getenv("STUB_ERROR_RATE", 0)),
+            error_status=int(os.getenv("STUB_ERROR_STATUS", 500)),
+            seed=int(seed) if seed else None,
+            ms_per_output_token=float(os.getenv("STUB_MS_PER_OUTPUT_TOKEN", 0)),
+            trailing_tokens=int(os.getenv("STUB_TRAILING_TOKENS", 0)),
+            stream=stream,
+            prefix_cache=os.getenv("STUB_PREFIX_CACHE", "0") != "0"
+        )
+    elif backend_name == "compatible":
+        base_url = os.getenv("LLM_BASE_URL")
+        if not base_url:
+            raise ValueError("LLM_BACKEND=compatible requires LLM_BASE_URL")
+        backend = OpenAICompatibleBackend(model, base_url, api_key=os.getenv("LLM_API_KEY"),
+                                          timeout=timeout, stream=stream,
+                                          stream_usage=os.getenv("LLM_STREAM_USAGE", "1") != "0")
+    elif backend_name == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key or api_key == mock_api_key:
+            logger.warning("OPENAI_API_KEY not set, decisions will use default responses")
+            return None
+        backend = OpenAIBackend(
+            model, api_key,
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            timeout=timeout,
+            client_shards=int(os.getenv("OPENAI_CLIENT_SHARDS", 8)),
+            stream=stream,
+            # The adaptive limiter retries itself and needs to see rate limit errors
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", 0 if os.getenv("ADAPTIVE_LIMIT", "0") != "0" else 2))
+        )
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend_name}' (expected openai, compatible or stub)")
+
+    logger.info(f"Using {backend.name} backend with model {backend.model}"
+                + (" (streaming)" if stream else ""))
+    return backend
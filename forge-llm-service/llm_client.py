@@ -9,6 +9,10 @@ creating prompts, processing responses, and handling different game contexts.
 import os
 import json
 import logging
+import string
+import threading
+import time
+import httpx
 import openai
 from dotenv import load_dotenv
 
@@ -40,6 +44,23 @@ except Exception as e:
 # Model to use for API calls
 DEFAULT_MODEL = "gpt-4-turbo"
 
+# Connection pool of the shared OpenAI client
+POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", 20))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30))
+# openai's own defaults: 600s per request, 5s to connect
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 600))
+
+# Process-wide OpenAI client, created on first use. The client and its httpx
+# connection pool are thread-safe, so every decision reuses the same
+# keep-alive connections instead of building a client and handshaking per call.
+_client = None
+_client_lock = threading.Lock()
+
+# Per-call latency of OpenAI requests
+_latency_lock = threading.Lock()
+_latency = {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
 # System prompt that explains the task to the LLM
 SYSTEM_PROMPT = """
 You are an expert Magic: The Gathering player helping to play a game through the Forge MTG application.
@@ -78,8 +99,8 @@ Your hand:
 {player_hand}
 
 Based on this information, which ability should you activate?
-Respond with only a JSON object: {"action": "CHOOSE_ABILITY", "abilityId": "<id of chosen ability>"}
-If you want to pass without activating an ability, respond with: {"action": "PASS"}
+Respond with only a JSON object: {{"action": "CHOOSE_ABILITY", "abilityId": "<id of chosen ability>"}}
+If you want to pass without activating an ability, respond with: {{"action": "PASS"}}
 """,
 
     "chooseTargets": """
@@ -103,7 +124,7 @@ Your hand:
 {player_hand}
 
 Based on this information, which target(s) should you choose?
-Respond with only a JSON object: {"action": "CHOOSE_TARGETS", "targetIds": ["<id1>", "<id2>", ...]}
+Respond with only a JSON object: {{"action": "CHOOSE_TARGETS", "targetIds": ["<id1>", "<id2>", ...]}}
 """,
 
     "declareAttackers": """
@@ -127,8 +148,8 @@ Your hand:
 {player_hand}
 
 Based on this information, which creatures should attack?
-Respond with only a JSON object: {"action": "DECLARE_ATTACKERS", "attackers": ["<id1>", "<id2>", ...]}
-If you want to attack with no creatures, respond with: {"action": "DECLARE_ATTACKERS", "attackers": []}
+Respond with only a JSON object: {{"action": "DECLARE_ATTACKERS", "attackers": ["<id1>", "<id2>", ...]}}
+If you want to attack with no creatures, respond with: {{"action": "DECLARE_ATTACKERS", "attackers": []}}
 """,
 
     "declareBlockers": """
@@ -155,8 +176,8 @@ Your hand:
 {player_hand}
 
 Based on this information, how should you block?
-Respond with only a JSON object: {"action": "DECLARE_BLOCKERS", "blocks": [{"blocker": "<blockerId>", "attacker": "<attackerId>"}, ...]}
-If you want to block with no creatures, respond with: {"action": "DECLARE_BLOCKERS", "blocks": []}
+Respond with only a JSON object: {{"action": "DECLARE_BLOCKERS", "blocks": [{{"blocker": "<blockerId>", "attacker": "<attackerId>"}}, ...]}}
+If you want to block with no creatures, respond with: {{"action": "DECLARE_BLOCKERS", "blocks": []}}
 """,
 
     "confirmAction": """
@@ -180,7 +201,7 @@ Your hand:
 {player_hand}
 
 Based on this information, should you confirm or cancel this action?
-Respond with only a JSON object: {"action": "CONFIRM"} or {"action": "CANCEL"}
+Respond with only a JSON object: {{"action": "CONFIRM"}} or {{"action": "CANCEL"}}
 """,
 
     "chooseSingleEntity": """
@@ -204,24 +225,49 @@ Your hand:
 {player_hand}
 
 Based on this information, which entity should you choose?
-Respond with only a JSON object: {"action": "CHOOSE_ENTITY", "entityId": "<id of chosen entity>"}
+Respond with only a JSON object: {{"action": "CHOOSE_ENTITY", "entityId": "<id of chosen entity>"}}
 """
 }
 
+# Templates split once into literal text and field names, so create_prompt
+# fills them with a single join instead of re-parsing them with str.format
+def _compile_template(template):
+    """List of (literal, field name) pairs; field name is None after the last field"""
+    return [(literal, field) for literal, field, _, _ in string.Formatter().parse(template)]
+
+COMPILED_TEMPLATES = {context: _compile_template(template) for context, template in PROMPT_TEMPLATES.items()}
+
+# Rendered card lines by card id and every rendered field, shared across zones
+# and decisions. Ids restart with each Forge game and text-changing effects
+# exist, so the text is part of the key too
+CARD_FRAGMENT_CACHE_SIZE = 8192
+_card_fragments = {}
+
+def _render_card(card):
+    card_type = card.get('type', 'Unknown')
+    if "Creature" in card.get('type', ''):
+        return (f"- {card.get('name', 'Unknown')} ({card_type}) {card.get('power', 0)}/{card.get('toughness', 0)}"
+                f" - {card.get('text', 'No text')}")
+    return f"- {card.get('name', 'Unknown')} ({card_type}) - {card.get('text', 'No text')}"
+
+def format_card(card):
+    """Format one card as a list line, reusing the line rendered for the same card state."""
+    card_id = card.get('id')
+    if card_id is None:
+        return _render_card(card)
+    key = (card_id, card.get('name'), card.get('type'), card.get('power'), card.get('toughness'), card.get('text'))
+    fragment = _card_fragments.get(key)
+    if fragment is None:
+        if len(_card_fragments) >= CARD_FRAGMENT_CACHE_SIZE:
+            _card_fragments.clear()
+        fragment = _card_fragments[key] = _render_card(card)
+    return fragment
+
 def format_card_list(cards):
     """Format a list of cards into a readable string."""
     if not cards:
         return "None"
-    
-    result = []
-    for card in cards:
-        card_desc = f"- {card.get('name', 'Unknown')} ({card.get('type', 'Unknown')})"
-        if "Creature" in card.get('type', ''):
-            card_desc += f" {card.get('power', 0)}/{card.get('toughness', 0)}"
-        card_desc += f" - {card.get('text', 'No text')}"
-        result.append(card_desc)
-    
-    return "\n".join(result)
+    return "\n".join([format_card(card) for card in cards])
 
 def format_abilities(abilities):
     """Format a list of abilities into a readable string."""
@@ -235,59 +281,78 @@ def format_abilities(abilities):
     
     return "\n".join(result)
 
+def _battlefield_fields(battlefield, context):
+    """
+    Render the player's battlefield in one pass.
+
+    Returns:
+        Tuple of (battlefield text, attackers text or None, blockers text or None);
+        the attacker/blocker lists reuse the battlefield's card lines
+    """
+    if not battlefield:
+        return "None", "None", "None"
+    lines = []
+    attackers = [] if context == "declareAttackers" else None
+    blockers = [] if context == "declareBlockers" else None
+    for card in battlefield:
+        line = format_card(card)
+        lines.append(line)
+        if attackers is not None and card.get("canAttack", False):
+            attackers.append(line)
+        if blockers is not None and card.get("canBlock", False):
+            blockers.append(line)
+    return (
+        "\n".join(lines),
+        "\n".join(attackers) if attackers else "None",
+        "\n".join(blockers) if blockers else "None"
+    )
+
 def create_prompt(game_state):
     """Create a context-specific prompt based on the game state."""
     context = game_state.get("context", "unknown")
     
-    if context not in PROMPT_TEMPLATES:
+    if context not in COMPILED_TEMPLATES:
         logger.warning(f"Unknown context: {context}, using default response")
         return f"Game state has unknown context: {context}. Please provide a valid context."
     
     # Extract common game state information
     player = game_state.get("player", {})
-    player_life = player.get("life", 0)
-    
     game_phase = game_state.get("gamePhase", {})
-    phase = game_phase.get("currentPhase", "UNKNOWN")
-    is_player_turn = "Yes" if game_phase.get("isPlayerTurn", False) else "No"
-    
-    player_battlefield = format_card_list(game_state.get("battlefield", []))
-    player_hand = format_card_list(game_state.get("hand", []))
-    
     opponents = game_state.get("opponents", [])
-    opponent_life = opponents[0].get("life", 0) if opponents else 0
-    opponent_battlefield = format_card_list(opponents[0].get("battlefield", [])) if opponents else "None"
+    player_battlefield, attackers, blockers = _battlefield_fields(game_state.get("battlefield", []), context)
+
+    fields = {
+        "phase": game_phase.get("currentPhase", "UNKNOWN"),
+        "is_player_turn": "Yes" if game_phase.get("isPlayerTurn", False) else "No",
+        "player_life": player.get("life", 0),
+        "opponent_life": opponents[0].get("life", 0) if opponents else 0,
+        "player_battlefield": player_battlefield,
+        "opponent_battlefield": format_card_list(opponents[0].get("battlefield", [])) if opponents else "None",
+        "player_hand": format_card_list(game_state.get("hand", []))
+    }
     
     # Context-specific information
-    context_specific = {}
     if context == "chooseAbility":
-        context_specific["abilities"] = format_abilities(game_state.get("abilities", []))
+        fields["abilities"] = format_abilities(game_state.get("abilities", []))
     elif context == "chooseTargets":
-        context_specific["targets"] = format_card_list(game_state.get("targets", []))
+        fields["targets"] = format_card_list(game_state.get("targets", []))
     elif context == "declareAttackers":
-        context_specific["attackers"] = format_card_list([c for c in game_state.get("battlefield", []) if c.get("canAttack", False)])
+        fields["attackers"] = attackers
     elif context == "declareBlockers":
-        context_specific["attackers"] = format_card_list(game_state.get("attackers", []))
-        context_specific["blockers"] = format_card_list([c for c in game_state.get("battlefield", []) if c.get("canBlock", False)])
+        fields["attackers"] = format_card_list(game_state.get("attackers", []))
+        fields["blockers"] = blockers
     elif context == "confirmAction":
-        context_specific["action_description"] = game_state.get("actionDescription", "Unknown action")
+        fields["action_description"] = game_state.get("actionDescription", "Unknown action")
     elif context == "chooseSingleEntity":
-        context_specific["choices"] = format_card_list(game_state.get("choices", []))
+        fields["choices"] = format_card_list(game_state.get("choices", []))
     
-    # Combine with template
-    template = PROMPT_TEMPLATES[context]
-    prompt = template.format(
-        phase=phase,
-        is_player_turn=is_player_turn,
-        player_life=player_life,
-        opponent_life=opponent_life,
-        player_battlefield=player_battlefield,
-        opponent_battlefield=opponent_battlefield,
-        player_hand=player_hand,
-        **context_specific
-    )
-    
-    return prompt
+    # Fill the compiled template into one buffer
+    parts = []
+    for literal, field in COMPILED_TEMPLATES[context]:
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(fields[field]))
+    return "".join(parts)
 
 def get_default_response(context):
     """Get a default response for a given context in case of error."""
@@ -306,6 +371,54 @@ def get_default_response(context):
     else:
         return {"action": "PASS", "message": "Default fallback response"}
 
+def get_client():
+    """
+    Get the shared OpenAI client, creating it on first use.
+
+    Pool size and timeouts come from OPENAI_POOL_SIZE, OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_CONNECT_TIMEOUT and OPENAI_TIMEOUT; OPENAI_BASE_URL is honored by the
+    client itself.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                timeout = httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+                _client = openai.OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    timeout=timeout,
+                    http_client=httpx.Client(
+                        timeout=timeout,
+                        limits=httpx.Limits(
+                            max_connections=POOL_SIZE,
+                            max_keepalive_connections=POOL_SIZE,
+                            keepalive_expiry=KEEPALIVE_EXPIRY
+                        )
+                    )
+                )
+                logger.info(f"Created shared OpenAI client (pool size {POOL_SIZE})")
+    return _client
+
+def get_latency_stats():
+    """
+    Get latency statistics of the OpenAI calls made so far.
+
+    Returns:
+        dict: Call and error counts, mean and max latency in seconds
+    """
+    with _latency_lock:
+        stats = dict(_latency)
+    stats["mean_seconds"] = stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0
+    return stats
+
+def _record_latency(seconds, failed):
+    with _latency_lock:
+        _latency["calls"] += 1
+        if failed:
+            _latency["errors"] += 1
+        _latency["total_seconds"] += seconds
+        _latency["max_seconds"] = max(_latency["max_seconds"], seconds)
+
 def get_llm_decision(game_state):
     """
     Get a decision from the LLM based on the game state.
@@ -339,16 +452,23 @@ def get_llm_decision(game_state):
         
         # Make API call to OpenAI
         logger.info(f"Sending request to OpenAI for context: {context}")
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model=DEFAULT_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.2,  # Lower temperature for more deterministic responses
-            max_tokens=500
-        )
+        start = time.perf_counter()
+        try:
+            response = get_client().chat.completions.create(
+                model=DEFAULT_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.2,  # Lower temperature for more deterministic responses
+                max_tokens=500
+            )
+        except Exception:
+            _record_latency(time.perf_counter() - start, failed=True)
+            raise
+        latency = time.perf_counter() - start
+        _record_latency(latency, failed=False)
+        logger.info(f"OpenAI call for context {context} took {latency * 1000:.1f}ms")
         
         # Extract and parse the response
         llm_response_text = response.choices[0].message.content.strip()
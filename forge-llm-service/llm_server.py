@@ -5,9 +5,10 @@ import logging
 import time
 
 from flask import Flask, request, jsonify
-import openai
 from dotenv import load_dotenv
 
+from llm_backends import BackendError, create_backend
+
 # Load environment variables
 load_dotenv()
 
@@ -21,10 +22,10 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 
-# Get OpenAI API key from environment variables
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
-    logger.warning("OPENAI_API_KEY not set. LLM requests will fail.")
+# Select the LLM backend (LLM_BACKEND=openai|compatible|stub)
+backend = create_backend("gpt-4.1-nano")
+if backend is None:
+    logger.warning("No LLM backend available. Requests will get default responses.")
 
 # System prompt for the LLM
 SYSTEM_PROMPT = """
@@ -110,17 +111,20 @@ def act():
             {"role": "user", "content": json.dumps(game_state, indent=2)}
         ]
         
-        # Call the OpenAI API
+        if backend is None:
+            return jsonify(create_default_response(context, game_state))
+        
+        # Call the LLM backend
         try:
-            response = openai.chat.completions.create(
-                model="gpt-4.1-nano",  # Or use a different model as needed
-                messages=messages,
+            completion = backend.complete(
+                messages,
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                game_state=game_state
             )
             
             # Extract the response text
-            response_text = response.choices[0].message.content
+            response_text = completion.text
             logger.debug(f"Raw LLM response: {response_text}")
             
             # Parse the JSON response
@@ -147,8 +151,8 @@ def act():
                 default_response = create_default_response(context, game_state)
                 return jsonify(default_response)
         
-        except openai.error.OpenAIError as e:
-            logger.error(f"OpenAI API error: {e}")
+        except BackendError as e:
+            logger.error(f"LLM backend error: {e}")
             default_response = create_default_response(context, game_state)
             return jsonify(default_response), 500
     
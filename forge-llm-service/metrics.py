@@ -0,0 +1,182 @@
+"""
+Prometheus metrics for the Forge LLM service.
+
+Every /act decision is counted and timed by context, so a long benchmark shows
+which decision types dominate latency and token cost. The servers expose the
+metrics in the Prometheus text format at GET /metrics.
+
+Request outcomes (the `outcome` label of forge_llm_request_seconds):
+    llm         decided by the LLM
+    fast_path   answered by a fast-path rule
+    cache       answered from the decision cache
+    default     default response (no backend, unparsable reply, backend error, overload or
+                deadline)
+    error       the request failed (HTTP 4xx/5xx)
+"""
+
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from server_core import VALID_CONTEXTS
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+REQUEST_SECONDS = Histogram(
+    "forge_llm_request_seconds", "End-to-end /act latency",
+    ["context", "outcome"], buckets=LATENCY_BUCKETS
+)
+BACKEND_SECONDS = Histogram(
+    "forge_llm_backend_seconds", "LLM backend call latency",
+    ["context", "backend"], buckets=LATENCY_BUCKETS
+)
+PROMPT_TOKENS = Histogram(
+    "forge_llm_prompt_tokens", "Prompt tokens per backend call",
+    ["context"], buckets=TOKEN_BUCKETS
+)
+WINDOW_TOKENS = Histogram(
+    "forge_llm_window_tokens", "Tokens in the conversation window sent per request, counted locally",
+    ["context"], buckets=TOKEN_BUCKETS
+)
+OVER_BUDGET = Counter(
+    "forge_llm_over_budget_total", "Requests over their token budget because the prompts they refer to did not fit",
+    ["context"]
+)
+CACHED_PROMPT_TOKENS = Counter(
+    "forge_llm_cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache",
+    ["context"]
+)
+COMPLETION_TOKENS = Histogram(
+    "forge_llm_completion_tokens", "Completion tokens per backend call",
+    ["context"], buckets=TOKEN_BUCKETS
+)
+ESTIMATED_PROMPT_TOKENS = Histogram(
+    "forge_llm_estimated_prompt_tokens", "Estimated prompt tokens per streamed call that ended without provider usage",
+    ["context"], buckets=TOKEN_BUCKETS
+)
+ESTIMATED_COMPLETION_TOKENS = Histogram(
+    "forge_llm_estimated_completion_tokens",
+    "Estimated completion tokens per streamed call that ended without provider usage",
+    ["context"], buckets=TOKEN_BUCKETS
+)
+BACKEND_ERRORS = Counter(
+    "forge_llm_backend_errors_total", "Backend calls that failed",
+    ["context"]
+)
+STREAMS_STOPPED_EARLY = Counter(
+    "forge_llm_streams_stopped_early_total", "Streamed completions cancelled once the decision was complete",
+    ["context"]
+)
+PARSE_FAILURES = Counter(
+    "forge_llm_json_parse_failures_total", "LLM replies without a usable JSON decision",
+    ["context"]
+)
+DEFAULT_RESPONSES = Counter(
+    "forge_llm_default_responses_total", "Decisions answered with the default response",
+    ["context", "reason"]
+)
+CACHE_HITS = Counter(
+    "forge_llm_cache_hits_total", "Decisions answered from the decision cache",
+    ["context"]
+)
+FAST_PATH_ANSWERS = Counter(
+    "forge_llm_fast_path_total", "Decisions answered by a fast-path rule",
+    ["context", "rule"]
+)
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "forge_llm_scheduler_queue_depth", "Decisions waiting for a backend slot",
+    ["priority"], multiprocess_mode="livesum"
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "forge_llm_scheduler_wait_seconds", "Time a decision waited for a backend slot",
+    ["context"], buckets=LATENCY_BUCKETS
+)
+DEADLINES_EXCEEDED = Counter(
+    "forge_llm_deadline_exceeded_total", "Decisions answered with a fallback because their deadline was near",
+    ["context"]
+)
+BACKEND_RETRIES = Counter(
+    "forge_llm_backend_retries_total", "Backend calls retried after an error",
+    ["context", "reason"]
+)
+CONCURRENCY_LIMIT = Gauge(
+    "forge_llm_concurrency_limit", "Adaptive limit on backend calls in flight",
+    multiprocess_mode="livesum"
+)
+
+def context_label(context):
+    """Label value for a context; unknown contexts share one value to bound cardinality"""
+    return context if context in VALID_CONTEXTS else "invalid"
+
+def record_request(context, outcome, t0):
+    """Record the end-to-end latency of a request started at time.time() t0"""
+    REQUEST_SECONDS.labels(context_label(context), outcome).observe(time.time() - t0)
+
+def record_completion(context, backend_name, completion):
+    """Record latency and token usage of a backend call"""
+    context = context_label(context)
+    BACKEND_SECONDS.labels(context, backend_name).observe(completion.latency)
+    if completion.estimated_tokens:
+        # Kept apart so the provider-reported histograms (and the cache hit rate) stay exact
+        ESTIMATED_PROMPT_TOKENS.labels(context).observe(completion.prompt_tokens)
+        ESTIMATED_COMPLETION_TOKENS.labels(context).observe(completion.completion_tokens)
+    else:
+        PROMPT_TOKENS.labels(context).observe(completion.prompt_tokens)
+        CACHED_PROMPT_TOKENS.labels(context).inc(completion.cached_tokens)
+        COMPLETION_TOKENS.labels(context).observe(completion.completion_tokens)
+    if completion.stopped_early:
+        STREAMS_STOPPED_EARLY.labels(context).inc()
+
+def record_window_tokens(context, tokens, over_budget):
+    """Record the tokens of a conversation window fitted to a token budget"""
+    WINDOW_TOKENS.labels(context_label(context)).observe(tokens)
+    if over_budget:
+        OVER_BUDGET.labels(context_label(context)).inc()
+
+def record_default(context, reason):
+    """Count a default response (reason: no_backend, parse_failure, backend_error, overload or deadline)"""
+    DEFAULT_RESPONSES.labels(context_label(context), reason).inc()
+    if reason == "parse_failure":
+        PARSE_FAILURES.labels(context_label(context)).inc()
+    elif reason == "deadline":
+        DEADLINES_EXCEEDED.labels(context_label(context)).inc()
+    elif reason == "backend_error":
+        BACKEND_ERRORS.labels(context_label(context)).inc()
+
+def record_cache_hit(context):
+    CACHE_HITS.labels(context_label(context)).inc()
+
+def record_fast_path(context, rule):
+    FAST_PATH_ANSWERS.labels(context_label(context), rule).inc()
+
+def record_scheduler_wait(context, seconds):
+    SCHEDULER_WAIT_SECONDS.labels(context_label(context)).observe(seconds)
+
+def set_scheduler_queue_depth(priority, depth):
+    SCHEDULER_QUEUE_DEPTH.labels("high" if priority else "normal").set(depth)
+
+def record_retry(context, reason):
+    """Count a retried backend call (reason: overload or error)"""
+    BACKEND_RETRIES.labels(context_label(context), reason).inc()
+
+def set_concurrency_limit(limit):
+    CONCURRENCY_LIMIT.set(limit)
+
+def render_metrics():
+    """
+    Render all metrics in the Prometheus text format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (prefork_server.py workers), the
+    metrics of every worker process are aggregated.
+
+    Returns:
+        Tuple of (body bytes, content type)
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
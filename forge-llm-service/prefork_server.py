@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Multi-worker deployment of the Forge LLM service.
+
+Starts a pool of server processes (async_server.py by default) on internal
+ports and serves the public port with a small router that pins each game to
+one worker: the game.id suffix of the player names in the /act body is hashed
+to pick the worker, so a game's conversation memory and state-diff prompts stay
+in one process while different games spread across all cores.
+
+Shared state:
+- --store sqlite keeps conversations in a SQLite file every worker opens
+  (CONVERSATION_STORE=sqlite), so they survive a worker restart: the router
+  restarts a worker that exits on the same port and WORKER_ID
+- with DECISION_CACHE_SIZE > 0 the decision cache is backed by a shared SQLite
+  file (DECISION_CACHE_DB) unless one is configured already
+- Prometheus metrics of all workers are aggregated at /metrics
+  (PROMETHEUS_MULTIPROC_DIR)
+
+Run with:
+    python prefork_server.py --workers 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import zlib
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from server_core import DEADLINE_HEADER
+
+logger = logging.getLogger("prefork_server")
+
+SERVERS = {
+    "async": "async_server.py",
+    "flask": "test_server.py",
+}
+
+# Seconds between checks of the worker processes
+SUPERVISE_INTERVAL = 1.0
+
+# Any name in the request carries the game's -<game.id> suffix (see GAME_ID_SUFFIX in server_core)
+GAME_ID_BYTES = re.compile(rb"-(g\d+_[0-9a-f]{8})\b")
+PLAYER_NAME_BYTES = re.compile(rb'"name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+class Router:
+    """Forwards requests to worker ports, pinning each game to one worker"""
+
+    def __init__(self, ports):
+        self.ports = ports
+        self._round_robin = itertools.cycle(range(len(ports)))
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=None,
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=256)
+            )
+        return self._client
+
+    def worker_for(self, key):
+        """Worker index for a routing key (game id or player name), round-robin without one"""
+        if key is None:
+            return next(self._round_robin)
+        return zlib.crc32(key) % len(self.ports)
+
+    def routing_key(self, body):
+        """Game id of an /act body, else the first player name in it"""
+        match = GAME_ID_BYTES.search(body)
+        if match:
+            return match.group(1)
+        match = PLAYER_NAME_BYTES.search(body)
+        return match.group(1) if match else None
+
+    async def forward(self, worker, method, path, body=b"", headers=None):
+        url = f"http://127.0.0.1:{self.ports[worker]}{path}"
+        try:
+            response = await self.client().request(method, url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            logger.error(f"Worker {worker} unreachable: {e}")
+            return JSONResponse({"error": f"Worker {worker} unavailable"}, status_code=502)
+        return Response(response.content, status_code=response.status_code,
+                        headers={"Content-Type": response.headers.get("Content-Type", "application/json")})
+
+def create_app(router, supervise=None):
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        task = asyncio.create_task(supervise()) if supervise else None
+        yield
+        if task:
+            task.cancel()
+
+    async def hello(request):
+        return PlainTextResponse(f"LLM Service is running - {len(router.ports)} workers")
+
+    async def act(request):
+        body = await request.body()
+        worker = router.worker_for(router.routing_key(body))
+        headers = {"Content-Type": "application/json"}
+        if DEADLINE_HEADER in request.headers:
+            headers[DEADLINE_HEADER] = request.headers[DEADLINE_HEADER]
+        return await router.forward(worker, "POST", "/act", body, headers)
+
+    async def end_game(request):
+        game_id = request.path_params["game_id"]
+        worker = router.worker_for(game_id.encode("utf-8"))
+        return await router.forward(worker, "POST", f"/games/{game_id}/end")
+
+    async def stats(request):
+        responses = await asyncio.gather(
+            *(router.forward(i, "GET", "/stats") for i in range(len(router.ports)))
+        )
+        return JSONResponse({"workers": [
+            json.loads(r.body) if r.status_code == 200 else None for r in responses
+        ]})
+
+    async def metrics(request):
+        # Every worker renders the metrics of all workers
+        return await router.forward(router.worker_for(None), "GET", "/metrics")
+
+    return Starlette(routes=[
+        Route("/", hello, methods=["GET"]),
+        Route("/act", act, methods=["POST"]),
+        Route("/stats", stats, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/games/{game_id}/end", end_game, methods=["POST"]),
+    ], lifespan=lifespan)
+
+def start_worker(script, index, port, env):
+    """Start worker process index on a port"""
+    return subprocess.Popen(
+        [sys.executable, script],
+        env=dict(env, PORT=str(port), WORKER_ID=str(index)),
+        stdout=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+def start_workers(script, num_workers, base_port, env):
+    """Start the worker processes; returns (processes, ports)"""
+    ports = [base_port + i for i in range(num_workers)]
+    return [start_worker(script, i, port, env) for i, port in enumerate(ports)], ports
+
+async def supervise_workers(script, processes, ports, env, interval=SUPERVISE_INTERVAL):
+    """
+    Restart worker processes that exit, on the same port and WORKER_ID.
+
+    Replaces the entries of processes in place, so stop_workers stops the
+    restarted processes. The games pinned to a worker get 502 responses until
+    its replacement is listening.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        for i, process in enumerate(processes):
+            code = process.poll()
+            if code is not None:
+                logger.error(f"Worker {i} exited with code {code}, restarting it on port {ports[i]}")
+                processes[i] = start_worker(script, i, ports[i], env)
+
+async def wait_for_workers(ports, timeout=60):
+    async with httpx.AsyncClient(timeout=1) as client:
+        for port in ports:
+            for _ in range(int(timeout / 0.2)):
+                try:
+                    await client.get(f"http://127.0.0.1:{port}/")
+                    break
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.2)
+            else:
+                raise RuntimeError(f"Worker on port {port} did not start")
+
+def stop_workers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the LLM service as several worker processes behind a game-sticky router')
+    parser.add_argument('--workers', type=int, default=int(os.getenv("PREFORK_WORKERS", os.cpu_count() or 1)),
+                        help='Worker processes (default: PREFORK_WORKERS or the number of cores)')
+    parser.add_argument('--server', choices=list(SERVERS), default='async', help='Server each worker runs')
+    parser.add_argument('--port', type=int, default=int(os.getenv("PORT", 7861)), help='Public port')
+    parser.add_argument('--worker-base-port', type=int, default=8100, help='First internal worker port')
+    parser.add_argument('--store', choices=['memory', 'sqlite'], default='memory',
+                        help='Conversation store: per-worker memory (sticky routing keeps games local) or shared SQLite')
+    parser.add_argument('--state-dir', default='logs/shared', help='Directory for the shared SQLite files')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # One line per forwarded request would drown the workers' own logs
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    env = dict(os.environ)
+    os.makedirs(args.state_dir, exist_ok=True)
+    if args.store == "sqlite":
+        env["CONVERSATION_STORE"] = "sqlite"
+        env.setdefault("CONVERSATION_DB", os.path.join(args.state_dir, "conversations.db"))
+    if int(env.get("DECISION_CACHE_SIZE", 0)) > 0:
+        env.setdefault("DECISION_CACHE_DB", os.path.join(args.state_dir, "decisions.db"))
+    metrics_dir = tempfile.mkdtemp(prefix="forge-llm-metrics-")
+    env["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    script = SERVERS[args.server]
+    processes, ports = start_workers(script, args.workers, args.worker_base_port, env)
+    try:
+        asyncio.run(wait_for_workers(ports))
+        logger.info(f"Started {args.workers} {args.server} workers on ports {ports[0]}-{ports[-1]}")
+        print(f"Starting LLM service on port {args.port} with {args.workers} workers", flush=True)
+
+        import uvicorn
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        app = create_app(Router(ports), lambda: supervise_workers(script, processes, ports, env))
+        uvicorn.run(app, host="0.0.0.0", port=args.port, log_level="warning", backlog=2048)
+    finally:
+        stop_workers(processes)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Aggregate the game results run_benchmark.py recorded (result_store.py) across runs.
+
+    matchups  games, wins and deck win rate with its credible interval per pairing
+    matrix    win rate of every deck against every other
+    runs      the recorded runs
+
+A deck is a deck name with its controller ("mono-red (llm)"), so AI and LLM
+games of the same deck are kept apart. Win rates count a draw as half a win;
+intervals are Beta posterior credible intervals (benchmark_stats.py).
+
+Example:
+    python query_results.py matchups --deck mono-red --since 2025-01-01
+"""
+
+import argparse
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from benchmark_stats import win_rate_interval
+from run_benchmark import RESULT_DB
+from result_store import ResultStore
+
+def entrant(deck, controller):
+    return f"{deck} ({controller})"
+
+class Matchup:
+    """Results of deck a against deck b, whichever seats they had"""
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.turns = []
+        self.durations = []
+        self.llm_decisions = []
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    def add(self, row, a_seat):
+        if row["winner_seat"] is None:
+            self.draws += 1
+        elif row["winner_seat"] == a_seat:
+            self.wins += 1
+        else:
+            self.losses += 1
+        if row["turns"] is not None:
+            self.turns.append(row["turns"])
+        if row["duration_ms"] is not None:
+            self.durations.append(row["duration_ms"] / 1000)
+        if row["llm_decisions"] is not None:
+            self.llm_decisions.append(row["llm_decisions"])
+
+def mean(values):
+    return sum(values) / len(values) if values else None
+
+def matchups(rows):
+    """Matchups keyed by their (a, b) decks, a sorting first"""
+    result = {}
+    for row in rows:
+        first = entrant(row["seat1_deck"], row["seat1_controller"])
+        second = entrant(row["seat2_deck"], row["seat2_controller"])
+        a, b, a_seat = (first, second, 1) if first <= second else (second, first, 2)
+        if (a, b) not in result:
+            result[(a, b)] = Matchup(a, b)
+        result[(a, b)].add(row, a_seat)
+    return result
+
+def print_matchups(rows, level):
+    print(f"{'deck A':<32} {'deck B':<32} {'games':>6} {'A':>5} {'B':>5} {'draw':>5} "
+          f"{'A win rate':>11} {f'{level:.0%} interval':>15} {'turns':>6} {'secs':>6} {'llm/g':>6}")
+    for (a, b), m in sorted(matchups(rows).items()):
+        rate, low, high = win_rate_interval(m.wins, m.losses, m.draws, level)
+        turns, secs, llm = mean(m.turns), mean(m.durations), mean(m.llm_decisions)
+        print(f"{a[:32]:<32} {b[:32]:<32} {m.games:>6} {m.wins:>5} {m.losses:>5} {m.draws:>5} "
+              f"{(m.wins + m.draws / 2) / m.games:>11.1%} {f'{low:.1%}-{high:.1%}':>15} "
+              f"{'' if turns is None else f'{turns:.0f}':>6} {'' if secs is None else f'{secs:.0f}':>6} "
+              f"{'' if llm is None else f'{llm:.0f}':>6}")
+
+def print_matrix(rows, level):
+    scores = defaultdict(lambda: [0.0, 0])
+    for (a, b), m in matchups(rows).items():
+        scores[(a, b)][0] += m.wins + m.draws / 2
+        scores[(a, b)][1] += m.games
+        if a != b:
+            scores[(b, a)][0] += m.losses + m.draws / 2
+            scores[(b, a)][1] += m.games
+    decks = sorted({deck for pair in scores for deck in pair})
+    width = 12
+    print(f"Win rate of the row deck against the column deck (games); overall with its {level:.0%} interval")
+    print(f"{'':<32} " + " ".join(f"{f'#{i + 1}':>{width}}" for i in range(len(decks))) + f" {'overall':>24}")
+    for i, deck in enumerate(decks):
+        cells = []
+        for other in decks:
+            score, games = scores.get((deck, other), (0, 0))
+            cells.append(f"{f'{score / games:.0%} ({games})' if games else '-':>{width}}")
+        score = sum(scores[(deck, other)][0] for other in decks if other != deck and (deck, other) in scores)
+        games = sum(scores[(deck, other)][1] for other in decks if other != deck and (deck, other) in scores)
+        if games:
+            _, low, high = win_rate_interval(score, games - score, 0, level)
+            overall = f"{score / games:.0%} [{low:.0%}-{high:.0%}] ({games})"
+        else:
+            overall = "-"
+        print(f"{f'#{i + 1} {deck}'[:32]:<32} " + " ".join(cells) + f" {overall:>24}")
+
+def print_runs(store):
+    print(f"{'run':<24} {'started':<20} {'games':>6} {'minutes':>8}  command")
+    for run in store.runs():
+        minutes = (run["last_game"] - run["first_game"]) / 60 if run["games"] else 0
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started"]))
+        print(f"{run['run_id']:<24} {started:<20} {run['games']:>6} {minutes:>8.1f}  {run['command'] or ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate recorded benchmark results across runs')
+    parser.add_argument('view', nargs='?', choices=['matchups', 'matrix', 'runs'], default='matchups')
+    parser.add_argument('--db', default=RESULT_DB, help=f'Result store (default: {RESULT_DB})')
+    parser.add_argument('--deck', action='append', help='Only games with this deck (repeatable)')
+    parser.add_argument('--controllers', help='Only games with these controllers by seat, e.g. ai,llm')
+    parser.add_argument('--run', action='append', help='Only games of this run id (repeatable)')
+    parser.add_argument('--since', help='Only games finished on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--level', type=float, default=0.95, help='Probability of the credible intervals')
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    if args.view == 'runs':
+        print_runs(store)
+        return 0
+
+    conditions, params = [], []
+    if args.deck:
+        marks = ", ".join("?" * len(args.deck))
+        conditions.append(f"(seat1_deck IN ({marks}) OR seat2_deck IN ({marks}))")
+        params += args.deck * 2
+    if args.controllers:
+        first, second = args.controllers.lower().split(",")
+        conditions.append("seat1_controller = ? AND seat2_controller = ?")
+        params += [first, second]
+    if args.run:
+        conditions.append(f"run_id IN ({', '.join('?' * len(args.run))})")
+        params += args.run
+    if args.since:
+        conditions.append("finished >= ?")
+        params.append(datetime.strptime(args.since, "%Y-%m-%d").timestamp())
+    rows = store.games(" AND ".join(conditions), params)
+    if not rows:
+        print(f"No games recorded in {args.db} match")
+        return 1
+
+    print(f"{len(rows)} games")
+    if args.view == 'matrix':
+        print_matrix(rows, args.level)
+    else:
+        print_matchups(rows, args.level)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+Adaptive concurrency, rate limiting and retries for backend calls.
+
+Without them, a burst of parallel games runs into the provider's rate limits
+and every failed call quietly becomes a default response. The AdaptiveLimiter
+sits directly in front of the backend and:
+
+- limits calls in flight with AIMD: the limit grows by one per limit's worth
+  of successful calls that used it (waited for a slot, or ended with every
+  slot taken), so a quiet period does not raise it, and is cut by `backoff` on 429/503 (and by
+  `latency_backoff` when a call is slower than the latency target); calls
+  sent before the last cut do not cut it again
+- spaces calls with a token bucket (rate per second, burst)
+- retries rate-limited, overloaded, 5xx and connection errors with full-jitter
+  exponential backoff, honoring Retry-After, as long as the per-request
+  deadline allows: LLM_DEADLINE_S, or the decision's own deadline (Forge's
+  X-Forge-Deadline-Ms) if that is sooner
+
+When a decision cannot get a slot, a token or a successful retry before its
+deadline, OverloadError is raised and the servers count the default response
+they send as "overload", separately from genuine backend errors.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from llm_backends import BackendError
+from metrics import record_retry, set_concurrency_limit
+
+logger = logging.getLogger("rate_limiting")
+
+# Statuses meaning the provider is overloaded or rate limiting us
+OVERLOAD_STATUSES = frozenset({429, 503, 529})
+# Statuses worth retrying (connection errors have no status and are retried too)
+RETRYABLE_STATUSES = OVERLOAD_STATUSES | {408, 500, 502, 504}
+
+class OverloadError(Exception):
+    """Raised when a call cannot be made or retried within its deadline"""
+
+def _context(game_state):
+    if isinstance(game_state, list):
+        # A micro-batch; labelled by its first decision
+        game_state = game_state[0] if game_state else None
+    return game_state.get("context", "unknown") if isinstance(game_state, dict) else "unknown"
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit, token bucket and retries around a backend.
+
+    Has the same complete()/acomplete() signature as LLMBackend, so it wraps
+    the backend for the micro-batcher, scheduler and servers. deadline, when
+    given, is the time (time.time()) the decision's reply is due; waits and
+    retries stop at it even when it is sooner than LLM_DEADLINE_S.
+    """
+
+    def __init__(self, backend, min_limit=1, max_limit=64, initial_limit=8, backoff=0.5,
+                 latency_target=0.0, latency_backoff=0.9, rate=0.0, burst=None,
+                 max_retries=3, base_delay=0.25, max_delay=8.0, deadline=30.0):
+        self.backend = backend
+        self.name = backend.name
+        self.model = backend.model
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.backoff = backoff
+        self.latency_target = latency_target
+        self.latency_backoff = latency_backoff
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self.calls = 0
+        self.retries = 0
+        self.overloaded = 0
+        self.decreases = 0
+        set_concurrency_limit(self.limit)
+
+    def _slots(self):
+        return int(self.limit)
+
+    # Concurrency limit
+
+    def _try_acquire(self, wake):
+        """Take a slot, or register wake() to be called once one may be free"""
+        with self._lock:
+            if self._in_flight < self._slots():
+                self._in_flight += 1
+                return True
+            self._waiters.append(wake)
+            return False
+
+    def _withdraw(self, wake):
+        """Unregister a waiter that gave up, passing on a wake-up it already got"""
+        with self._lock:
+            try:
+                self._waiters.remove(wake)
+                return
+            except ValueError:
+                pass
+        self._wake()
+
+    def _wake(self):
+        with self._lock:
+            free = self._slots() - self._in_flight
+            wakes = [self._waiters.popleft() for _ in range(min(max(free, 0), len(self._waiters)))]
+        for wake in wakes:
+            wake()
+
+    def _release(self):
+        """Free a slot; returns whether every slot was taken"""
+        with self._lock:
+            saturated = self._in_flight >= self._slots()
+            self._in_flight -= 1
+        self._wake()
+        return saturated
+
+    # AIMD
+
+    def _increase(self):
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            limit = self.limit
+        set_concurrency_limit(limit)
+        self._wake()
+
+    def _decrease(self, started, factor):
+        with self._lock:
+            if started < self._last_decrease:
+                # Sent before the last cut; that cut already accounted for it
+                return
+            self.limit = max(self.min_limit, self.limit * factor)
+            self._last_decrease = time.monotonic()
+            self.decreases += 1
+            limit = self.limit
+        logger.info(f"Backend concurrency limit lowered to {limit:.1f}")
+        set_concurrency_limit(limit)
+
+    def _on_success(self, started, latency, limited):
+        """Adjust the limit after a successful call; limited if the call was held back by the limit"""
+        if self.latency_target and latency > self.latency_target:
+            self._decrease(started, self.latency_backoff)
+        elif limited:
+            # Below the limit the provider has not been tried at it, so there is nothing to probe
+            self._increase()
+
+    # Token bucket
+
+    def _reserve_token(self, deadline):
+        """Seconds to wait for the reserved token, or None if that passes the deadline"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return None
+            self._tokens -= 1
+            return wait
+
+    # Retries
+
+    def _retry_delay(self, error, attempt, started, deadline, context):
+        """Backoff before the next attempt, or None if the error is final"""
+        status = error.status_code
+        overload = status in OVERLOAD_STATUSES
+        if overload:
+            self._decrease(started, self.backoff)
+        if status is not None and status not in RETRYABLE_STATUSES:
+            return None
+        if attempt >= self.max_retries:
+            return None
+        delay = self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+        if time.monotonic() + delay >= deadline:
+            return None
+        with self._lock:
+            self.retries += 1
+        record_retry(context, "overload" if overload else "error")
+        logger.warning(f"Backend error ({status or error}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def _deadline(self, deadline):
+        """
+        Monotonic time a call must be admitted or retried by: self.deadline from
+        now, or the caller's deadline (a time.time() value) if that is sooner
+        """
+        own = time.monotonic() + self.deadline
+        if deadline is None:
+            return own
+        return min(own, time.monotonic() + (deadline - time.time()))
+
+    def _overload(self, message):
+        with self._lock:
+            self.overloaded += 1
+        logger.warning(f"Backend overloaded: {message}")
+        return OverloadError(message)
+
+    # Threaded mode
+
+    def _admit(self, deadline):
+        """Wait for a token and a slot; returns whether a slot had to be waited for"""
+        wait = self._reserve_token(deadline)
+        if wait is None:
+            raise self._overload("rate limit leaves no time before the deadline")
+        time.sleep(wait)
+        waited = False
+        while True:
+            ready = threading.Event()
+            if self._try_acquire(ready.set):
+                return waited
+            waited = True
+            if not ready.wait(deadline - time.monotonic()):
+                self._withdraw(ready.set)
+                raise self._overload("no backend slot before the deadline")
+
+    def complete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        deadline = self._deadline(deadline)
+        context = _context(game_state)
+        attempt = 0
+        while True:
+            waited = self._admit(deadline)
+            started = time.monotonic()
+            with self._lock:
+                self.calls += 1
+            try:
+                completion = self.backend.complete(messages, temperature, max_tokens, game_state=game_state)
+            except BackendError as e:
+                self._release()
+                delay = self._retry_delay(e, attempt, started, deadline, context)
+                if delay is None:
+                    if e.status_code in OVERLOAD_STATUSES:
+                        raise self._overload(f"still rejected after {attempt + 1} attempts: {e}") from e
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self._release()
+                raise
+            saturated = self._release()
+            self._on_success(started, time.monotonic() - started, waited or saturated)
+            return completion
+
+    # Async mode
+
+    async def _aadmit(self, deadline):
+        """Wait for a token and a slot; returns whether a slot had to be waited for"""
+        wait = self._reserve_token(deadline)
+        if wait is None:
+            raise self._overload("rate limit leaves no time before the deadline")
+        await asyncio.sleep(wait)
+        loop = asyncio.get_running_loop()
+        waited = False
+        while True:
+            ready = loop.create_future()
+
+            def wake(ready=ready):
+                loop.call_soon_threadsafe(lambda: ready.done() or ready.set_result(None))
+
+            if self._try_acquire(wake):
+                return waited
+            waited = True
+            try:
+                await asyncio.wait_for(ready, deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                self._withdraw(wake)
+                raise self._overload("no backend slot before the deadline")
+            except asyncio.CancelledError:
+                self._withdraw(wake)
+                raise
+
+    async def acomplete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        deadline = self._deadline(deadline)
+        context = _context(game_state)
+        attempt = 0
+        while True:
+            waited = await self._aadmit(deadline)
+            started = time.monotonic()
+            with self._lock:
+                self.calls += 1
+            try:
+                completion = await self.backend.acomplete(messages, temperature, max_tokens, game_state=game_state)
+            except BackendError as e:
+                self._release()
+                delay = self._retry_delay(e, attempt, started, deadline, context)
+                if delay is None:
+                    if e.status_code in OVERLOAD_STATUSES:
+                        raise self._overload(f"still rejected after {attempt + 1} attempts: {e}") from e
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self._release()
+                raise
+            saturated = self._release()
+            self._on_success(started, time.monotonic() - started, waited or saturated)
+            return completion
+
+    def stats(self):
+        """Current limit, calls in flight and waiting, retries and overloads"""
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "rate": self.rate,
+                "calls": self.calls,
+                "retries": self.retries,
+                "overloaded": self.overloaded,
+                "limit_decreases": self.decreases
+            }
+
+def create_limiter(backend):
+    """
+    Create the adaptive limiter configured by the environment, or None if disabled.
+
+        ADAPTIVE_LIMIT                adaptive concurrency, rate limiting and retries (default 0)
+        ADAPTIVE_MIN_CONCURRENCY      lowest concurrency limit (default 1)
+        ADAPTIVE_MAX_CONCURRENCY      highest concurrency limit (default 64)
+        ADAPTIVE_INITIAL_CONCURRENCY  starting concurrency limit (default 8)
+        ADAPTIVE_LATENCY_TARGET_MS    calls slower than this lower the limit (default 0, off)
+        RATE_LIMIT_RPS                backend calls per second (default 0, unlimited)
+        RATE_LIMIT_BURST              calls allowed at once above the rate (default max(RPS, 1))
+        RETRY_MAX                     retries per decision (default 3)
+        RETRY_BASE_MS                 backoff before the first retry, doubling (default 250)
+        RETRY_MAX_BACKOFF_MS          longest backoff (default 8000)
+        LLM_DEADLINE_S                most time a decision may spend waiting and retrying (default 30)
+    """
+    if backend is None or os.getenv("ADAPTIVE_LIMIT", "0") == "0":
+        return None
+    rate = float(os.getenv("RATE_LIMIT_RPS", 0))
+    burst = os.getenv("RATE_LIMIT_BURST")
+    limiter = AdaptiveLimiter(
+        backend,
+        min_limit=int(os.getenv("ADAPTIVE_MIN_CONCURRENCY", 1)),
+        max_limit=int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", 64)),
+        initial_limit=int(os.getenv("ADAPTIVE_INITIAL_CONCURRENCY", 8)),
+        latency_target=float(os.getenv("ADAPTIVE_LATENCY_TARGET_MS", 0)) / 1000.0,
+        rate=rate,
+        burst=float(burst) if burst else None,
+        max_retries=int(os.getenv("RETRY_MAX", 3)),
+        base_delay=float(os.getenv("RETRY_BASE_MS", 250)) / 1000.0,
+        max_delay=float(os.getenv("RETRY_MAX_BACKOFF_MS", 8000)) / 1000.0,
+        deadline=float(os.getenv("LLM_DEADLINE_S", 30))
+    )
+    logger.info(f"Adaptive backend limiting enabled (limit {limiter.limit:.0f} in "
+                f"{limiter.min_limit}-{limiter.max_limit}, rate {rate or 'unlimited'}/s)")
+    return limiter
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Replay recorded /act traffic (ACT_TRACE=1, see traffic_trace.py) against the service.
+
+Sends every recorded request and game end at its original time offset, or
+--speed times faster (--speed 0 sends as fast as --concurrency allows). A
+player's requests are sent one after another as Forge sends them, and a game
+end waits for the game's outstanding decisions. By default a server is started
+with the in-process stub backend; --url replays against a running one.
+
+Reports throughput, latency per context and how far requests fell behind
+schedule, and compares each reply with the recorded one: the decision
+(parsed JSON) and the HTTP status. --check exits non-zero on any difference,
+which makes a trace recorded against the stub a regression test for server
+changes.
+
+Example:
+    python replay_trace.py 'logs/trace_*.jsonl.gz' --speed 4 --server async
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from bench_server import SERVERS, percentile, start_process, stop_process, wait_for_port
+from server_core import DEADLINE_HEADER, game_id_from_player
+from traffic_trace import read_trace
+
+def parse_json(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+def player_of(record):
+    request = parse_json(record["request"])
+    if isinstance(request, dict):
+        return request.get("player", {}).get("name"), request.get("context", "unknown")
+    return None, "invalid"
+
+class Replay:
+    """Sends trace records on schedule and collects the results"""
+
+    def __init__(self, host, port, speed, concurrency):
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.concurrency = concurrency
+        self.results = []
+
+    def _post(self, path, body, headers):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+        try:
+            conn.request("POST", path, body, headers)
+            response = conn.getresponse()
+            return response.status, response.read().decode("utf-8", "replace")
+        except OSError as e:
+            return None, str(e)
+        finally:
+            conn.close()
+
+    def _send(self, record, context, due, previous):
+        wait(previous)
+        sent = time.perf_counter()
+        if record["kind"] == "end":
+            self._post(f"/games/{record['game_id']}/end", b"", {})
+            return
+        headers = {"Content-Type": "application/json"}
+        if record.get("deadline_ms"):
+            headers[DEADLINE_HEADER] = record["deadline_ms"]
+        status, body = self._post("/act", record["request"].encode("utf-8"), headers)
+        self.results.append({
+            "context": context,
+            "latency": time.perf_counter() - sent,
+            "lag": max(0.0, sent - due),
+            "status": status,
+            "recorded_status": record["status"],
+            "decision": parse_json(body),
+            "recorded_decision": parse_json(record["response"])
+        })
+
+    def run(self, records):
+        """Replay the records; returns elapsed seconds"""
+        last = {}
+        start = time.perf_counter()
+        first = records[0]["t"]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for record in records:
+                due = start + (record["t"] - first) / self.speed if self.speed > 0 else start
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                if record["kind"] == "end":
+                    game_id = record["game_id"]
+                    previous = [f for p, f in last.items() if p == game_id or game_id_from_player(p) == game_id]
+                    executor.submit(self._send, record, None, due, previous)
+                    continue
+                player, context = player_of(record)
+                previous = [last[player]] if player in last else []
+                future = executor.submit(self._send, record, context, due, previous)
+                if player is not None:
+                    last[player] = future
+        return time.perf_counter() - start
+
+def report(results, elapsed, span, show_diffs):
+    """Print latency and differences; returns the number of differing replies"""
+    by_context = defaultdict(list)
+    for result in results:
+        by_context[result["context"]].append(result)
+    latencies = [r["latency"] for r in results]
+    lags = [r["lag"] for r in results]
+    differing = [r for r in results
+                 if r["status"] != r["recorded_status"] or r["decision"] != r["recorded_decision"]]
+
+    print(f"\n{len(results)} requests recorded over {span:.1f}s replayed in {elapsed:.1f}s "
+          f"({len(results) / elapsed if elapsed > 0 else 0:.1f} req/s)")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.1f}ms, p99 {percentile(latencies, 99) * 1000:.1f}ms; "
+          f"behind schedule p50 {percentile(lags, 50) * 1000:.1f}ms, p99 {percentile(lags, 99) * 1000:.1f}ms")
+    print(f"{'context':<26} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'differ':>7} {'errors':>7}")
+    for context, group in sorted(by_context.items()):
+        group_latencies = [r["latency"] for r in group]
+        print(f"{context:<26} {len(group):>9} {percentile(group_latencies, 50) * 1000:>9.1f} "
+              f"{percentile(group_latencies, 99) * 1000:>9.1f} {sum(1 for r in group if r in differing):>7} "
+              f"{sum(1 for r in group if r['status'] != 200):>7}")
+    for result in differing[:show_diffs]:
+        print(f"- {result['context']}: recorded {result['recorded_status']} {result['recorded_decision']}, "
+              f"replayed {result['status']} {result['decision']}")
+    return len(differing)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded /act traffic against the service')
+    parser.add_argument('traces', nargs='+', help='Trace files or glob patterns (logs/trace_*.jsonl.gz)')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed multiple (0: as fast as possible)')
+    parser.add_argument('-c', '--concurrency', type=int, default=256, help='Most requests in flight')
+    parser.add_argument('--url', help='Replay against a running server instead of starting one')
+    parser.add_argument('--server', choices=sorted(SERVERS), default='async', help='Server to start')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Stub backend latency of the started server')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Stub backend latency jitter')
+    parser.add_argument('--port', type=int, default=7995, help='Port of the started server')
+    parser.add_argument('--limit', type=int, help='Replay only the first N records')
+    parser.add_argument('--show-diffs', type=int, default=5, help='Differing replies to print')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 if any reply differs')
+    args = parser.parse_args()
+
+    records = read_trace(args.traces)[:args.limit]
+    if not records:
+        print("No trace records found")
+        return 1
+    span = records[-1]["t"] - records[0]["t"]
+
+    server = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        env = dict(os.environ, PORT=str(args.port), LLM_BACKEND="stub",
+                   STUB_LATENCY_MS=str(args.latency_ms), STUB_JITTER_MS=str(args.jitter_ms))
+        # Replaying must not record a trace of its own
+        env.pop("ACT_TRACE", None)
+        host, port = "127.0.0.1", args.port
+        server = start_process([SERVERS[args.server]], env)
+    try:
+        if server is not None and not wait_for_port(port):
+            print(f"{args.server} server did not start")
+            return 1
+        replay = Replay(host, port, args.speed, args.concurrency)
+        elapsed = replay.run(records)
+    finally:
+        if server is not None:
+            stop_process(server)
+
+    differing = report(replay.results, elapsed, span, args.show_diffs)
+    return 1 if args.check and differing else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
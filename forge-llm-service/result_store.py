@@ -0,0 +1,145 @@
+"""
+Append-only store of benchmark game results.
+
+run_benchmark.py records every finished game in a SQLite file (default
+benchmark_results.db, --result-db) as soon as its result line is printed, so
+results accumulate across runs instead of being overwritten with each
+benchmark_results.json. query_results.py aggregates them.
+
+Each run gets a row in `runs` and each game a row in `games`: the decks and
+controllers by seat, the winner, duration, turns, random seed and, for LLM
+players, the decisions asked of the service. Rows are only ever inserted.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from benchmark_stats import winner_seat
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started REAL NOT NULL, command TEXT, "
+    "settings TEXT)",
+    "CREATE TABLE IF NOT EXISTS games (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL, "
+    "finished REAL NOT NULL, config TEXT, game_id TEXT, game INTEGER, "
+    "seat1_deck TEXT NOT NULL, seat1_controller TEXT NOT NULL, "
+    "seat2_deck TEXT NOT NULL, seat2_controller TEXT NOT NULL, "
+    "winner TEXT, winner_seat INTEGER, draw INTEGER NOT NULL, duration_ms INTEGER, turns INTEGER, seed INTEGER, "
+    "llm_decisions INTEGER, llm_failed_decisions INTEGER)",
+    "CREATE INDEX IF NOT EXISTS games_matchup ON games (seat1_deck, seat2_deck)",
+)
+
+def deck_name(deck):
+    """Deck name of a deck argument: a path's file name without .dck, or the name itself"""
+    name = os.path.basename(deck)
+    return name[:-4] if name.lower().endswith(".dck") else name
+
+class ResultStore:
+    """
+    Game results in a SQLite file.
+
+    Thread-safe: each thread gets its own connection, and WAL mode lets
+    query_results.py read while a benchmark writes.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        db = self._connect()
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+
+    def _connect(self):
+        """This thread's connection (sqlite3 connections are not shared between threads)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def start_run(self, command=None, settings=None):
+        """Register a benchmark run; returns its id"""
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        db = self._connect()
+        with db:
+            db.execute("INSERT INTO runs (run_id, started, command, settings) VALUES (?, ?, ?, ?)",
+                       (run_id, time.time(), command, json.dumps(settings or {})))
+        return run_id
+
+    def record_game(self, run_id, record):
+        """
+        Append a game result.
+
+        Args:
+            run_id: Id from start_run
+            record: Game result record of run_benchmark (parse_result_line fields plus
+                deck1, deck2, controllers, config and finished)
+        """
+        seat = winner_seat(record.get("winner"))
+        db = self._connect()
+        with db:
+            db.execute(
+                "INSERT INTO games (run_id, finished, config, game_id, game, seat1_deck, seat1_controller, "
+                "seat2_deck, seat2_controller, winner, winner_seat, draw, duration_ms, turns, seed, llm_decisions, "
+                "llm_failed_decisions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, record.get("finished", time.time()), record.get("config"), record.get("game_id"),
+                 record.get("game"), deck_name(record["deck1"]), record["controllers"][0],
+                 deck_name(record["deck2"]), record["controllers"][1], record.get("winner"), seat,
+                 1 if record.get("winner") is None else 0, record.get("duration_ms"), record.get("turns"),
+                 record.get("seed"), record.get("llm_decisions"), record.get("llm_failed_decisions"))
+            )
+
+    def earlier_games(self, deck1, deck2, controllers, exclude_run=None):
+        """
+        Winners of the recorded games of a configuration.
+
+        Args:
+            deck1: Deck in seat 1
+            deck2: Deck in seat 2
+            controllers: Controllers by seat
+            exclude_run: Run id whose games are left out (the run asking)
+
+        Returns:
+            Rows with the winner's player name and winner_seat (1, 2, or None for a draw)
+        """
+        return self._connect().execute(
+            "SELECT winner, winner_seat FROM games WHERE seat1_deck = ? AND seat2_deck = ? AND seat1_controller = ? "
+            "AND seat2_controller = ? AND run_id IS NOT ? ORDER BY id",
+            (deck_name(deck1), deck_name(deck2), controllers[0], controllers[1], exclude_run)
+        ).fetchall()
+
+    def matchup_durations(self, controllers):
+        """Mean game duration in ms and game count of each (seat 1 deck, seat 2 deck) with these controllers"""
+        rows = self._connect().execute(
+            "SELECT seat1_deck, seat2_deck, AVG(duration_ms) AS duration_ms, COUNT(*) AS games FROM games "
+            "WHERE seat1_controller = ? AND seat2_controller = ? AND duration_ms IS NOT NULL "
+            "GROUP BY seat1_deck, seat2_deck",
+            (controllers[0], controllers[1])
+        ).fetchall()
+        return {(row["seat1_deck"], row["seat2_deck"]): (row["duration_ms"], row["games"]) for row in rows}
+
+    def games(self, where="", params=()):
+        """Game rows, optionally filtered by an SQL condition on the games table"""
+        query = "SELECT * FROM games" + (f" WHERE {where}" if where else "") + " ORDER BY id"
+        return self._connect().execute(query, params).fetchall()
+
+    def runs(self):
+        """Runs with their game counts, newest first"""
+        return self._connect().execute(
+            "SELECT runs.*, COUNT(games.id) AS games, MIN(games.finished) AS first_game, "
+            "MAX(games.finished) AS last_game FROM runs LEFT JOIN games ON games.run_id = runs.run_id "
+            "GROUP BY runs.run_id ORDER BY runs.started DESC"
+        ).fetchall()
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
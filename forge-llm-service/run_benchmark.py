@@ -5,54 +5,175 @@ import re
 import os
 import sys
 import json
-from collections import defaultdict
+import queue
+import random
+import threading
+from collections import defaultdict, deque
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
 import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Regular expression to extract game results from logs
-GAME_RESULT_REGEX = r"Game Result: Game \d+ ended in \d+ ms\. (.*?) has won!"
-DRAW_RESULT_REGEX = r"Game Result: Game \d+ ended in a Draw!"
+from benchmark_stats import WinRateStopper, winner_seat
+from result_store import ResultStore
+
+# Regular expressions to extract game results from logs
+GAME_RESULT_REGEX = r"Game Result: Game (\d+) ended in (\d+) ms\. (.*?) has won!"
+DRAW_RESULT_REGEX = r"Game Result: Game (\d+) ended in a Draw! Took (\d+) ms\."
+
+# Details the simulator prints before a game's result line
+GAME_STATS_REGEX = r"Game Stats: Game (\d+) took (\d+) turns(?: with seed (-?\d+))?\."
+LLM_STATS_REGEX = r"LLM Stats: Game (\d+) (.*?) made (\d+) decisions, (\d+) failed\."
+
+# Append-only store of every game result (result_store.py)
+RESULT_DB = "benchmark_results.db"
+
+# Output lines kept in memory per simulation, for error reports
+OUTPUT_TAIL_LINES = 50
+
+# LLM service the simulations talk to
+LLM_ENDPOINT = "http://localhost:7861"
+
+# Time the service gets per decision before it answers with a fallback (-Dllm.deadline.ms, 0 for none)
+DECISION_DEADLINE_MS = 0
+
+# Lines of the simulator's worker mode protocol (sim -worker, see SimulateMatch.runWorker)
+WORKER_READY = "SIM WORKER READY"
+WORKER_DONE = "SIM WORKER DONE"
+
+# Time a worker JVM gets to load the card database, and a game to finish
+WORKER_START_TIMEOUT = 300
+GAME_TIMEOUT = 300
+
+def parse_result_line(line):
+    """
+    Parse a game result line of the simulator output.
+    
+    Returns:
+        Dictionary with the game number, winner (None for a draw) and duration,
+        or None if the line is not a game result
+    """
+    match = re.search(GAME_RESULT_REGEX, line)
+    if match:
+        return {"game": int(match.group(1)), "winner": match.group(3), "duration_ms": int(match.group(2))}
+    match = re.search(DRAW_RESULT_REGEX, line)
+    if match:
+        return {"game": int(match.group(1)), "winner": None, "duration_ms": int(match.group(2))}
+    return None
+
+class SimulationOutput:
+    """
+    A simulation's output, consumed line by line as the simulator prints it.
+    
+    Memory stays flat however long the run: game results are parsed as their
+    lines arrive, the full output is appended to the log file (each line tagged
+    with the game id, since parallel games share a log) and only the last
+    OUTPUT_TAIL_LINES lines are kept. The turns, seed and LLM decision counts
+    printed before a result line are added to its record (None from simulators
+    that do not print them).
+    """
+    
+    def __init__(self, game_id=None, log_file=None, on_result=None):
+        self.game_id = game_id
+        self.on_result = on_result
+        self.results = []
+        self.tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.ok = False
+        self._details = {}
+        # Line buffered: each line reaches the shared log in one write
+        self._log = open(log_file, 'a', buffering=1) if log_file else None
+    
+    def feed(self, line):
+        """Consume a line of output"""
+        self.tail.append(line)
+        if self._log:
+            self._log.write(f"[{self.game_id}] {line}" if self.game_id else line)
+        match = re.search(GAME_STATS_REGEX, line)
+        if match:
+            self._details = {"turns": int(match.group(2)),
+                             "seed": int(match.group(3)) if match.group(3) else None,
+                             "llm_decisions": 0, "llm_failed_decisions": 0}
+            return
+        match = re.search(LLM_STATS_REGEX, line)
+        if match and self._details:
+            self._details["llm_decisions"] += int(match.group(3))
+            self._details["llm_failed_decisions"] += int(match.group(4))
+            return
+        record = parse_result_line(line)
+        if record:
+            record.update({"turns": None, "seed": None, "llm_decisions": None, "llm_failed_decisions": None},
+                          **self._details)
+            self._details = {}
+            record["game_id"] = self.game_id
+            self.results.append(record)
+            if self.on_result:
+                self.on_result(record)
+    
+    def text(self):
+        """The last lines of output"""
+        return "".join(self.tail)
+    
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
 
 class ForgeSimulator:
-    def __init__(self, forge_path):
+    def __init__(self, forge_path, decision_deadline_ms=DECISION_DEADLINE_MS):
         self.forge_path = forge_path
+        self.decision_deadline_ms = decision_deadline_ms
+
+    def java_command(self, game_id=None):
+        """The java command line up to the jar, before the simulator's arguments"""
+        # Construct the command using the same approach as run_llm_simulation.sh
+        cmd = [
+            "java",
+            "-Dllm.endpoint=" + LLM_ENDPOINT,
+            "-Dllm.deadline.ms=" + str(self.decision_deadline_ms),
+            "-Djava.net.preferIPv4Stack=true",
+        ]
         
-    def run_simulation(self, deck1, deck2, num_games, controllers, log_file=None, game_id=None):
+        # Add unique game identifier to avoid player name conflicts in parallel runs
+        if game_id:
+            cmd.extend(["-Dgame.id=" + str(game_id)])
+        
+        cmd.extend(["-jar", f"{self.forge_path}/forge-gui-desktop/target/forge-gui-desktop-2.0.04-SNAPSHOT-jar-with-dependencies.jar"])
+        return cmd
+        
+    def run_simulation(self, deck1, deck2, num_games, controllers, log_file=None, game_id=None, on_result=None,
+                       seed=None):
         """
         Run a simulation with the specified decks, number of games, and controller types.
         
+        The output is read line by line while the games run: each game result is
+        parsed (and passed to on_result) as soon as it is printed, the full output
+        goes to log_file, and only its last lines are kept in memory.
+        
         Args:
             deck1: Path or name of the first deck
             deck2: Path or name of the second deck
             num_games: Number of games to simulate
             controllers: List of controller types (e.g., ['ai', 'llm'])
-            log_file: Optional file to save the output
+            log_file: Optional file to append the output to
             game_id: Unique identifier for this game to avoid player name conflicts
+            on_result: Optional function called with each game result record
+            seed: Optional random seed of the first game (game N uses seed + N - 1)
         
         Returns:
-            The raw output of the simulation
+            SimulationOutput with the game results; its ok is False if the simulation failed
         """
-        # Construct the command using the same approach as run_llm_simulation.sh
-        cmd = [
-            "java",
-            "-Dllm.endpoint=http://localhost:7861",
-            "-Djava.net.preferIPv4Stack=true",
-        ]
-        
-        # Add unique game identifier to avoid player name conflicts in parallel runs
-        if game_id:
-            cmd.extend(["-Dgame.id=" + str(game_id)])
-        
-        cmd.extend([
-            "-jar", f"{self.forge_path}/forge-gui-desktop/target/forge-gui-desktop-2.0.04-SNAPSHOT-jar-with-dependencies.jar",
+        cmd = self.java_command(game_id) + [
             "sim",
             "-f", 'Commander',
             "-d", deck1, deck2,
             "-n", str(num_games),
             "-c", ",".join(controllers),
             "-q"  # Quiet mode, only show results
-        ])
+        ]
+        if seed is not None:
+            cmd.extend(["-s", str(seed)])
         
         # Only print command for single games to reduce noise in parallel mode
         if num_games == 1:
@@ -60,63 +181,219 @@ class ForgeSimulator:
         
         # Run the simulation
         start_time = time.time()
+        output = SimulationOutput(game_id, log_file, on_result)
         process = None
+        timed_out = threading.Event()
+        
+        def kill():
+            timed_out.set()
+            process.kill()
+        
         try:
             process = subprocess.Popen(
                 cmd, 
                 stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
+                stderr=subprocess.STDOUT,  # One stream, so neither pipe can fill up unread
                 text=True,
-                bufsize=0  # Unbuffered for better real-time output
+                bufsize=1
             )
             
-            # Use communicate() instead of reading line by line to avoid blocking
-            stdout, stderr = process.communicate(timeout=300)  # 5 minute timeout per game
+            timer = threading.Timer(GAME_TIMEOUT * num_games, kill)
+            timer.start()
+            try:
+                for line in process.stdout:
+                    output.feed(line)
+                process.wait()
+            finally:
+                timer.cancel()
             
             end_time = time.time()
             
+            if timed_out.is_set():
+                print(f"Simulation timed out after {GAME_TIMEOUT * num_games} seconds")
+                return output
+            
             # Check for errors
             if process.returncode != 0:
-                print(f"Error running simulation (return code {process.returncode}): {stderr}")
-                return None
-            
-            # Save to log file if specified
-            if log_file and stdout:
-                with open(log_file, 'a') as f:
-                    f.write(stdout)
+                print(f"Error running simulation (return code {process.returncode}): {output.text()}")
+                return output
             
             if num_games == 1:
                 print(f"Single game simulation completed in {end_time - start_time:.2f} seconds")
             
-            return stdout
+            output.ok = True
+            return output
             
-        except subprocess.TimeoutExpired:
-            print(f"Simulation timed out after 5 minutes")
-            if process:
-                process.kill()
-                process.wait()
-            return None
         except Exception as e:
             print(f"Exception during simulation: {e}")
-            if process:
+            return output
+        finally:
+            output.close()
+            # Ensure process is cleaned up
+            if process and process.poll() is None:
                 try:
                     process.kill()
                     process.wait()
-                except:
+                except OSError:
                     pass
-            return None
+
+class SimulatorWorker:
+    """
+    A long-lived simulator JVM in worker mode (sim -worker) playing one game job at a time.
+    
+    Output lines are read by a background thread, so a job can time out without
+    blocking on the pipe. The JVM exits by itself when our end of its stdin closes.
+    """
+    
+    def __init__(self, cmd):
+        self.started = time.time()
+        self.startup_seconds = None
+        self.ready = False
+        self.jobs = 0
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # Stack traces belong to the game that caused them
+            text=True,
+            bufsize=1
+        )
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+    
+    def _read(self):
+        for line in self.process.stdout:
+            if self.startup_seconds is None and line.startswith(WORKER_READY):
+                self.startup_seconds = time.time() - self.started
+            self.lines.put(line)
+        self.lines.put(None)
+    
+    def _next_line(self, deadline):
+        try:
+            return self.lines.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            raise subprocess.TimeoutExpired(self.process.args, deadline)
+    
+    def play(self, job, output):
+        """
+        Play a game job, feeding its output lines to a SimulationOutput as they arrive.
+        
+        Returns:
+            True if the job finished; False if the worker died or timed out, in
+            which case it must be closed
+        """
+        self.jobs += 1
+        try:
+            if not self.ready:
+                deadline = time.time() + WORKER_START_TIMEOUT
+                while True:
+                    line = self._next_line(deadline)
+                    if line is None:
+                        print(f"Error starting simulator worker (return code {self.process.wait()})")
+                        return False
+                    if line.startswith(WORKER_READY):
+                        break
+                self.ready = True
+            
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+            
+            deadline = time.time() + GAME_TIMEOUT * job["games"]
+            while True:
+                line = self._next_line(deadline)
+                if line is None:
+                    print(f"Error running simulation (worker exited with code {self.process.wait()}): "
+                          f"{output.text()}")
+                    return False
+                if line.startswith(WORKER_DONE):
+                    return True
+                output.feed(line)
+        except subprocess.TimeoutExpired:
+            print(f"Simulation timed out after {GAME_TIMEOUT * job['games']} seconds")
+            return False
+        except OSError as e:
+            print(f"Exception during simulation: {e}")
+            return False
+    
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+class SimulatorPool(ForgeSimulator):
+    """
+    A ForgeSimulator that plays games on `size` warm simulator JVMs.
+    
+    Starting Forge (JVM startup plus loading every card script) takes longer than
+    many AI games; the pool pays it once per worker instead of once per game. A
+    worker that crashes or times out is replaced by a fresh one. Use one worker
+    per parallel game (run_benchmark's max_workers).
+    """
+    
+    def __init__(self, forge_path, size, decision_deadline_ms=DECISION_DEADLINE_MS):
+        super().__init__(forge_path, decision_deadline_ms)
+        self.size = size
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._startup_seconds = []
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+    
+    def _start_worker(self):
+        return SimulatorWorker(self.java_command() + ["sim", "-worker", "-f", "Commander", "-q"])
+    
+    def run_simulation(self, deck1, deck2, num_games, controllers, log_file=None, game_id=None, on_result=None,
+                       seed=None):
+        """Same as ForgeSimulator.run_simulation, on the next idle worker"""
+        job = {"id": game_id or "", "decks": [deck1, deck2], "controllers": controllers, "games": num_games,
+               "seed": seed}
+        output = SimulationOutput(game_id, log_file, on_result)
+        worker = self._idle.get()
+        start_time = time.time()
+        try:
+            output.ok = worker.play(job, output)
+            if worker.jobs == 1 and worker.startup_seconds is not None:
+                with self._lock:
+                    self._startup_seconds.append(worker.startup_seconds)
+            if not output.ok:
+                worker.close()
+                with self._lock:
+                    self.restarts += 1
+                worker = self._start_worker()
         finally:
-            # Ensure process is cleaned up
-            if process and process.poll() is None:
-                try:
-                    process.terminate()
-                    process.wait(timeout=5)
-                except:
-                    try:
-                        process.kill()
-                        process.wait()
-                    except:
-                        pass
+            self._idle.put(worker)
+            output.close()
+        
+        if num_games == 1 and output.ok:
+            print(f"Single game simulation completed in {time.time() - start_time:.2f} seconds")
+        
+        return output
+    
+    def stats(self):
+        """Workers, their mean startup time and how many were replaced"""
+        with self._lock:
+            startups = list(self._startup_seconds)
+        return {
+            "workers": self.size,
+            "worker_starts": len(startups),
+            "mean_startup_seconds": sum(startups) / len(startups) if startups else None,
+            "restarts": self.restarts
+        }
+    
+    def close(self):
+        """Stop the idle workers (call once no game is running)"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
 
 def parse_results(output):
     """
@@ -131,28 +408,45 @@ def parse_results(output):
     if not output:
         return None
     
-    results = {
+    results = new_results()
+    for line in output.splitlines():
+        record = parse_result_line(line)
+        if record:
+            add_result(results, record)
+    return results
+
+def new_results():
+    """Empty win counts and draws of a configuration"""
+    return {
         'wins': defaultdict(int),
         'draws': 0,
         'games': 0
     }
-    
-    # Find all win results
-    win_matches = re.finditer(GAME_RESULT_REGEX, output)
-    for match in win_matches:
-        winner = match.group(1)
-        results['wins'][winner] += 1
-        results['games'] += 1
-    
-    # Find all draw results
-    draw_matches = re.finditer(DRAW_RESULT_REGEX, output)
-    for _ in draw_matches:
+
+def add_result(results, record):
+    """Count a game result record (from parse_result_line) into results"""
+    if record['winner'] is None:
         results['draws'] += 1
-        results['games'] += 1
+    else:
+        results['wins'][record['winner']] += 1
+    results['games'] += 1
+
+def notify_game_end(game_id, endpoint=LLM_ENDPOINT):
+    """
+    Tell the LLM service a game is over so it can drop that game's conversations.
     
-    return results
+    Failures are ignored: the service may not be running (AI-only configs) or may
+    be an older version, in which case its idle timeout cleans up instead.
+    """
+    url = f"{endpoint}/games/{urllib.parse.quote(game_id, safe='')}/end"
+    try:
+        request = urllib.request.Request(url, data=b"", method="POST")
+        urllib.request.urlopen(request, timeout=5).read()
+    except (urllib.error.URLError, OSError):
+        pass
 
-def run_single_game(simulator, deck1, deck2, controllers, game_id, unique_id):
+def run_single_game(simulator, deck1, deck2, controllers, game_id, unique_id, log_file=None, on_result=None,
+                    seed=None):
     """
     Run a single game simulation.
     
@@ -163,16 +457,23 @@ def run_single_game(simulator, deck1, deck2, controllers, game_id, unique_id):
         controllers: List of controller types (e.g., ['ai', 'llm'])
         game_id: Unique identifier for this game (for logging)
         unique_id: Short unique ID for Java system property
+        log_file: Optional file to append the game's output to
+        on_result: Optional function called with the game's result record
+        seed: Optional random seed of the game
     
     Returns:
-        Tuple of (game_id, output) where output is the raw simulation output
+        Tuple of (game_id, output) where output is the SimulationOutput
     """
     print(f"Starting game {game_id} with controllers {controllers}")
-    output = simulator.run_simulation(deck1, deck2, 1, controllers, game_id=unique_id)
+    output = simulator.run_simulation(deck1, deck2, 1, controllers, log_file, unique_id, on_result, seed)
+    if "llm" in controllers:
+        notify_game_end(unique_id)
     print(f"Completed game {game_id}")
     return (game_id, output)
 
-def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_workers=4):
+def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_workers=4,
+                  decision_deadline_ms=DECISION_DEADLINE_MS, warm_workers=False, precision=None,
+                  min_games=10, credible_level=0.95, decide=False, result_db=RESULT_DB, reuse_results=False):
     # Always use Commander format
     game_format = 'Commander'
     """
@@ -185,20 +486,48 @@ def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_worke
         forge_path: Path to the Forge installation
         output_dir: Directory to save output files
         max_workers: Maximum number of parallel simulation processes
+        decision_deadline_ms: Time the LLM service gets per decision (0 for no deadline)
+        warm_workers: Play the games on max_workers long-lived simulator JVMs
+            instead of starting one per game
+        precision: Stop a configuration early once deck 1's win rate is known to
+            within this (credible interval half-width, e.g. 0.05); num_sims is then
+            the most games per configuration. None always plays num_sims games
+        min_games: Games a configuration plays before it may stop early
+        credible_level: Probability of the credible interval
+        decide: Also stop once the 99.9% credible interval (DECIDE_LEVEL) excludes 50%
+        result_db: SQLite file every game result is appended to (None to not record)
+        reuse_results: Count the games of each configuration already in result_db
+            towards num_sims (and the early stopping), playing only the rest
     
     Returns:
         Dictionary containing all results
     """
-    simulator = ForgeSimulator(forge_path)
+    if warm_workers:
+        simulator = SimulatorPool(forge_path, max_workers, decision_deadline_ms)
+    else:
+        simulator = ForgeSimulator(forge_path, decision_deadline_ms)
     
     # Create output directory if specified
+    games_file = None
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
+        # One JSON line per finished game, written as each game ends
+        games_file = open(os.path.join(output_dir, "games.jsonl"), 'a', buffering=1)
+    records_lock = threading.Lock()
+    
+    store = ResultStore(result_db) if result_db else None
+    run_id = None
+    if store:
+        run_id = store.start_run(" ".join(sys.argv), {
+            "deck1": deck1, "deck2": deck2, "num_sims": num_sims, "max_workers": max_workers,
+            "decision_deadline_ms": decision_deadline_ms, "warm_workers": warm_workers, "precision": precision
+        })
+        print(f"Recording results in {result_db} (run {run_id})")
     
     # Define the configurations to test
     configs = [
-        {"name": "Deck1(AI) vs Deck2(AI)", "controllers": ["ai", "ai"], "format": game_format, "log_file": os.path.join(output_dir, "deck1_ai_vs_deck2_ai.log") if output_dir else None},
-        {"name": "Deck2(AI) vs Deck1(AI)", "controllers": ["ai", "ai"], "format": game_format, "log_file": os.path.join(output_dir, "deck2_ai_vs_deck1_ai.log") if output_dir else None},
+        {"name": "Deck1(AI) vs Deck2(AI)", "decks": (deck1, deck2), "controllers": ["ai", "ai"], "format": game_format, "log_file": os.path.join(output_dir, "deck1_ai_vs_deck2_ai.log") if output_dir else None},
+        {"name": "Deck2(AI) vs Deck1(AI)", "decks": (deck2, deck1), "controllers": ["ai", "ai"], "format": game_format, "log_file": os.path.join(output_dir, "deck2_ai_vs_deck1_ai.log") if output_dir else None},
     ]
     
     all_results = {}
@@ -206,54 +535,86 @@ def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_worke
     # Run each configuration in parallel
     for config in configs:
         print(f"\n=== Running configuration: {config['name']} ===")
-        print(f"Running {num_sims} games in parallel with up to {max_workers} workers")
+        seat1_deck, seat2_deck = config['decks']
+        stopper = WinRateStopper(precision, credible_level, min_games, decide) if precision else None
+        
+        def add_seat(seat, config=config, stopper=stopper):
+            # The stopper counts deck 1's wins, whichever seat it has
+            if seat is not None and config['decks'][0] != deck1:
+                seat = 3 - seat
+            stopper.add(seat)
+        
+        # Games of this configuration recorded by earlier runs (not this one)
+        earlier = (store.earlier_games(seat1_deck, seat2_deck, config['controllers'], run_id)
+                   if store and reuse_results else [])
+        if stopper:
+            for game in earlier:
+                add_seat(game['winner_seat'])
+        games_to_run = max(0, num_sims - len(earlier))
+        # Games of num_sims not played because the win rate was determined
+        saved = 0
+        if stopper and stopper.should_stop():
+            saved = games_to_run
+            games_to_run = 0
+        if earlier:
+            print(f"Reusing {len(earlier)} earlier games of this configuration from {result_db}")
+        print(f"Running {games_to_run} games in parallel with up to {max_workers} workers")
         
         # Create tasks for parallel execution
         tasks = []
-        for i in range(num_sims):
+        for i in range(games_to_run):
             # Generate a short unique ID to avoid player name conflicts
             short_uuid = str(uuid.uuid4())[:8]  # Use first 8 chars of UUID
             game_id = f"{config['name']}_game_{i+1}_{short_uuid}"
             unique_id = f"g{i+1}_{short_uuid}"  # Shorter ID for Java system property
-            tasks.append((simulator, deck1, deck2, config['controllers'], game_id, unique_id))
+            # Recorded with the result, so a game can be replayed (sim -s)
+            seed = random.getrandbits(48)
+            tasks.append((simulator, seat1_deck, seat2_deck, config['controllers'], game_id, unique_id, seed))
         
         # Run simulations in parallel
         start_time = time.time()
-        outputs = []
+        results = new_results()
+        
+        def on_result(record, config=config, results=results, stopper=stopper, add_seat=add_seat):
+            # Called from the simulation threads as soon as a game result is printed
+            record = dict(record, config=config['name'], deck1=config['decks'][0], deck2=config['decks'][1],
+                          controllers=config['controllers'], finished=time.time())
+            with records_lock:
+                add_result(results, record)
+                if stopper:
+                    add_seat(winner_seat(record['winner']))
+                outcome = "draw" if record['winner'] is None else f"{record['winner']} won"
+                print(f"Result: {record['game_id']} {outcome} in {record['duration_ms'] / 1000:.1f}s")
+                if games_file:
+                    games_file.write(json.dumps(record) + "\n")
+                if store:
+                    store.record_game(run_id, record)
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submit all tasks
             future_to_game = {
-                executor.submit(run_single_game, *task): task[4] 
+                executor.submit(run_single_game, *task[:6], config['log_file'], on_result, task[6]): task[4] 
                 for task in tasks
             }
             
             # Collect results as they complete with progress tracking
             completed_games = 0
             failed_games = 0
+            stopped = False
             
             try:
-                # Use timeout for individual futures to prevent hanging
-                for future in as_completed(future_to_game, timeout=600):  # 10 minutes total timeout
+                # No total timeout: each game is bounded by GAME_TIMEOUT, so long runs play all their games
+                for future in as_completed(future_to_game):
+                    if future.cancelled():
+                        # Not started: the configuration stopped early
+                        continue
                     try:
                         game_id, output = future.result(timeout=30)  # 30 second timeout for result retrieval
                         completed_games += 1
-                        print(f"Progress: {completed_games}/{num_sims} games completed")
+                        print(f"Progress: {completed_games}/{games_to_run} games completed")
                         
-                        if output:
-                            outputs.append(output)
-                            
-                            # Save individual game output to log file if specified
-                            if config['log_file']:
-                                try:
-                                    with open(config['log_file'], 'a') as f:
-                                        f.write(f"\n=== {game_id} ===\n")
-                                        f.write(output)
-                                        f.write(f"\n=== End {game_id} ===\n\n")
-                                except IOError as e:
-                                    print(f"Warning: Could not write to log file: {e}")
-                        else:
-                            print(f"Warning: No output received for {game_id}")
+                        if not output.ok or not output.results:
+                            print(f"Warning: No result received for {game_id}")
                             failed_games += 1
                             
                     except Exception as e:
@@ -261,6 +622,13 @@ def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_worke
                         print(f"Error in {game_id}: {e}")
                         completed_games += 1
                         failed_games += 1
+                    
+                    with records_lock:
+                        stop = stopper is not None and stopper.should_stop()
+                    if stop and not stopped:
+                        # Games already running finish and count; the rest are not started
+                        stopped = True
+                        saved += sum(1 for pending in future_to_game if pending.cancel())
                         
             except Exception as e:
                 print(f"Error in parallel execution: {e}")
@@ -273,26 +641,52 @@ def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_worke
             print(f"Parallel execution completed: {completed_games} total, {failed_games} failed")
         
         end_time = time.time()
-        print(f"Completed {len(outputs)} games in {end_time - start_time:.2f} seconds")
+        print(f"Completed {results['games']} games in {end_time - start_time:.2f} seconds "
+              f"({results['games'] / (end_time - start_time) * 3600:.0f} games/hour)")
+        
+        # The reused games count towards this configuration's results like its played ones
+        for game in earlier:
+            add_result(results, {'winner': game['winner']})
+        results['reused_games'] = len(earlier)
         
-        # Combine all outputs and parse results
-        if outputs:
-            combined_output = '\n'.join(outputs)
-            results = parse_results(combined_output)
+        if results['games'] > 0:
             all_results[config['name']] = results
             
             # Print summary for this configuration
             print(f"\nResults for {config['name']}:")
-            if results['games'] > 0:
-                for winner, count in results['wins'].items():
-                    print(f"  {winner}: {count} wins ({count/results['games']*100:.1f}%)")
-                if results['draws'] > 0:
-                    print(f"  Draws: {results['draws']} ({results['draws']/results['games']*100:.1f}%)")
-            else:
-                print("  No valid game results found")
+            for winner, count in results['wins'].items():
+                print(f"  {winner}: {count} wins ({count/results['games']*100:.1f}%)")
+            if results['draws'] > 0:
+                print(f"  Draws: {results['draws']} ({results['draws']/results['games']*100:.1f}%)")
+            if earlier:
+                print(f"  Including {len(earlier)} earlier games reused")
+            if stopper:
+                if stopper.stopped_after is None:
+                    saved = 0
+                results['adaptive'] = dict(stopper.summary(), games_saved=saved)
+                win_rate, low, high = stopper.interval()
+                print(f"  Deck 1 win rate: {win_rate*100:.1f}% ({credible_level*100:.0f}% credible interval "
+                      f"{low*100:.1f}%-{high*100:.1f}%)")
+                if stopper.stopped_after is not None:
+                    print(f"  Win rate determined after {stopper.stopped_after} games; "
+                          f"{saved} of {num_sims} games saved")
+                else:
+                    print(f"  Win rate not determined to +/-{precision*100:.1f}% within {num_sims} games")
         else:
             print(f"Failed to get any results for {config['name']}")
     
+    if games_file:
+        games_file.close()
+    if store:
+        store.close()
+    
+    if warm_workers:
+        simulator.close()
+        stats = simulator.stats()
+        if stats['mean_startup_seconds'] is not None:
+            print(f"\nSimulator workers: {stats['workers']}, mean startup {stats['mean_startup_seconds']:.1f}s, "
+                  f"{stats['restarts']} restarted")
+    
     # Calculate overall statistics
     if all_results:
         print("\n=== Overall Benchmark Results ===")
@@ -302,13 +696,17 @@ def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_worke
         total_games = 0
         total_draws = 0
         
-        # Extract deck names from result keys
-        for config_name, results in all_results.items():
+        for config in configs:
+            if config['name'] not in all_results:
+                continue
+            results = all_results[config['name']]
+            # Player names carry their seat (e.g., "LLM(1)-DeckName-g1_abc123"); deck 1 has seat 2 in swapped configurations
+            deck1_seat = 1 if config['decks'][0] == deck1 else 2
             for winner, count in results['wins'].items():
-                # Handle player names with unique suffixes (e.g., "LLM(1)-DeckName-g1_abc123")
-                if ("Ai(1)" in winner or "LLM(1)" in winner) and not ("Ai(10)" in winner or "LLM(10)" in winner):  # Deck 1
+                seat = winner_seat(winner)
+                if seat == deck1_seat:
                     deck1_wins += count
-                elif ("Ai(2)" in winner or "LLM(2)" in winner) and not ("Ai(20)" in winner or "LLM(20)" in winner):  # Deck 2
+                elif seat is not None:
                     deck2_wins += count
                     
             total_draws += results['draws']
@@ -335,7 +733,8 @@ def run_benchmark(deck1, deck2, num_sims, forge_path, output_dir=None, max_worke
                         "draws": total_draws,
                         "deck1_win_percentage": deck1_wins/total_games*100 if total_games > 0 else 0,
                         "deck2_win_percentage": deck2_wins/total_games*100 if total_games > 0 else 0,
-                        "draw_percentage": total_draws/total_games*100 if total_games > 0 else 0
+                        "draw_percentage": total_draws/total_games*100 if total_games > 0 else 0,
+                        "games_saved": sum(r.get('adaptive', {}).get('games_saved', 0) for r in all_results.values())
                     }
                 }, f, indent=2)
             print(f"Results saved to {results_file}")
@@ -352,6 +751,27 @@ def main():
     parser.add_argument('-o', '--output-dir', help='Directory to save output files')
     parser.add_argument('-w', '--max-workers', type=int, default=4, 
                         help='Maximum number of parallel simulation processes (default: 4)')
+    parser.add_argument('--decision-deadline-ms', type=int, default=DECISION_DEADLINE_MS,
+                        help='Time the LLM service gets per decision before answering with a fallback, '
+                             f'e.g. 30000 (default: {DECISION_DEADLINE_MS}, none)')
+    parser.add_argument('--precision', type=float,
+                        help='Stop a configuration once deck 1\'s win rate is known to within this '
+                             '(e.g. 0.05 for +/-5%%); --num-sims is then the most games per configuration')
+    parser.add_argument('--min-games', type=int, default=10,
+                        help='Games a configuration plays before it may stop early (default: 10)')
+    parser.add_argument('--credible-level', type=float, default=0.95,
+                        help='Probability of the win rate\'s credible interval (default: 0.95)')
+    parser.add_argument('--decide', action='store_true',
+                        help='With --precision, also stop once one deck is better with 99.9%% probability (stricter than '
+                             '--credible-level, since checking after every game inflates false positives)')
+    parser.add_argument('--result-db', default=RESULT_DB,
+                        help=f'SQLite file every game result is appended to (default: {RESULT_DB}, "" to not record); '
+                             'see query_results.py')
+    parser.add_argument('--reuse-results', action='store_true',
+                        help='Count games of the same configuration already in --result-db towards --num-sims')
+    parser.add_argument('--warm-workers', action='store_true',
+                        help='Keep --max-workers simulator JVMs running and send them the games, '
+                             'instead of starting a JVM per game')
         # Always use Commander format
     
     args = parser.parse_args()
@@ -363,7 +783,9 @@ def main():
         print("Make sure Forge is properly built with the jar-with-dependencies target.")
         sys.exit(1)
     
-    run_benchmark(args.deck1, args.deck2, args.num_sims, args.forge_path, args.output_dir, args.max_workers)
+    run_benchmark(args.deck1, args.deck2, args.num_sims, args.forge_path, args.output_dir, args.max_workers,
+                  args.decision_deadline_ms, args.warm_workers, args.precision, args.min_games,
+                  args.credible_level, args.decide, args.result_db or None, args.reuse_results)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
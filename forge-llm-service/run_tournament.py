@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Tournament of a directory of decks on the Forge simulator.
+
+Plays every pairing of the .dck files (round robin), only the pairings of some
+decks against the rest (--gauntlet), or --swiss rounds, each pairing's games
+alternating which deck is in seat 1. The games are played --max-workers at a
+time, optionally on warm simulator workers (run_benchmark.py --warm-workers),
+and handed out longest expected game first: a matchup's expected game duration
+comes from its games so far in this run, else from the result store, so
+slow matchups start early instead of holding up the end of the run. Every
+game is recorded in the result store (result_store.py) like run_benchmark.py
+games, and the decks are rated with a Bradley-Terry fit on the Elo scale
+(benchmark_stats.py).
+
+Example:
+    python run_tournament.py ~/decks -n 20 -w 8 --warm-workers
+    python run_tournament.py ~/decks --gauntlet ~/new-brew.dck -n 40 --precision 0.1
+    python run_tournament.py ~/decks --swiss 5 -n 10
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark_stats import WinRateStopper, elo_ratings, winner_seat
+from result_store import ResultStore, deck_name
+from run_benchmark import (DECISION_DEADLINE_MS, RESULT_DB, ForgeSimulator, SimulatorPool, run_single_game)
+
+# Expected game duration of a matchup without recorded games, until one finishes
+DEFAULT_GAME_MS = 60000
+
+def find_decks(directory):
+    """Paths of the .dck files in a directory, by name"""
+    return sorted(glob.glob(os.path.join(os.path.abspath(directory), "*.dck")), key=deck_name)
+
+def round_robin(decks):
+    """Every pairing of the decks"""
+    return [(a, b) for i, a in enumerate(decks) for b in decks[i + 1:]]
+
+def gauntlet(challengers, decks):
+    """Every challenger against every other deck (challengers do not meet each other)"""
+    names = {deck_name(deck) for deck in challengers}
+    return [(challenger, deck) for challenger in challengers for deck in decks if deck_name(deck) not in names]
+
+def swiss_pairings(standings, played, byes=()):
+    """
+    Pairings of a Swiss round.
+
+    Args:
+        standings: Decks from first to last place
+        played: Set of frozensets of the deck names that already met
+        byes: Decks that already had a bye
+
+    Returns:
+        Tuple of (pairings, deck with a bye or None)
+    """
+    unpaired = list(standings)
+    bye = None
+    if len(unpaired) % 2:
+        # The lowest placed deck without a bye yet
+        bye = next((deck for deck in reversed(unpaired) if deck not in byes), unpaired[-1])
+        unpaired.remove(bye)
+    pairings = []
+    while unpaired:
+        deck = unpaired.pop(0)
+        # The highest placed opponent it has not met, else the highest placed one
+        opponent = next((other for other in unpaired if frozenset((deck_name(deck), deck_name(other))) not in played),
+                        unpaired[0])
+        unpaired.remove(opponent)
+        pairings.append((deck, opponent))
+    return pairings, bye
+
+class Pairing:
+    """The games of deck a against deck b; a has seat 1 in the even games"""
+
+    def __init__(self, a, b, games, stopper=None):
+        self.a = a
+        self.b = b
+        self.games = games
+        self.stopper = stopper
+        self.started = 0
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.reused = 0
+
+    @property
+    def name(self):
+        return f"{deck_name(self.a)} vs {deck_name(self.b)}"
+
+    @property
+    def finished(self):
+        return self.wins + self.losses + self.draws
+
+    def seats(self):
+        """Decks in seat order for the next game"""
+        return (self.a, self.b) if self.started % 2 == 0 else (self.b, self.a)
+
+    def add(self, seat, deck1):
+        """Count a game won by seat 1 or 2 (None for a draw) with deck1 in seat 1"""
+        if seat is not None and (seat == 1) == (deck_name(deck1) == deck_name(self.a)):
+            self.wins += 1
+            seat = 1
+        elif seat is not None:
+            self.losses += 1
+            seat = 2
+        else:
+            self.draws += 1
+        if self.stopper:
+            self.stopper.add(seat)
+
+    def pending(self):
+        """Games still to start"""
+        if self.stopper and self.stopper.should_stop():
+            return 0
+        return max(0, self.games - self.reused - self.started)
+
+class Scheduler:
+    """
+    Hands out the games of a set of pairings, longest expected game first.
+
+    A matchup's expected game duration is the mean of its games finished in this
+    run, else of its games in the result store (either seat order), else of all
+    games finished so far, else DEFAULT_GAME_MS. Ties go to the pairing with the
+    most games left, so pairings progress evenly.
+    """
+
+    def __init__(self, pairings, recorded=None):
+        self.pairings = pairings
+        self.recorded = recorded or {}
+        self._observed = {}
+        self._lock = threading.Lock()
+
+    def _key(self, a, b):
+        return tuple(sorted((deck_name(a), deck_name(b))))
+
+    def expected_ms(self, a, b):
+        key = self._key(a, b)
+        for durations in (self._observed, self.recorded):
+            if key in durations:
+                total, games = durations[key]
+                return total / games
+        if self._observed:
+            return (sum(total for total, _ in self._observed.values())
+                    / sum(games for _, games in self._observed.values()))
+        return DEFAULT_GAME_MS
+
+    def observe(self, a, b, duration_ms):
+        """Count a finished game's duration"""
+        with self._lock:
+            total, games = self._observed.get(self._key(a, b), (0, 0))
+            self._observed[self._key(a, b)] = (total + duration_ms, games + 1)
+
+    def next(self):
+        """Tuple of (pairing, seat 1 deck, seat 2 deck) of the next game, or None when all are started"""
+        with self._lock:
+            pending = [(self.expected_ms(p.a, p.b), p.pending(), p) for p in self.pairings if p.pending()]
+            if not pending:
+                return None
+            _, _, pairing = max(pending, key=lambda item: item[:2])
+            deck1, deck2 = pairing.seats()
+            pairing.started += 1
+            return pairing, deck1, deck2
+
+    def record(self, pairing, record):
+        """Count a game result record of a pairing"""
+        with self._lock:
+            pairing.add(winner_seat(record['winner']), record['deck1'])
+        self.observe(record['deck1'], record['deck2'], record['duration_ms'])
+
+def recorded_durations(store, controllers):
+    """Recorded (total ms, games) of each matchup, seat orders folded together"""
+    durations = {}
+    for (deck1, deck2), (mean_ms, games) in store.matchup_durations(controllers).items():
+        key = tuple(sorted((deck1, deck2)))
+        total, count = durations.get(key, (0, 0))
+        durations[key] = (total + mean_ms * games, count + games)
+    return durations
+
+def pair_results(pairings):
+    """Results of the pairings for elo_ratings: (deck a, deck b) names to (a's wins, b's wins, draws)"""
+    results = {}
+    for pairing in pairings:
+        key = (deck_name(pairing.a), deck_name(pairing.b))
+        wins, losses, draws = results.get(key, (0, 0, 0))
+        results[key] = (wins + pairing.wins, losses + pairing.losses, draws + pairing.draws)
+    return results
+
+def standings_table(decks, pairings, level):
+    """Rows of the rating table, best first"""
+    ratings = elo_ratings(pair_results(pairings), level)
+    rows = []
+    for deck in decks:
+        name = deck_name(deck)
+        wins = sum(p.wins for p in pairings if deck_name(p.a) == name) + \
+            sum(p.losses for p in pairings if deck_name(p.b) == name)
+        losses = sum(p.losses for p in pairings if deck_name(p.a) == name) + \
+            sum(p.wins for p in pairings if deck_name(p.b) == name)
+        draws = sum(p.draws for p in pairings if name in (deck_name(p.a), deck_name(p.b)))
+        rating, margin = ratings.get(name, (None, None))
+        rows.append({"deck": name, "rating": rating, "margin": margin, "games": wins + losses + draws,
+                     "wins": wins, "losses": losses, "draws": draws,
+                     "score": (wins + draws / 2) / (wins + losses + draws) if wins + losses + draws else None})
+    return sorted(rows, key=lambda row: -math.inf if row["rating"] is None else row["rating"], reverse=True)
+
+def print_standings(rows, level):
+    print(f"{'rank':>4}  {'deck':<40} {'elo':>6} {f'+/-{level:.0%}':>8} {'games':>6} {'W-L-D':>12} {'score':>7}")
+    for rank, row in enumerate(rows, 1):
+        rating = "" if row["rating"] is None else f"{row['rating']:.0f}"
+        margin = "" if row["margin"] is None else f"{row['margin']:.0f}"
+        record = f"{row['wins']}-{row['losses']}-{row['draws']}"
+        score = "" if row["score"] is None else f"{row['score']:.1%}"
+        print(f"{rank:>4}  {row['deck'][:40]:<40} {rating:>6} {margin:>8} {row['games']:>6} {record:>12} {score:>7}")
+
+def run_tournament(decks, num_games, forge_path, output_dir=None, max_workers=4,
+                   decision_deadline_ms=DECISION_DEADLINE_MS, warm_workers=False, controller="ai",
+                   challengers=None, swiss_rounds=None, precision=None, min_games=10, credible_level=0.95,
+                   decide=False, result_db=RESULT_DB, reuse_results=False):
+    """
+    Play a tournament and rate the decks.
+
+    Args:
+        decks: Paths of the decks
+        num_games: Games per pairing, seats alternating
+        forge_path: Path to the Forge installation
+        output_dir: Directory to save the log, games.jsonl and tournament_results.json
+        max_workers: Games played in parallel
+        decision_deadline_ms: Time the LLM service gets per decision (0 for no deadline)
+        warm_workers: Play the games on max_workers long-lived simulator JVMs
+        controller: Controller of every player ('ai' or 'llm')
+        challengers: Play only these decks against the others (gauntlet) instead of every pairing
+        swiss_rounds: Play this many Swiss rounds instead of every pairing
+        precision: Stop a pairing early once its win rate is known to within this;
+            num_games is then the most games per pairing
+        min_games: Games a pairing plays before it may stop early
+        credible_level: Probability of the credible and rating intervals
+        decide: Also stop a pairing once its 99.9% credible interval (DECIDE_LEVEL) excludes 50%
+        result_db: SQLite file every game result is appended to (None to not record)
+        reuse_results: Count the games of each pairing already in result_db towards num_games
+
+    Returns:
+        Dictionary with the standings, pairings and summary
+    """
+    controllers = [controller, controller]
+    if challengers:
+        decks = sorted({deck_name(deck): deck for deck in list(decks) + list(challengers)}.values(), key=deck_name)
+    if warm_workers:
+        simulator = SimulatorPool(forge_path, max_workers, decision_deadline_ms)
+    else:
+        simulator = ForgeSimulator(forge_path, decision_deadline_ms)
+
+    log_file = games_file = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        log_file = os.path.join(output_dir, "tournament.log")
+        games_file = open(os.path.join(output_dir, "games.jsonl"), 'a', buffering=1)
+    records_lock = threading.Lock()
+
+    store = ResultStore(result_db) if result_db else None
+    run_id = None
+    recorded = {}
+    if store:
+        run_id = store.start_run(" ".join(sys.argv), {
+            "decks": [deck_name(deck) for deck in decks], "num_games": num_games, "controller": controller,
+            "challengers": [deck_name(deck) for deck in challengers or []], "swiss_rounds": swiss_rounds,
+            "max_workers": max_workers, "warm_workers": warm_workers, "precision": precision
+        })
+        recorded = recorded_durations(store, controllers)
+        print(f"Recording results in {result_db} (run {run_id})")
+
+    def new_pairing(a, b):
+        stopper = WinRateStopper(precision, credible_level, min_games, decide) if precision else None
+        pairing = Pairing(a, b, num_games, stopper)
+        if store and reuse_results:
+            for deck1, deck2 in ((a, b), (b, a)):
+                for game in store.earlier_games(deck1, deck2, controllers, run_id):
+                    pairing.add(game["winner_seat"], deck1)
+                    pairing.reused += 1
+        return pairing
+
+    failed = [0]
+    game_count = [0]
+
+    def play(pairings):
+        """Play the pairings' games on max_workers threads"""
+        scheduler = Scheduler(pairings, recorded)
+        total = sum(p.pending() for p in pairings)
+
+        def on_result(record, pairing, deck1, deck2):
+            record = dict(record, config=pairing.name, deck1=deck1, deck2=deck2, controllers=controllers,
+                          finished=time.time())
+            scheduler.record(pairing, record)
+            with records_lock:
+                outcome = "draw" if record['winner'] is None else f"{record['winner']} won"
+                print(f"Result: {record['game_id']} {outcome} in {record['duration_ms'] / 1000:.1f}s")
+                if games_file:
+                    games_file.write(json.dumps(record) + "\n")
+                if store:
+                    store.record_game(run_id, record)
+
+        def worker():
+            while True:
+                game = scheduler.next()
+                if game is None:
+                    return
+                pairing, deck1, deck2 = game
+                with records_lock:
+                    game_count[0] += 1
+                    number = game_count[0]
+                short_uuid = uuid.uuid4().hex[:8]
+                game_id = f"{deck_name(deck1)} vs {deck_name(deck2)}_game_{number}_{short_uuid}"
+                try:
+                    _, output = run_single_game(
+                        simulator, deck1, deck2, controllers, game_id, f"t{number}_{short_uuid}", log_file,
+                        lambda record: on_result(record, pairing, deck1, deck2), random.getrandbits(48))
+                    ok = output.ok and output.results
+                except Exception as e:
+                    print(f"Error in {game_id}: {e}")
+                    ok = False
+                with records_lock:
+                    if not ok:
+                        print(f"Warning: No result received for {game_id}")
+                        failed[0] += 1
+
+        print(f"Running up to {total} games of {len(pairings)} pairings with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(worker) for _ in range(max_workers)]:
+                future.result()
+
+    start_time = time.time()
+    try:
+        if swiss_rounds:
+            pairings = []
+            points = {deck_name(deck): 0.0 for deck in decks}
+            played = set()
+            byes = set()
+            standings = random.sample(decks, len(decks))
+            for round_number in range(1, swiss_rounds + 1):
+                pairs, bye = swiss_pairings(standings, played, byes)
+                print(f"\n=== Swiss round {round_number}: {len(pairs)} pairings"
+                      f"{f', bye for {deck_name(bye)}' if bye else ''} ===")
+                round_pairings = [new_pairing(a, b) for a, b in pairs]
+                play(round_pairings)
+                pairings += round_pairings
+                if bye:
+                    byes.add(bye)
+                    points[deck_name(bye)] += 1
+                for pairing in round_pairings:
+                    played.add(frozenset((deck_name(pairing.a), deck_name(pairing.b))))
+                    # A pairing is a match: its winner gets a point, a tie half each
+                    if pairing.wins != pairing.losses:
+                        points[deck_name(pairing.a if pairing.wins > pairing.losses else pairing.b)] += 1
+                    else:
+                        points[deck_name(pairing.a)] += 0.5
+                        points[deck_name(pairing.b)] += 0.5
+                # Ties in points are broken by rating
+                ratings = elo_ratings(pair_results(pairings), credible_level)
+                standings = sorted(decks, key=lambda deck: (points[deck_name(deck)],
+                                                            ratings.get(deck_name(deck), (0, 0))[0]), reverse=True)
+        else:
+            pairs = gauntlet(challengers, decks) if challengers else round_robin(decks)
+            pairings = [new_pairing(a, b) for a, b in pairs]
+            play(pairings)
+    finally:
+        if games_file:
+            games_file.close()
+        if store:
+            store.close()
+        if warm_workers:
+            simulator.close()
+
+    elapsed = time.time() - start_time
+    played_games = sum(p.finished - p.reused for p in pairings)
+    reused = sum(p.reused for p in pairings)
+    saved = sum(p.games - p.started - p.reused for p in pairings if p.games > p.started + p.reused)
+    rows = standings_table(decks, pairings, credible_level)
+
+    print("\n=== Tournament Results ===")
+    print(f"{played_games} games in {elapsed:.0f} seconds ({played_games / elapsed * 3600 if elapsed else 0:.0f} "
+          f"games/hour), {failed[0]} failed" + (f", {reused} earlier games reused" if reused else "")
+          + (f", {saved} games saved by early stopping" if precision else ""))
+    print_standings(rows, credible_level)
+    if run_id:
+        print(f"\nPairing results: python query_results.py matrix --db {result_db}")
+
+    summary = {
+        "games": played_games,
+        "failed_games": failed[0],
+        "reused_games": reused,
+        "games_saved": saved,
+        "seconds": elapsed,
+        "games_per_hour": played_games / elapsed * 3600 if elapsed else 0
+    }
+    results = {
+        "format": "swiss" if swiss_rounds else "gauntlet" if challengers else "round-robin",
+        "controller": controller,
+        "run_id": run_id,
+        "standings": rows,
+        "pairings": [{"deck_a": deck_name(p.a), "deck_b": deck_name(p.b), "games": p.finished, "a_wins": p.wins,
+                      "b_wins": p.losses, "draws": p.draws, "reused_games": p.reused,
+                      "adaptive": p.stopper.summary() if p.stopper else None} for p in pairings],
+        "summary": summary
+    }
+    if output_dir:
+        results_file = os.path.join(output_dir, "tournament_results.json")
+        with open(results_file, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {results_file}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a tournament of a directory of decks and rate them')
+    parser.add_argument('deck_dir', help='Directory of .dck files')
+    parser.add_argument('-n', '--num-games', type=int, default=10,
+                        help='Games per pairing, seats alternating (default: 10)')
+    pairing = parser.add_mutually_exclusive_group()
+    pairing.add_argument('--gauntlet', action='append', metavar='DECK',
+                         help='Play only this deck (path) against the others; repeatable')
+    pairing.add_argument('--swiss', type=int, metavar='ROUNDS',
+                         help='Play this many Swiss rounds instead of every pairing')
+    parser.add_argument('--controller', choices=['ai', 'llm'], default='ai',
+                        help='Controller of every player (default: ai)')
+    parser.add_argument('-f', '--forge-path', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='Path to the Forge installation')
+    parser.add_argument('-o', '--output-dir', help='Directory to save output files')
+    parser.add_argument('-w', '--max-workers', type=int, default=4,
+                        help='Maximum number of parallel simulation processes (default: 4)')
+    parser.add_argument('--decision-deadline-ms', type=int, default=DECISION_DEADLINE_MS,
+                        help=f'Time the LLM service gets per decision (default: {DECISION_DEADLINE_MS}, none)')
+    parser.add_argument('--warm-workers', action='store_true',
+                        help='Keep --max-workers simulator JVMs running and send them the games')
+    parser.add_argument('--precision', type=float,
+                        help='Stop a pairing once its win rate is known to within this (e.g. 0.1); '
+                             '--num-games is then the most games per pairing')
+    parser.add_argument('--min-games', type=int, default=10,
+                        help='Games a pairing plays before it may stop early (default: 10)')
+    parser.add_argument('--credible-level', type=float, default=0.95,
+                        help='Probability of the credible and rating intervals (default: 0.95)')
+    parser.add_argument('--decide', action='store_true',
+                        help='With --precision, also stop a pairing once one deck is better with 99.9%% probability '
+                             '(stricter than --credible-level, since checking after every game inflates false positives)')
+    parser.add_argument('--result-db', default=RESULT_DB,
+                        help=f'SQLite file every game result is appended to (default: {RESULT_DB}, "" to not record)')
+    parser.add_argument('--reuse-results', action='store_true',
+                        help='Count games of a pairing already in --result-db towards --num-games')
+    args = parser.parse_args()
+
+    jar_path = f"{args.forge_path}/forge-gui-desktop/target/forge-gui-desktop-2.0.04-SNAPSHOT-jar-with-dependencies.jar"
+    if not os.path.exists(jar_path):
+        print(f"Error: Could not find Forge jar file at {jar_path}")
+        print("Make sure Forge is properly built with the jar-with-dependencies target.")
+        return 1
+    decks = find_decks(args.deck_dir)
+    challengers = [os.path.abspath(deck) for deck in args.gauntlet or []]
+    if len(decks) + len(challengers) < 2:
+        print(f"Error: Need at least two decks, found {len(decks)} .dck files in {args.deck_dir}")
+        return 1
+    print(f"{len(decks)} decks in {args.deck_dir}")
+
+    run_tournament(decks, args.num_games, args.forge_path, args.output_dir, args.max_workers,
+                   args.decision_deadline_ms, args.warm_workers, args.controller, challengers, args.swiss,
+                   args.precision, args.min_games, args.credible_level, args.decide, args.result_db or None,
+                   args.reuse_results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
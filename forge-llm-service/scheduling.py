@@ -0,0 +1,203 @@
+"""
+Fair scheduling of backend calls across games for the Forge LLM service.
+
+When more decisions are waiting than the backend can serve at once, calls are
+otherwise served first come, first served, so a chatty game (a long
+chooseSpellAbilityToPlay loop) fills the queue and every other game waits
+behind it. The FairScheduler allows at most `concurrency` backend calls in
+flight and hands each free slot to the next game in round-robin order: every
+game with a waiting decision gets one call before any game gets a second.
+
+Decisions in priority contexts (declareBlockers by default, which holds up
+combat) are served before all others, still round-robin across games.
+Queue depth and time spent waiting for a slot are exported as metrics.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from metrics import record_scheduler_wait, set_scheduler_queue_depth
+from server_core import DeadlineExceeded, game_id_from_player
+
+logger = logging.getLogger("scheduling")
+
+class _Waiter:
+    __slots__ = ("key", "context", "priority", "enqueued", "wake")
+
+    def __init__(self, key, context, priority, wake):
+        self.key = key
+        self.context = context
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.wake = wake
+
+class FairScheduler:
+    """
+    Round-robin admission of backend calls per game, with priority contexts.
+
+    Has the same complete()/acomplete() signature as LLMBackend, so the servers
+    call it in place of the backend (or micro-batcher) it wraps. A decision
+    still queued at its deadline gives up its place (DeadlineExceeded).
+    """
+
+    def __init__(self, backend, concurrency=16, priority_contexts=("declareBlockers",)):
+        self.backend = backend
+        self.name = backend.name
+        self.model = backend.model
+        self.concurrency = concurrency
+        self.priority_contexts = frozenset(priority_contexts)
+        self._lock = threading.Lock()
+        self._active = 0
+        # Per priority class: game key -> waiting decisions, in round-robin order
+        self._queues = {True: OrderedDict(), False: OrderedDict()}
+        self._depth = {True: 0, False: 0}
+        self.scheduled = 0
+        self.queued = 0
+        self.priority_scheduled = 0
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def _waiter(self, game_state, wake):
+        game_state = game_state if isinstance(game_state, dict) else {}
+        player = game_state.get("player", {}).get("name") or "unknown"
+        context = game_state.get("context", "unknown")
+        key = game_id_from_player(player) or player
+        return _Waiter(key, context, context in self.priority_contexts, wake)
+
+    def _acquire(self, waiter):
+        """Take a free slot, or queue the waiter; returns True if it may run now"""
+        with self._lock:
+            self.scheduled += 1
+            if waiter.priority:
+                self.priority_scheduled += 1
+            if self._active < self.concurrency and not any(self._depth.values()):
+                self._active += 1
+                granted = True
+            else:
+                self._queues[waiter.priority].setdefault(waiter.key, deque()).append(waiter)
+                self._depth[waiter.priority] += 1
+                self.queued += 1
+                self.max_queue_depth = max(self.max_queue_depth, sum(self._depth.values()))
+                depth = self._depth[waiter.priority]
+                granted = False
+        if granted:
+            self._started(waiter)
+        else:
+            set_scheduler_queue_depth(waiter.priority, depth)
+        return granted
+
+    def _release(self):
+        """Hand the finished call's slot to the next waiter, round-robin across games"""
+        waiter = None
+        with self._lock:
+            for priority in (True, False):
+                games = self._queues[priority]
+                if games:
+                    key, waiting = next(iter(games.items()))
+                    waiter = waiting.popleft()
+                    if waiting:
+                        games.move_to_end(key)
+                    else:
+                        del games[key]
+                    self._depth[priority] -= 1
+                    depth = self._depth[priority]
+                    break
+            else:
+                self._active -= 1
+        if waiter is not None:
+            set_scheduler_queue_depth(waiter.priority, depth)
+            self._started(waiter)
+            waiter.wake()
+
+    def _withdraw(self, waiter):
+        """Remove a cancelled waiter; returns False if it was already given a slot"""
+        with self._lock:
+            waiting = self._queues[waiter.priority].get(waiter.key)
+            if waiting is None or waiter not in waiting:
+                return False
+            waiting.remove(waiter)
+            if not waiting:
+                del self._queues[waiter.priority][waiter.key]
+            self._depth[waiter.priority] -= 1
+            depth = self._depth[waiter.priority]
+        set_scheduler_queue_depth(waiter.priority, depth)
+        return True
+
+    def _started(self, waiter):
+        wait = time.monotonic() - waiter.enqueued
+        with self._lock:
+            self.wait_seconds += wait
+            self.max_wait = max(self.max_wait, wait)
+        record_scheduler_wait(waiter.context, wait)
+
+    def complete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        ready = threading.Event()
+        waiter = self._waiter(game_state, ready.set)
+        if not self._acquire(waiter):
+            if not ready.wait(None if deadline is None else max(deadline - time.time(), 0)):
+                if not self._withdraw(waiter):
+                    # Given a slot as the deadline passed; pass it on
+                    self._release()
+                raise DeadlineExceeded("no backend slot before the deadline")
+        try:
+            return self.backend.complete(messages, temperature, max_tokens, game_state=game_state, deadline=deadline)
+        finally:
+            self._release()
+
+    async def acomplete(self, messages, temperature, max_tokens, game_state=None, deadline=None):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: ready.done() or ready.set_result(None))
+
+        waiter = self._waiter(game_state, wake)
+        if not self._acquire(waiter):
+            try:
+                await ready
+            except asyncio.CancelledError:
+                if not self._withdraw(waiter):
+                    self._release()
+                raise
+        try:
+            return await self.backend.acomplete(messages, temperature, max_tokens, game_state=game_state,
+                                                deadline=deadline)
+        finally:
+            self._release()
+
+    def stats(self):
+        """Calls scheduled and queued, queue depth and wait times"""
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "priority_contexts": sorted(self.priority_contexts),
+                "in_flight": self._active,
+                "queue_depth": sum(self._depth.values()),
+                "waiting_games": len(self._queues[True]) + len(self._queues[False]),
+                "max_queue_depth": self.max_queue_depth,
+                "scheduled": self.scheduled,
+                "queued": self.queued,
+                "priority_scheduled": self.priority_scheduled,
+                "mean_wait_ms": self.wait_seconds / self.scheduled * 1000 if self.scheduled else 0.0,
+                "max_wait_ms": self.max_wait * 1000
+            }
+
+def create_scheduler(backend):
+    """
+    Create the fair scheduler configured by the environment, or None if disabled.
+
+        SCHEDULER_CONCURRENCY        backend calls in flight at once (default 0, scheduling off)
+        SCHEDULER_PRIORITY_CONTEXTS  comma-separated contexts served first (default declareBlockers)
+    """
+    concurrency = int(os.getenv("SCHEDULER_CONCURRENCY", 0))
+    if backend is None or concurrency <= 0:
+        return None
+    priority_contexts = [c.strip() for c in os.getenv("SCHEDULER_PRIORITY_CONTEXTS", "declareBlockers").split(",")
+                         if c.strip()]
+    logger.info(f"Fair scheduling enabled ({concurrency} calls in flight, priority: {', '.join(priority_contexts)})")
+    return FairScheduler(backend, concurrency=concurrency, priority_contexts=priority_contexts)
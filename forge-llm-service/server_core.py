@@ -0,0 +1,653 @@
+"""
+Shared decision logic for the Forge LLM service.
+
+Both the Flask server (test_server.py) and the asyncio server (async_server.py)
+build their /act handlers from these helpers so that the request/response
+contract PlayerControllerLLM relies on stays identical between them.
+"""
+
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from conversation_log import create_conversation_log
+from traffic_trace import create_trace_recorder
+
+logger = logging.getLogger("server_core")
+
+# Model settings used for /act decisions
+DEFAULT_MODEL = "gpt-4.1"
+TEMPERATURE = 0.7
+MAX_TOKENS = 500
+
+# Key used when no OPENAI_API_KEY is configured; /act then answers with defaults
+MOCK_API_KEY = "mock-api-key-for-testing"
+
+# Number of most recent conversation messages sent to the LLM
+HISTORY_WINDOW = 10
+
+VALID_CONTEXTS = ["chooseAbility", "chooseTargets", "declareAttackers",
+                  "declareBlockers", "confirmAction", "chooseSingleEntity", "mulliganKeepHand",
+                  "chooseSpellAbilityToPlay"]
+
+def setup_logging(log_dir="logs"):
+    """
+    Configure the main logger, the conversation log and the /act trace.
+
+    Returns:
+        Tuple of (main log filename, ConversationLog, TraceRecorder or None)
+    """
+    # Create logs directory if it doesn't exist
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Generate log filename with timestamp
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # prefork_server.py workers share the timestamp, so keep their logs apart
+    worker_id = os.getenv("WORKER_ID")
+    if worker_id:
+        timestamp += f"_w{worker_id}"
+    log_filename = f"{log_dir}/llm_server_{timestamp}.log"
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_filename),
+            logging.StreamHandler()
+        ]
+    )
+
+    # Prompts and replies go to a structured JSONL log written off the request path
+    conversation_log = create_conversation_log(f"{log_dir}/conversation_{timestamp}")
+
+    # Optional trace of /act traffic for replay_trace.py (ACT_TRACE=1)
+    trace_recorder = create_trace_recorder(f"{log_dir}/trace_{timestamp}")
+
+    return log_filename, conversation_log, trace_recorder
+
+def game_id_from_player(player_name):
+    """The game.id suffix SimulateMatch appends to player names, or None"""
+    match = GAME_ID_SUFFIX.search(player_name or "")
+    return match.group(1) if match else None
+
+def conversation_record(game_state, player_id, prompt, t0, completion=None, error=None):
+    """Structured conversation log record for one LLM decision"""
+    record = {
+        "ts": time.time(),
+        "game_id": game_id_from_player(player_id),
+        "player": player_id,
+        "context": game_state.get("context", "unknown"),
+        "turn": game_state.get("gamePhase", {}).get("currentTurn"),
+        "prompt": prompt,
+        "latency": time.time() - t0
+    }
+    if completion is not None:
+        record.update({
+            "response": completion.text,
+            "backend_latency": completion.latency,
+            "prompt_tokens": completion.prompt_tokens,
+            "cached_tokens": completion.cached_tokens,
+            "completion_tokens": completion.completion_tokens,
+            "estimated_tokens": completion.estimated_tokens
+        })
+    if error is not None:
+        record["error"] = error
+    return record
+
+def special_context_response(context):
+    """Return the canned response for debug/testing contexts, or None for real decisions"""
+    if context == "debug":
+        logger.info("Debug context detected, returning PASS action")
+        return {"action": "PASS"}
+    elif context == "testing":
+        logger.info("Testing context detected, returning test response")
+        return {"action": "TEST_RESPONSE", "message": "Test successful"}
+    return None
+
+def invalid_context_error(context):
+    """Error message returned with a 400 when the context is not a known decision type"""
+    return f"Invalid game context '{context}'. Please provide a valid game context such as: {', '.join(VALID_CONTEXTS)}"
+
+# Time budget of a decision in milliseconds, sent by LLMClient.java (-Dllm.deadline.ms)
+DEADLINE_HEADER = "X-Forge-Deadline-Ms"
+
+class DeadlineExceeded(Exception):
+    """Raised when a decision's backend call would not finish before its deadline"""
+
+def request_deadline(headers, t0):
+    """
+    Time (as time.time()) by which the reply to a request must be sent.
+
+    The budget comes from the X-Forge-Deadline-Ms header, else DECISION_DEADLINE_MS
+    (default none); DEADLINE_MARGIN_MS (default 250) of it is kept for the
+    fallback reply to reach Forge.
+
+    Returns:
+        The deadline, or None if the request has none
+    """
+    budget = headers.get(DEADLINE_HEADER) or os.getenv("DECISION_DEADLINE_MS")
+    try:
+        budget_ms = float(budget)
+    except (TypeError, ValueError):
+        return None
+    if budget_ms <= 0:
+        return None
+    margin_ms = float(os.getenv("DEADLINE_MARGIN_MS", 250))
+    return t0 + (budget_ms - margin_ms) / 1000.0
+
+def call_before(deadline, fn, *args, **kwargs):
+    """
+    Call fn(..., deadline=deadline), raising DeadlineExceeded if it has not returned by deadline.
+
+    fn is a backend's complete(): the scheduler, batcher and limiter give up a
+    decision still waiting for a slot at the deadline, so it never reaches the
+    backend. With a deadline, fn runs on a daemon thread; a call already sent
+    cannot be interrupted, so it finishes in the background and its result is
+    dropped.
+    """
+    kwargs["deadline"] = deadline
+    if deadline is None:
+        return fn(*args, **kwargs)
+    if deadline <= time.time():
+        raise DeadlineExceeded("deadline passed before the backend call")
+    future = concurrent.futures.Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name="deadline-call").start()
+    try:
+        return future.result(timeout=max(deadline - time.time(), 0))
+    except concurrent.futures.TimeoutError:
+        raise DeadlineExceeded("backend call did not finish before the deadline") from None
+
+async def acall_before(deadline, coro):
+    """Await coro, cancelling it and raising DeadlineExceeded at deadline"""
+    if deadline is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, deadline - time.time())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("backend call cancelled at the deadline") from None
+
+# Player names carry a -<game.id> suffix from SimulateMatch (e.g. "-g3_1a2b3c4d")
+GAME_ID_SUFFIX = re.compile(r"-(g\d+_[0-9a-f]{8})\b")
+
+# Characters that matter when looking for JSON object boundaries
+JSON_SPECIAL_CHARS = re.compile(r'[{}"\\]')
+
+class JsonObjectScanner:
+    """
+    Finds the first complete top-level JSON object in text fed piece by piece.
+
+    Each character is looked at once, however the text is split, so a streamed
+    reply can be cut off as soon as its decision object closes. Brace-balanced
+    spans that are not valid JSON (e.g. "{like this}" in prose) are skipped.
+    """
+
+    def __init__(self):
+        # Text of the object being scanned from earlier chunks
+        self._pending = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.text = None
+        self.value = None
+
+    def feed(self, chunk):
+        """
+        Add the next piece of text.
+
+        Returns:
+            The decoded object once one is complete (also kept in .value, with
+            its text in .text), otherwise None
+        """
+        if self.value is not None:
+            return self.value
+
+        # Where the open object starts in this chunk
+        start = 0
+        pos = 0
+        if self._escape and chunk:
+            self._escape = False
+            pos = 1
+        while True:
+            match = JSON_SPECIAL_CHARS.search(chunk, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if self._in_string:
+                if char == "\\":
+                    if pos >= len(chunk):
+                        self._escape = True
+                        break
+                    pos += 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._depth > 0
+            elif char == "{":
+                if self._depth == 0:
+                    start = match.start()
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending.append(chunk[start:pos])
+                    text = "".join(self._pending)
+                    self._pending = []
+                    try:
+                        self.value = json.loads(text)
+                    except json.JSONDecodeError:
+                        continue
+                    self.text = text
+                    return self.value
+
+        if self._depth > 0:
+            self._pending.append(chunk[start:])
+        return None
+
+def parse_llm_response(response_text):
+    """
+    Parse the JSON decision out of an LLM response.
+
+    Returns:
+        The decoded JSON object, or None if no valid JSON could be extracted
+    """
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding JSON from LLM response: {e}")
+
+    # Take the first JSON object out of surrounding text (single linear scan)
+    extracted_json = JsonObjectScanner().feed(response_text)
+    if extracted_json is not None:
+        logger.info("Successfully extracted JSON from response")
+        return extracted_json
+    logger.error("Failed to extract valid JSON from response")
+    return None
+
+# System prompt for the LLM
+SYSTEM_PROMPT = """
+You are a Commander AI for Magic: The Gathering, controlling a deck in a game.
+You will receive the current game state in a readable text format, including:
+- Your player info (life, mana pool)
+- Game phase information
+- Cards on your battlefield
+- Cards in your hand
+- Your commander(s)
+- Information about opponents and their boards
+- The specific decision context (e.g., choosing an ability, declaring attackers)
+
+Your task is to make the best strategic decision based on the current game state.
+
+You MUST respond with a valid JSON object containing your decision.
+Depending on the context, your response should include different fields:
+
+For "chooseAbility" context:
+{
+  "action": "ACTIVATE",
+  "spellAbilityId": "ability-id-from-input"
+}
+
+For "chooseTargets" context:
+{
+  "targets": ["card-id-1", "card-id-2", ...]
+}
+
+For "declareAttackers" context:
+{
+  "attackers": [
+    {"cardId": "attacker-card-id", "defenderId": "defender-player-or-planeswalker-id"}
+  ]
+}
+
+For "declareBlockers" context:
+{
+  "blockers": [
+    {"blockerId": "blocker-card-id", "attackerId": "attacker-card-id"}
+  ]
+}
+
+For "confirmAction" context:
+{
+  "confirm": true/false
+}
+
+For "chooseSingleEntity" context:
+{
+  "chosenId": "entity-id"
+}
+
+For "mulliganKeepHand" context:
+{
+  "keepHand": true/false
+}
+
+For "chooseSpellAbilityToPlay" context:
+{
+  "chosenAbilityId": integer-id-from-input
+}
+Use -1 for chosenAbilityId to indicate no action (passing priority).
+
+Focus on playing strategically. Consider:
+1. Mana efficiency
+2. Card advantage
+3. Board presence
+4. Life totals
+5. Commander synergies
+6. Timing (when to play spells/abilities)
+
+Base your decisions on the current game state and optimize for winning the game.
+Do NOT provide any explanation, just the JSON response.
+"""
+
+def create_default_response(context, game_state):
+    """Create a default response based on the context when LLM fails"""
+    logger.info(f"Creating default response for context: {context}")
+
+    if context == "chooseAbility":
+        # Choose the first ability if available
+        abilities = game_state.get("abilities", [])
+        if abilities:
+            return {"action": "ACTIVATE", "spellAbilityId": abilities[0].get("id")}
+        return {"action": "PASS"}
+
+    elif context == "chooseTargets":
+        return {"targets": []}
+
+    elif context == "declareAttackers":
+        return {"attackers": []}
+
+    elif context == "declareBlockers":
+        return {"blockers": []}
+
+    elif context == "confirmAction":
+        return {"confirm": False}
+
+    elif context == "chooseSingleEntity":
+        options = game_state.get("chooseSingleEntity", {}).get("options", [])
+        if options:
+            return {"chosenId": options[0].get("id")}
+        return {"chosenId": ""}
+
+    elif context == "mulliganKeepHand":
+        # Default to keeping the hand
+        return {"keepHand": True}
+
+    elif context == "chooseSpellAbilityToPlay":
+        # Choose the first ability if available, or pass
+        abilities = game_state.get("availableAbilities", [])
+        if abilities:
+            return {"chosenAbilityId": abilities[0].get("id")}
+        return {"chosenAbilityId": -1}  # Pass if no abilities are available
+
+    # Default response for unknown contexts
+    return {"action": "PASS"}
+
+def is_tapped(card):
+    """Tapped state of a card (PlayerControllerLLM sends isTapped)"""
+    return card.get("isTapped", card.get("tapped", False))
+
+def current_phase(game_state):
+    """Current phase (PlayerControllerLLM sends it under gamePhase)"""
+    return game_state.get("gamePhase", {}).get("currentPhase", game_state.get("phase", "unknown"))
+
+def opponent_id(opponent):
+    """Opponent identifier (PlayerControllerLLM sends the player name, no id)"""
+    return opponent.get("id", opponent.get("name", "unknown"))
+
+def format_game_state_as_text(game_state, card_refs=None, card_texts=None):
+    """
+    Format the game state as plain text instead of JSON to minimize tokens.
+
+    card_refs (card id -> reference number) and card_texts (definition lines)
+    come from the card dictionary (card_dictionary.py) when it is enabled.
+    """
+    output = format_header_lines(game_state)
+    output.extend(format_card_text_lines(card_texts))
+    output.extend(format_board_lines(game_state, card_refs))
+    output.extend(format_decision_lines(game_state))
+    return "\n".join(output)
+
+def render_prompt(game_state, previous, state_delta=None, card_dictionary=None):
+    """
+    Render a decision's prompt through the optional card dictionary and state-diff stages.
+
+    Args:
+        game_state: The /act request
+        previous: Prompt state stored with the player's last prompt, or None
+        state_delta: StateDeltaPrompter, or None to send full boards
+        card_dictionary: CardDictionary, or None to leave card text out
+
+    Returns:
+        Tuple of (prompt text, prompt state to store with it)
+    """
+    previous = previous or {}
+    card_refs = card_texts = cards_state = None
+    if card_dictionary is not None:
+        card_refs, card_texts, cards_state = card_dictionary.annotate(game_state, previous.get("cards"))
+    if state_delta is not None:
+        text, delta_state = state_delta.render(game_state, previous.get("delta"), card_refs, card_texts)
+    else:
+        text, delta_state = format_game_state_as_text(game_state, card_refs, card_texts), None
+    if delta_state is None and cards_state is None:
+        return text, None
+    return text, {"delta": delta_state, "cards": cards_state}
+
+def prompts_needed(prompt_state):
+    """
+    How many of the player's latest prompts, including this one, a prompt refers back to.
+
+    A state diff needs the prompts since the last full snapshot and card text
+    references need the prompts that defined them.
+    """
+    if prompt_state is None:
+        return 1
+    needed = 1
+    if prompt_state["delta"] is not None:
+        needed = prompt_state["delta"].prompts_since_full + 1
+    if prompt_state["cards"] is not None:
+        needed = max(needed, prompt_state["cards"].needed)
+    return needed
+
+def format_header_lines(game_state):
+    """Decision context, life total and phase"""
+    context = game_state.get("context", "unknown")
+    output = [f"Decision Context: {context}\n"]
+
+    # Player info
+    player_info = game_state.get("player", {})
+    life = player_info.get("life", 0)
+    output.append(f"Your life: {life}")
+
+    # Phase info
+    output.append(f"Current phase: {current_phase(game_state)}\n")
+    return output
+
+def format_card_text_lines(card_texts):
+    """Card dictionary definitions sent with this prompt"""
+    if not card_texts:
+        return []
+    return ["Card text (cards below refer to it by #):"] + card_texts + [""]
+
+def card_ref(card, card_refs):
+    """' #<n>' reference to the card's text in the card dictionary, or ''"""
+    if not card_refs:
+        return ""
+    ref = card_refs.get(str(card.get("id")))
+    return f" #{ref}" if ref is not None else ""
+
+def format_board_lines(game_state, card_refs=None):
+    """Hand, battlefield and opponent boards"""
+    output = []
+
+    # Hand cards
+    hand = game_state.get("hand", [])
+    if hand:
+        output.append("Cards in your hand:")
+        for card in hand:
+            name = card.get("name", "Unknown Card")
+            card_id = card.get("id", "")
+            mana_cost = card.get("manaCost", "")
+            output.append(f"- {name}{card_ref(card, card_refs)} ({mana_cost}) [ID: {card_id}]")
+        output.append("")
+
+    # Battlefield
+    battlefield = game_state.get("battlefield", [])
+    if battlefield:
+        output.append("Your battlefield:")
+        for card in battlefield:
+            name = card.get("name", "Unknown Card")
+            card_id = card.get("id", "")
+            tapped = "tapped" if is_tapped(card) else "untapped"
+            output.append(f"- {name}{card_ref(card, card_refs)} ({tapped}) [ID: {card_id}]")
+        output.append("")
+
+    # Opponents
+    opponents = game_state.get("opponents", [])
+    if opponents:
+        output.append("Opponents:")
+        for opponent in opponents:
+            opp_id = opponent_id(opponent)
+            opp_life = opponent.get("life", 0)
+            output.append(f"Opponent [ID: {opp_id}] - Life: {opp_life}")
+
+            # Opponent's battlefield
+            opp_battlefield = opponent.get("battlefield", [])
+            if opp_battlefield:
+                output.append("  Battlefield:")
+                for card in opp_battlefield:
+                    name = card.get("name", "Unknown Card")
+                    card_id = card.get("id", "")
+                    tapped = "tapped" if is_tapped(card) else "untapped"
+                    output.append(f"  - {name}{card_ref(card, card_refs)} ({tapped}) [ID: {card_id}]")
+        output.append("")
+    return output
+
+def format_decision_lines(game_state):
+    """The choice to make: context-specific options"""
+    context = game_state.get("context", "unknown")
+    output = []
+
+    # Context-specific information
+    if context == "chooseAbility":
+        abilities = game_state.get("abilities", [])
+        if abilities:
+            output.append("Available abilities:")
+            for ability in abilities:
+                ability_id = ability.get("id", "")
+                description = ability.get("description", "No description")
+                output.append(f"- {description} [ID: {ability_id}]")
+            output.append("")
+
+    elif context == "chooseTargets":
+        targets = game_state.get("targets", {})
+        min_targets = targets.get("min", 0)
+        max_targets = targets.get("max", 0)
+        options = targets.get("options", [])
+        output.append(f"Choose targets (min: {min_targets}, max: {max_targets}):")
+        for option in options:
+            option_id = option.get("id", "")
+            name = option.get("name", "Unknown")
+            output.append(f"- {name} [ID: {option_id}]")
+        output.append("")
+
+    elif context == "declareAttackers":
+        attackers = game_state.get("attackers", {})
+        potential = attackers.get("potential", [])
+        defenders = attackers.get("defenders", [])
+
+        output.append("Potential attackers:")
+        for attacker in potential:
+            attacker_id = attacker.get("id", "")
+            name = attacker.get("name", "Unknown Card")
+            output.append(f"- {name} [ID: {attacker_id}]")
+
+        output.append("\nPotential defenders:")
+        for defender in defenders:
+            defender_id = defender.get("id", "")
+            name = defender.get("name", "Unknown")
+            life = defender.get("life", 0) if "life" in defender else "N/A"
+            output.append(f"- {name} (Life: {life}) [ID: {defender_id}]")
+        output.append("")
+
+    elif context == "declareBlockers":
+        blockers = game_state.get("blockers", {})
+        potential = blockers.get("potential", [])
+        attackers = blockers.get("attackers", [])
+
+        output.append("Potential blockers:")
+        for blocker in potential:
+            blocker_id = blocker.get("id", "")
+            name = blocker.get("name", "Unknown Card")
+            output.append(f"- {name} [ID: {blocker_id}]")
+
+        output.append("\nAttackers to block:")
+        for attacker in attackers:
+            attacker_id = attacker.get("id", "")
+            name = attacker.get("name", "Unknown Card")
+            output.append(f"- {name} [ID: {attacker_id}]")
+        output.append("")
+
+    elif context == "chooseSingleEntity":
+        entity_choice = game_state.get("chooseSingleEntity", {})
+        message = entity_choice.get("message", "Choose one:")
+        options = entity_choice.get("options", [])
+
+        output.append(f"{message}")
+        for option in options:
+            option_id = option.get("id", "")
+            name = option.get("name", "Unknown")
+            output.append(f"- {name} [ID: {option_id}]")
+        output.append("")
+
+    elif context == "mulliganKeepHand":
+        hand = game_state.get("hand", [])
+        output.append("Mulligan decision for hand:")
+        for card in hand:
+            name = card.get("name", "Unknown Card")
+            mana_cost = card.get("manaCost", "")
+            output.append(f"- {name} ({mana_cost})")
+        output.append("")
+
+    elif context == "chooseSpellAbilityToPlay":
+        abilities = game_state.get("availableAbilities", [])
+        if abilities:
+            output.append("Available cards and abilities to play:")
+            for ability in abilities:
+                ability_id = ability.get("id", "")
+                card_name = ability.get("hostCard", "Unknown Card")
+                description = ability.get("description", "No description")
+                is_land = ability.get("isLand", False)
+                cost = ability.get("costDescription", "No cost")
+
+                if is_land:
+                    output.append(f"- Play land: {card_name} [ID: {ability_id}]")
+                else:
+                    output.append(f"- {card_name}: {description} (Cost: {cost}) [ID: {ability_id}]")
+
+                # Add targeting info if available
+                targets = ability.get("potentialTargets", [])
+                if targets:
+                    output.append("  Potential targets:")
+                    for target in targets[:5]:  # Limit to first 5 targets to save space
+                        target_name = target.get("name", "Unknown")
+                        output.append(f"  * {target_name}")
+                    if len(targets) > 5:
+                        output.append(f"  * ... and {len(targets) - 5} more targets")
+
+            output.append("\nChoose an ability ID to play or pass (-1).")
+            output.append("")
+
+    return output
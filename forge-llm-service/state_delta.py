@@ -0,0 +1,210 @@
+"""
+Incremental state-diff prompting for the Forge LLM service.
+
+format_game_state_as_text() renders the whole hand, battlefield and every
+opponent board on each decision, and with conversation history the same board
+is repeated in up to ten messages of one request. When the player's previous
+prompt is still in the conversation window, the board is instead described as
+the changes since that prompt:
+
+- cards that entered or left the hand, the battlefield and opponent battlefields
+- life total changes
+- permanents that became tapped or untapped
+
+The header (context, life, phase) and the decision options are always sent in
+full. Every full_every prompts the whole board is sent again, so the last full
+snapshot never falls out of the window the deltas build on.
+"""
+
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from server_core import (
+    format_header_lines, format_card_text_lines, format_board_lines, format_decision_lines,
+    card_ref, is_tapped, opponent_id
+)
+
+logger = logging.getLogger("state_delta")
+
+# Rough token estimate used for the savings report
+CHARS_PER_TOKEN = 4
+
+class PromptState:
+    """What the LLM was last shown for one player"""
+
+    __slots__ = ("snapshot", "prompts_since_full")
+
+    def __init__(self, snapshot, prompts_since_full):
+        self.snapshot = snapshot
+        self.prompts_since_full = prompts_since_full
+
+def _card_label(card, card_refs=None):
+    return f"{card.get('name', 'Unknown')}{card_ref(card, card_refs)} [ID: {card.get('id', 'unknown')}]"
+
+def _permanents(cards, card_refs=None):
+    return {str(card.get("id")): (_card_label(card, card_refs), bool(is_tapped(card))) for card in cards}
+
+def snapshot(game_state, card_refs=None):
+    """The parts of a game state that deltas are computed over"""
+    return {
+        "life": game_state.get("player", {}).get("life", 0),
+        "hand": {str(card.get("id")): _card_label(card, card_refs) for card in game_state.get("hand", [])},
+        "battlefield": _permanents(game_state.get("battlefield", []), card_refs),
+        "opponents": {
+            str(opponent_id(opponent)): {
+                "life": opponent.get("life", 0),
+                "battlefield": _permanents(opponent.get("battlefield", []), card_refs)
+            }
+            for opponent in game_state.get("opponents", [])
+        }
+    }
+
+def _zone_changes(before, after):
+    """'+'/'-' entries for cards entering and leaving a zone (dict of id -> label)"""
+    changes = [f"+ {after[card_id]}" for card_id in after if card_id not in before]
+    changes.extend(f"- {before[card_id]}" for card_id in before if card_id not in after)
+    return changes
+
+def _battlefield_changes(before, after):
+    changes = _zone_changes(
+        {card_id: f"{label} ({'tapped' if tapped else 'untapped'})" for card_id, (label, tapped) in before.items()},
+        {card_id: f"{label} ({'tapped' if tapped else 'untapped'})" for card_id, (label, tapped) in after.items()}
+    )
+    for card_id, (label, tapped) in after.items():
+        if card_id in before and before[card_id][1] != tapped:
+            changes.append(f"{'tapped' if tapped else 'untapped'}: {label}")
+    return changes
+
+def describe_changes(previous, current):
+    """
+    Describe how the board changed between two snapshots.
+
+    Returns:
+        List of text lines, or None if the change cannot be expressed as a
+        delta (an opponent joined or left)
+    """
+    if set(previous["opponents"]) != set(current["opponents"]):
+        return None
+
+    lines = []
+    if previous["life"] != current["life"]:
+        lines.append(f"Your life: {previous['life']} -> {current['life']}")
+    hand = _zone_changes(previous["hand"], current["hand"])
+    if hand:
+        lines.append("Your hand: " + "; ".join(hand))
+    battlefield = _battlefield_changes(previous["battlefield"], current["battlefield"])
+    if battlefield:
+        lines.append("Your battlefield: " + "; ".join(battlefield))
+
+    for opp_id, after in current["opponents"].items():
+        before = previous["opponents"][opp_id]
+        opponent_lines = []
+        if before["life"] != after["life"]:
+            opponent_lines.append(f"  Life: {before['life']} -> {after['life']}")
+        changes = _battlefield_changes(before["battlefield"], after["battlefield"])
+        if changes:
+            opponent_lines.append("  Battlefield: " + "; ".join(changes))
+        if opponent_lines:
+            lines.append(f"Opponent [ID: {opp_id}]:")
+            lines.extend(opponent_lines)
+    return lines
+
+class StateDeltaPrompter:
+    """
+    Renders prompts as full snapshots or deltas against the player's last prompt.
+
+    Thread-safe. Counts, per context, the estimated prompt tokens actually sent
+    against what full snapshots would have cost.
+    """
+
+    def __init__(self, full_every=4):
+        self.full_every = max(1, full_every)
+        self._lock = threading.Lock()
+        self._prompts = defaultdict(int)
+        self._deltas = defaultdict(int)
+        self._full_tokens = defaultdict(int)
+        self._sent_tokens = defaultdict(int)
+
+    def render(self, game_state, previous, card_refs=None, card_texts=None):
+        """
+        Render the prompt for a decision.
+
+        Args:
+            game_state: The /act request
+            previous: PromptState of the player's last prompt, or None if it
+                is no longer in the conversation
+            card_refs, card_texts: Card dictionary references and definitions, if enabled
+
+        Returns:
+            Tuple of (prompt text, PromptState to store with it)
+        """
+        header = format_header_lines(game_state) + format_card_text_lines(card_texts)
+        decision = format_decision_lines(game_state)
+        full_text = "\n".join(header + format_board_lines(game_state, card_refs) + decision)
+        current = snapshot(game_state, card_refs)
+
+        changes = None
+        if previous is not None and previous.prompts_since_full + 1 < self.full_every:
+            changes = describe_changes(previous.snapshot, current)
+
+        if changes is None:
+            text = full_text
+            state = PromptState(current, 0)
+        else:
+            lines = ["Changes since your last prompt (everything else is unchanged):"]
+            lines.extend(changes or ["None"])
+            lines.append("")
+            text = "\n".join(header + lines + decision)
+            state = PromptState(current, previous.prompts_since_full + 1)
+
+        context = game_state.get("context", "unknown")
+        with self._lock:
+            self._prompts[context] += 1
+            if changes is not None:
+                self._deltas[context] += 1
+            self._full_tokens[context] += len(full_text) // CHARS_PER_TOKEN
+            self._sent_tokens[context] += len(text) // CHARS_PER_TOKEN
+        return text, state
+
+    def stats(self):
+        """Prompts rendered and estimated prompt-token reduction, per context"""
+        with self._lock:
+            contexts = {}
+            for context, prompts in self._prompts.items():
+                full_tokens = self._full_tokens[context]
+                sent_tokens = self._sent_tokens[context]
+                contexts[context] = {
+                    "prompts": prompts,
+                    "delta_prompts": self._deltas[context],
+                    "full_prompt_tokens": full_tokens,
+                    "sent_prompt_tokens": sent_tokens,
+                    "token_reduction": 1 - sent_tokens / full_tokens if full_tokens else 0.0
+                }
+            full_total = sum(self._full_tokens.values())
+            sent_total = sum(self._sent_tokens.values())
+            return {
+                "full_every": self.full_every,
+                "prompts": sum(self._prompts.values()),
+                "delta_prompts": sum(self._deltas.values()),
+                "token_reduction": 1 - sent_total / full_total if full_total else 0.0,
+                "contexts": contexts
+            }
+
+def create_state_delta(visible_prompts):
+    """
+    Create the delta prompter configured by the environment, or None if disabled.
+
+        STATE_DELTA             send board changes instead of full boards (default 0)
+        STATE_DELTA_FULL_EVERY  send a full snapshot every N prompts (default 4)
+
+    Every request carries at least the player's last `visible_prompts` prompts
+    (ConversationStore.visible_prompts), so full_every is capped there to keep
+    the last full snapshot in view.
+    """
+    if os.getenv("STATE_DELTA", "0") == "0":
+        return None
+    full_every = min(int(os.getenv("STATE_DELTA_FULL_EVERY", 4)), max(1, visible_prompts))
+    logger.info(f"State-diff prompting enabled (full snapshot every {full_every} prompts)")
+    return StateDeltaPrompter(full_every=full_every)
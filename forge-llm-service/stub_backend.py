@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub backend for load testing.
+
+Answers POST /v1/chat/completions with a valid decision for the prompt's
+decision context after a configurable delay, so the servers can be benchmarked
+without network access or API cost. Requests with "stream": true get the reply
+as server-sent events, one token at a time. Point a server at it with:
+
+    OPENAI_API_KEY=sk-stub OPENAI_BASE_URL=http://127.0.0.1:7990/v1 python test_server.py
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batching import split_batch_prompt
+from server_core import create_default_response
+
+CONTEXT_REGEX = re.compile(r"Decision Context: (\w+)")
+
+def stub_decision_text(messages):
+    """Build the decision JSON text for the last user message in a conversation (or micro-batch)"""
+    prompt = ""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            prompt = message.get("content") or ""
+            break
+    batch = split_batch_prompt(prompt)
+    if batch is not None:
+        return json.dumps({"decisions": [json.loads(stub_decision_text([{"role": "user", "content": p}])) for p in batch]})
+    match = CONTEXT_REGEX.search(prompt)
+    context = match.group(1) if match else "unknown"
+    return json.dumps(create_default_response(context, {}))
+
+def make_handler(latency_ms, jitter_ms, ms_per_token=0.0, trailing_tokens=0):
+    class StubHandler(BaseHTTPRequestHandler):
+        # Keep-alive so clients can reuse connections like they would with the real API
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+            time.sleep(max(delay, 0) / 1000.0)
+
+            messages = body.get("messages", [])
+            text = stub_decision_text(messages)
+            if trailing_tokens:
+                text += "\n\n" + " ".join(["word"] * trailing_tokens)
+            # Rough 4 chars/token estimate, good enough for load tests
+            tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+            prompt_chars = sum(len(m.get("content") or "") for m in messages)
+            usage = {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_chars // 4 + len(tokens)
+            }
+
+            if body.get("stream"):
+                self._stream(body, tokens, usage)
+                return
+
+            time.sleep(len(tokens) * ms_per_token / 1000.0)
+            payload = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, body, tokens, usage):
+            """Send the reply as server-sent events, one token per event, and the usage if asked for"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for token in tokens:
+                    time.sleep(ms_per_token / 1000.0)
+                    event = {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    event = {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "choices": [],
+                        "usage": usage
+                    }
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client cancelled the stream once it had its decision
+                pass
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate a load test
+            pass
+
+    return StubHandler
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Listen backlog must be large enough for hundreds of simultaneous connects
+    request_queue_size = 1024
+
+def run_stub_backend(port, latency_ms=0.0, jitter_ms=0.0, ms_per_token=0.0, trailing_tokens=0):
+    """Serve the stub backend forever on the given port"""
+    server = StubServer(("127.0.0.1", port), make_handler(latency_ms, jitter_ms, ms_per_token, trailing_tokens))
+    print(f"Stub backend listening on http://127.0.0.1:{port}/v1 "
+          f"(latency {latency_ms}ms +/- {jitter_ms}ms)", flush=True)
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI-compatible stub backend for load testing')
+    parser.add_argument('--port', type=int, default=7990, help='Port to listen on (default: 7990)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Mean simulated completion latency')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Uniform jitter added to the latency')
+    parser.add_argument('--ms-per-token', type=float, default=0.0, help='Simulated generation time per output token')
+    parser.add_argument('--trailing-tokens', type=int, default=0,
+                        help='Words of explanation appended after the decision JSON, like a verbose model')
+    args = parser.parse_args()
+
+    run_stub_backend(args.port, args.latency_ms, args.jitter_ms, args.ms_per_token, args.trailing_tokens)
+
+if __name__ == '__main__':
+    main()
@@ -1,487 +1,271 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 import json
 import time
-import sys
 import os
 import logging
-import re
-import openai
 from dotenv import load_dotenv
 
+from batching import create_batcher
+from card_dictionary import create_card_dictionary
+from conversation_store import create_conversation_store
+from decision_cache import create_decision_cache
+from fast_path import create_fast_path
+from llm_backends import create_backend
+from metrics import (
+    record_request, record_completion, record_default, record_cache_hit, record_fast_path,
+    render_metrics
+)
+from rate_limiting import OverloadError, create_limiter
+from scheduling import create_scheduler
+from state_delta import create_state_delta
+from token_budget import create_token_budget
+from server_core import (
+    DEFAULT_MODEL, TEMPERATURE, MAX_TOKENS, MOCK_API_KEY, VALID_CONTEXTS,
+    HISTORY_WINDOW, SYSTEM_PROMPT, setup_logging, special_context_response,
+    invalid_context_error, parse_llm_response, create_default_response,
+    render_prompt, prompts_needed, conversation_record, DeadlineExceeded, request_deadline,
+    call_before, DEADLINE_HEADER
+)
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-import datetime
-import os
-
-# Create logs directory if it doesn't exist
-log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-
-# Generate log filename with timestamp
-timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-log_filename = f"{log_dir}/llm_server_{timestamp}.log"
-conversation_log = f"{log_dir}/conversation_{timestamp}.log"
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename),
-        logging.StreamHandler()
-    ]
-)
+log_filename, conversation_log, trace_recorder = setup_logging()
 logger = logging.getLogger(__name__)
 
-# Create a separate logger for conversation details
-conversation_logger = logging.getLogger("conversation")
-conversation_logger.setLevel(logging.INFO)
-conversation_handler = logging.FileHandler(conversation_log)
-conversation_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-conversation_logger.addHandler(conversation_handler)
-conversation_logger.propagate = False  # Don't propagate to root logger
-
 # Initialize Flask app
 app = Flask(__name__)
 
-# Get OpenAI API key from environment variables
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    logger.warning("OPENAI_API_KEY not set, using mock API key for testing")
-    openai_api_key = "mock-api-key-for-testing"  # This won't work for real API calls
-else:
-    logger.info("OpenAI API key loaded successfully")
-    
-# Set up OpenAI client
-openai_client = openai.OpenAI(api_key=openai_api_key)
-
-# Store conversation history
-conversation_history = {}
-
-# System prompt for the LLM
-SYSTEM_PROMPT = """
-You are a Commander AI for Magic: The Gathering, controlling a deck in a game.
-You will receive the current game state in a readable text format, including:
-- Your player info (life, mana pool)
-- Game phase information
-- Cards on your battlefield
-- Cards in your hand
-- Your commander(s)
-- Information about opponents and their boards
-- The specific decision context (e.g., choosing an ability, declaring attackers)
-
-Your task is to make the best strategic decision based on the current game state.
-
-You MUST respond with a valid JSON object containing your decision.
-Depending on the context, your response should include different fields:
-
-For "chooseAbility" context:
-{
-  "action": "ACTIVATE",
-  "spellAbilityId": "ability-id-from-input"
-}
-
-For "chooseTargets" context:
-{
-  "targets": ["card-id-1", "card-id-2", ...]
-}
-
-For "declareAttackers" context:
-{
-  "attackers": [
-    {"cardId": "attacker-card-id", "defenderId": "defender-player-or-planeswalker-id"}
-  ]
-}
-
-For "declareBlockers" context:
-{
-  "blockers": [
-    {"blockerId": "blocker-card-id", "attackerId": "attacker-card-id"}
-  ]
-}
-
-For "confirmAction" context:
-{
-  "confirm": true/false
-}
-
-For "chooseSingleEntity" context:
-{
-  "chosenId": "entity-id"
-}
-
-For "mulliganKeepHand" context:
-{
-  "keepHand": true/false
-}
-
-For "chooseSpellAbilityToPlay" context:
-{
-  "chosenAbilityId": integer-id-from-input
-}
-Use -1 for chosenAbilityId to indicate no action (passing priority).
-
-Focus on playing strategically. Consider:
-1. Mana efficiency
-2. Card advantage
-3. Board presence
-4. Life totals
-5. Commander synergies
-6. Timing (when to play spells/abilities)
-
-Base your decisions on the current game state and optimize for winning the game.
-Do NOT provide any explanation, just the JSON response.
-"""
+# Select the LLM backend (LLM_BACKEND=openai|compatible|stub)
+backend = create_backend(DEFAULT_MODEL, MOCK_API_KEY)
+
+# Optional adaptive concurrency limit, rate limiting and retries (ADAPTIVE_LIMIT=1)
+limiter = create_limiter(backend)
+
+# Optional coalescing of concurrent decisions into one backend call (BATCH_MAX_SIZE > 1)
+batcher = create_batcher(limiter or backend)
+
+# Optional round-robin admission of backend calls across games (SCHEDULER_CONCURRENCY > 0)
+scheduler = create_scheduler(batcher or limiter or backend)
+
+# Forced decisions (nothing to play, a single option, ...) answered without the LLM
+fast_path = create_fast_path()
+
+# Optional cache of decisions for repeated game states (DECISION_CACHE_SIZE > 0)
+decision_cache = create_decision_cache()
+
+# Optional token budget for the conversation window instead of a message count (TOKEN_BUDGET > 0)
+token_budget = create_token_budget()
+
+# Bounded per-player conversation memory, evicted when games end or go idle
+conversation_store = create_conversation_store(
+    SYSTEM_PROMPT, token_budget.max_messages if token_budget is not None else HISTORY_WINDOW
+)
+
+# Prompts every request carries, which state diffs and card text references may refer back to
+visible_prompts = token_budget.min_prompts if token_budget is not None else conversation_store.visible_prompts
+
+# Optional board deltas instead of full boards in prompts (STATE_DELTA=1)
+state_delta = create_state_delta(visible_prompts)
+
+# Optional card text in prompts, each text sent once per conversation window (CARD_DICTIONARY=1)
+card_dictionary = create_card_dictionary(visible_prompts)
 
 @app.route("/", methods=["GET"])
 def hello():
     return "LLM Service is running - OpenAI integration active"
 
-def create_default_response(context, game_state):
-    """Create a default response based on the context when LLM fails"""
-    logger.info(f"Creating default response for context: {context}")
-    
-    if context == "chooseAbility":
-        # Choose the first ability if available
-        abilities = game_state.get("abilities", [])
-        if abilities:
-            return {"action": "ACTIVATE", "spellAbilityId": abilities[0].get("id")}
-        return {"action": "PASS"}
-    
-    elif context == "chooseTargets":
-        return {"targets": []}
-    
-    elif context == "declareAttackers":
-        return {"attackers": []}
-    
-    elif context == "declareBlockers":
-        return {"blockers": []}
-    
-    elif context == "confirmAction":
-        return {"confirm": False}
-    
-    elif context == "chooseSingleEntity":
-        options = game_state.get("chooseSingleEntity", {}).get("options", [])
-        if options:
-            return {"chosenId": options[0].get("id")}
-        return {"chosenId": ""}
-        
-    elif context == "mulliganKeepHand":
-        # Default to keeping the hand
-        return {"keepHand": True}
-    
-    elif context == "chooseSpellAbilityToPlay":
-        # Choose the first ability if available, or pass
-        abilities = game_state.get("availableAbilities", [])
-        if abilities:
-            return {"chosenAbilityId": abilities[0].get("id")}
-        return {"chosenAbilityId": -1}  # Pass if no abilities are available
-    
-    # Default response for unknown contexts
-    return {"action": "PASS"}
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "fast_path": fast_path.stats() if fast_path is not None else None,
+        "decision_cache": decision_cache.stats() if decision_cache is not None else None,
+        "conversations": conversation_store.stats(),
+        "conversation_log": conversation_log.stats(),
+        "state_delta": state_delta.stats() if state_delta is not None else None,
+        "card_dictionary": card_dictionary.stats() if card_dictionary is not None else None,
+        "token_budget": token_budget.stats() if token_budget is not None else None,
+        "batching": batcher.stats() if batcher is not None else None,
+        "scheduling": scheduler.stats() if scheduler is not None else None,
+        "rate_limiting": limiter.stats() if limiter is not None else None
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route("/games/<game_id>/end", methods=["POST"])
+def end_game(game_id):
+    if trace_recorder is not None:
+        trace_recorder.record_end(time.time(), game_id)
+    removed = conversation_store.end_game(game_id)
+    logger.info(f"Game {game_id} ended, dropped {removed} conversations")
+    return jsonify({"removed": removed})
+
+@app.before_request
+def mark_arrival():
+    g.arrival = time.time()
+
+@app.after_request
+def record_trace(response):
+    # Every /act exchange, whichever way act() answered it (ACT_TRACE=1)
+    if trace_recorder is not None and request.endpoint == "act":
+        trace_recorder.record_act(g.arrival, request.get_data(), request.headers.get(DEADLINE_HEADER),
+                                  response.status_code, response.get_data())
+    return response
 
 @app.route("/act", methods=["POST"])
 def act():
     t0 = time.time()
+    context = "unknown"
+    # Reply time promised to Forge (X-Forge-Deadline-Ms), or None
+    deadline = request_deadline(request.headers, t0)
 
     try:
         # Get game state from request
-        game_state = request.json
+        game_state = request.get_json(silent=True)
         if not game_state:
             logger.error("No game state provided in request")
+            record_request(context, "error", t0)
             return jsonify({"error": "No game state provided"}), 400
-        
+
         # Extract context from game state
         context = game_state.get("context", "unknown")
         logger.info(f"Request received with context: {context}")
-        
+
         # Log request details (truncated for brevity)
         logger.debug(f"Request details: {json.dumps(game_state)[:500]}...")
-        
+
         # Special handling for debug and testing contexts
-        if context == "debug":
-            logger.info("Debug context detected, returning PASS action")
-            return jsonify({"action": "PASS"})
-        elif context == "testing":
-            logger.info("Testing context detected, returning test response")
-            return jsonify({"action": "TEST_RESPONSE", "message": "Test successful"})
-        
+        special_response = special_context_response(context)
+        if special_response is not None:
+            return jsonify(special_response)
+
         # Check if context is valid
-        valid_contexts = ["chooseAbility", "chooseTargets", "declareAttackers", 
-                         "declareBlockers", "confirmAction", "chooseSingleEntity", "mulliganKeepHand", 
-                         "chooseSpellAbilityToPlay"]
-        
-        if context not in valid_contexts:
+        if context not in VALID_CONTEXTS:
             logger.warning(f"Invalid context: {context}")
-            return jsonify({
-                "error": f"Invalid game context '{context}'. Please provide a valid game context such as: {', '.join(valid_contexts)}"
-            }), 400
-        
-        # Check if OpenAI API key is a real one (not our mock key)
-        if openai_api_key == "mock-api-key-for-testing":
-            logger.info(f"Using default response for context: {context} (mock API key)")
+            record_request(context, "error", t0)
+            return jsonify({"error": invalid_context_error(context)}), 400
+
+        # Trivial decisions are answered locally
+        if fast_path is not None:
+            fast_decision = fast_path.decide(game_state)
+            if fast_decision is not None:
+                rule, decision = fast_decision
+                logger.info(f"Fast path '{rule}' answered context: {context}")
+                record_fast_path(context, rule)
+                record_request(context, "fast_path", t0)
+                return jsonify(decision)
+
+        # Without a usable backend (no OpenAI API key), answer with defaults
+        if backend is None:
+            logger.info(f"Using default response for context: {context} (no backend configured)")
+            record_default(context, "no_backend")
+            record_request(context, "default", t0)
             default_response = create_default_response(context, game_state)
             return jsonify(default_response)
-        
-        # Format game state as plain text
-        formatted_state = format_game_state_as_text(game_state)
-        
-        # Get or create conversation history for this player
+
+        # Repeated states are answered from the decision cache without an LLM call
+        if decision_cache is not None:
+            cached_decision = decision_cache.get(game_state)
+            if cached_decision is not None:
+                logger.info(f"Decision cache hit for context: {context} ({time.time() - t0:.2f}s to reply)")
+                record_cache_hit(context)
+                record_request(context, "cache", t0)
+                return jsonify(cached_decision)
+
         player_id = game_state.get("player", {}).get("name", 'unknown')
-        if player_id not in conversation_history:
-            conversation_history[player_id] = [
-                {"role": "system", "content": SYSTEM_PROMPT}
-            ]
-        
-        # Add new message to conversation
-        conversation_history[player_id].append({"role": "user", "content": formatted_state})
-        
-        # Use only the last few messages to avoid context length issues
-        recent_messages = conversation_history[player_id][-10:] if len(conversation_history[player_id]) > 10 else conversation_history[player_id]
-        
-        # Log the formatted prompt sent to LLM
-        conversation_logger.info(f"PLAYER: {player_id} | CONTEXT: {context}")
-        conversation_logger.info("PROMPT:\n" + formatted_state)
-        conversation_logger.info("-" * 50)
-        # Call the OpenAI API
+
+        # Format game state as plain text, as changes since the last prompt and with card
+        # text references if enabled
+        formatted_state, prompt_state = render_prompt(
+            game_state, conversation_store.get_prompt_state(player_id), state_delta, card_dictionary
+        )
+
+        # Get or create conversation history for this player
+        recent_messages = conversation_store.add_user_message(player_id, formatted_state, prompt_state)
+        if token_budget is not None:
+            recent_messages, window_tokens = token_budget.fit(recent_messages, context, prompts_needed(prompt_state))
+            logger.info(f"Sending {len(recent_messages)} messages ({window_tokens} tokens) for context: {context}")
+
+        # Call the LLM backend, falling back to the default response at the deadline
         try:
-            logger.info(f"Calling OpenAI API for context: {context}")
-            response = openai_client.chat.completions.create(
-                model="gpt-4.1",
-                messages=recent_messages,
-                temperature=0.7,
-                max_tokens=500
+            logger.info(f"Calling {backend.name} backend for context: {context}")
+            completion = call_before(
+                deadline,
+                (scheduler or batcher or limiter or backend).complete,
+                recent_messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                game_state=game_state
             )
-            
+            record_completion(context, backend.name, completion)
+
             # Extract the response text
-            response_text = response.choices[0].message.content
+            response_text = completion.text
             logger.debug(f"Raw LLM response: {response_text}")
-            
+
             # Add assistant's response to conversation history
-            conversation_history[player_id].append({"role": "assistant", "content": response_text})
-            
-            # Log the response from the LLM
-            conversation_logger.info(f"PLAYER: {player_id} | RESPONSE:")
-            conversation_logger.info(response_text)
-            conversation_logger.info("=" * 80)
-            
+            conversation_store.add_assistant_message(player_id, response_text)
+
+            # Log the prompt and response (written in the background)
+            conversation_log.log(conversation_record(game_state, player_id, formatted_state, t0, completion))
+
             # Parse the JSON response
-            try:
-                response_json = json.loads(response_text)
+            response_json = parse_llm_response(response_text)
+            if response_json is not None:
                 logger.info(f"Successfully parsed LLM response: {response_json}")
                 logger.info(f"({time.time() - t0:.2f}s to reply)")
+                if decision_cache is not None:
+                    decision_cache.put(game_state, response_json)
+                record_request(context, "llm", t0)
                 return jsonify(response_json)
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decoding JSON from LLM response: {e}")
-                # Try to extract JSON from response text if it contains non-JSON text
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        extracted_json = json.loads(json_match.group(0))
-                        logger.info(f"Successfully extracted JSON from response  ({time.time() - t0:.2f}s to reply)")
-                        logger.info(f"Successfully parsed LLM response: {extracted_json}")
-
-                        return jsonify(extracted_json)
-                    except json.JSONDecodeError:
-                        logger.error("Failed to extract valid JSON from response")
-                
-                # If we can't parse the JSON, return a default response based on context
-                logger.warning("Returning default response due to JSON parsing failure")
-                default_response = create_default_response(context, game_state)
-                return jsonify(default_response)
-        
+
+            # If we can't parse the JSON, return a default response based on context
+            logger.warning("Returning default response due to JSON parsing failure")
+            record_default(context, "parse_failure")
+            record_request(context, "default", t0)
+            default_response = create_default_response(context, game_state)
+            return jsonify(default_response)
+
+        except (OverloadError, DeadlineExceeded) as e:
+            reason = "deadline" if isinstance(e, DeadlineExceeded) else "overload"
+            logger.warning(f"Using default response for context: {context} ({reason}: {e})")
+            conversation_log.log(conversation_record(game_state, player_id, formatted_state, t0, error=str(e)))
+            record_default(context, reason)
+            record_request(context, "default", t0)
+            default_response = create_default_response(context, game_state)
+            return jsonify(default_response)
+
         except Exception as e:
-            logger.error(f"OpenAI API error: {str(e)}")
+            logger.error(f"LLM backend error: {str(e)}")
+            conversation_log.log(conversation_record(game_state, player_id, formatted_state, t0, error=str(e)))
+            record_default(context, "backend_error")
+            record_request(context, "default", t0)
             default_response = create_default_response(context, game_state)
             return jsonify(default_response)
-    
+
     except Exception as e:
         error_msg = f"Error processing request: {str(e)}"
         logger.exception(error_msg)
+        record_request(context, "error", t0)
         return jsonify({"error": error_msg}), 500
 
-def format_game_state_as_text(game_state):
-    """Format the game state as plain text instead of JSON to minimize tokens"""
-    context = game_state.get("context", "unknown")
-    output = [f"Decision Context: {context}\n"]
-    
-    # Player info
-    player_id = game_state.get("playerId", "unknown")
-    player_info = game_state.get("player", {})
-    life = player_info.get("life", 0)
-    output.append(f"Your life: {life}")
-    
-    # Phase info
-    phase = game_state.get("phase", "unknown")
-    output.append(f"Current phase: {phase}\n")
-    
-    # Hand cards
-    hand = game_state.get("hand", [])
-    if hand:
-        output.append("Cards in your hand:")
-        for card in hand:
-            name = card.get("name", "Unknown Card")
-            card_id = card.get("id", "")
-            mana_cost = card.get("manaCost", "")
-            output.append(f"- {name} ({mana_cost}) [ID: {card_id}]")
-        output.append("")
-    
-    # Battlefield
-    battlefield = game_state.get("battlefield", [])
-    if battlefield:
-        output.append("Your battlefield:")
-        for card in battlefield:
-            name = card.get("name", "Unknown Card")
-            card_id = card.get("id", "")
-            tapped = "tapped" if card.get("tapped", False) else "untapped"
-            output.append(f"- {name} ({tapped}) [ID: {card_id}]")
-        output.append("")
-    
-    # Opponents
-    opponents = game_state.get("opponents", [])
-    if opponents:
-        output.append("Opponents:")
-        for opponent in opponents:
-            opp_id = opponent.get("id", "unknown")
-            opp_life = opponent.get("life", 0)
-            output.append(f"Opponent [ID: {opp_id}] - Life: {opp_life}")
-            
-            # Opponent's battlefield
-            opp_battlefield = opponent.get("battlefield", [])
-            if opp_battlefield:
-                output.append("  Battlefield:")
-                for card in opp_battlefield:
-                    name = card.get("name", "Unknown Card")
-                    card_id = card.get("id", "")
-                    tapped = "tapped" if card.get("tapped", False) else "untapped"
-                    output.append(f"  - {name} ({tapped}) [ID: {card_id}]")
-        output.append("")
-    
-    # Context-specific information
-    if context == "chooseAbility":
-        abilities = game_state.get("abilities", [])
-        if abilities:
-            output.append("Available abilities:")
-            for ability in abilities:
-                ability_id = ability.get("id", "")
-                description = ability.get("description", "No description")
-                output.append(f"- {description} [ID: {ability_id}]")
-            output.append("")
-    
-    elif context == "chooseTargets":
-        targets = game_state.get("targets", {})
-        min_targets = targets.get("min", 0)
-        max_targets = targets.get("max", 0)
-        options = targets.get("options", [])
-        output.append(f"Choose targets (min: {min_targets}, max: {max_targets}):")
-        for option in options:
-            option_id = option.get("id", "")
-            name = option.get("name", "Unknown")
-            output.append(f"- {name} [ID: {option_id}]")
-        output.append("")
-    
-    elif context == "declareAttackers":
-        attackers = game_state.get("attackers", {})
-        potential = attackers.get("potential", [])
-        defenders = attackers.get("defenders", [])
-        
-        output.append("Potential attackers:")
-        for attacker in potential:
-            attacker_id = attacker.get("id", "")
-            name = attacker.get("name", "Unknown Card")
-            output.append(f"- {name} [ID: {attacker_id}]")
-        
-        output.append("\nPotential defenders:")
-        for defender in defenders:
-            defender_id = defender.get("id", "")
-            name = defender.get("name", "Unknown")
-            life = defender.get("life", 0) if "life" in defender else "N/A"
-            output.append(f"- {name} (Life: {life}) [ID: {defender_id}]")
-        output.append("")
-    
-    elif context == "declareBlockers":
-        blockers = game_state.get("blockers", {})
-        potential = blockers.get("potential", [])
-        attackers = blockers.get("attackers", [])
-        
-        output.append("Potential blockers:")
-        for blocker in potential:
-            blocker_id = blocker.get("id", "")
-            name = blocker.get("name", "Unknown Card")
-            output.append(f"- {name} [ID: {blocker_id}]")
-        
-        output.append("\nAttackers to block:")
-        for attacker in attackers:
-            attacker_id = attacker.get("id", "")
-            name = attacker.get("name", "Unknown Card")
-            output.append(f"- {name} [ID: {attacker_id}]")
-        output.append("")
-    
-    elif context == "chooseSingleEntity":
-        entity_choice = game_state.get("chooseSingleEntity", {})
-        message = entity_choice.get("message", "Choose one:")
-        options = entity_choice.get("options", [])
-        
-        output.append(f"{message}")
-        for option in options:
-            option_id = option.get("id", "")
-            name = option.get("name", "Unknown")
-            output.append(f"- {name} [ID: {option_id}]")
-        output.append("")
-    
-    elif context == "mulliganKeepHand":
-        hand = game_state.get("hand", [])
-        output.append("Mulligan decision for hand:")
-        for card in hand:
-            name = card.get("name", "Unknown Card")
-            mana_cost = card.get("manaCost", "")
-            output.append(f"- {name} ({mana_cost})")
-        output.append("")
-    
-    elif context == "chooseSpellAbilityToPlay":
-        abilities = game_state.get("availableAbilities", [])
-        if abilities:
-            output.append("Available cards and abilities to play:")
-            for ability in abilities:
-                ability_id = ability.get("id", "")
-                card_name = ability.get("hostCard", "Unknown Card")
-                description = ability.get("description", "No description")
-                is_land = ability.get("isLand", False)
-                cost = ability.get("costDescription", "No cost")
-                
-                if is_land:
-                    output.append(f"- Play land: {card_name} [ID: {ability_id}]")
-                else:
-                    output.append(f"- {card_name}: {description} (Cost: {cost}) [ID: {ability_id}]")
-                
-                # Add targeting info if available
-                targets = ability.get("potentialTargets", [])
-                if targets:
-                    output.append("  Potential targets:")
-                    for target in targets[:5]:  # Limit to first 5 targets to save space
-                        target_name = target.get("name", "Unknown")
-                        output.append(f"  * {target_name}")
-                    if len(targets) > 5:
-                        output.append(f"  * ... and {len(targets) - 5} more targets")
-            
-            output.append("\nChoose an ability ID to play or pass (-1).")
-            output.append("")
-    
-    return "\n".join(output)
-
 if __name__ == "__main__":
     # Get port from environment or use default
     port = int(os.environ.get('PORT', 7861))
-    
+
     # Log the start of the server
     logger.info(f"Starting LLM service on port {port}")
     logger.info(f"Main log file: {log_filename}")
-    logger.info(f"Conversation log file: {conversation_log}")
+    logger.info(f"Conversation log file: {conversation_log.path}")
     print(f"Starting LLM service on port {port}", flush=True)
-    print(f"Logs will be written to:\n- {log_filename}\n- {conversation_log}")
-    
+    print(f"Logs will be written to:\n- {log_filename}\n- {conversation_log.path}")
+    if trace_recorder is not None:
+        print(f"- {trace_recorder.path} (/act trace)")
+
     # Run the Flask app
     app.run(host="0.0.0.0", port=port, debug=False)
-
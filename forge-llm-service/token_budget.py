@@ -0,0 +1,215 @@
+"""
+Token-aware conversation window for the Forge LLM service.
+
+Cutting the conversation to a fixed number of messages sends too much on large
+Commander boards (ten full four-player boards can overflow the model's context)
+and too little on small ones. The TokenBudget packs the most recent messages of
+a conversation into a per-context token budget instead:
+
+- the system prompt and the current prompt are always sent
+- older messages are added newest first while they fit the budget
+- a prompt that refers back to earlier prompts (a state diff against the last
+  full snapshot, card text references defined earlier) always gets those
+  prompts, even over budget; they are at most `min_prompts` prompts
+- with PROMPT_LAYOUT=cache, older messages are left out in whole blocks of
+  `max_messages // 4` exchanges counted from the start of the stored
+  conversation, so the window starts at the same message for several requests
+  in a row and the provider's prompt cache still matches it
+
+Tokens are counted locally, never over the network: with TOKENIZER=tiktoken by
+the tiktoken package (its encoding files must already be cached, see
+TIKTOKEN_CACHE_DIR), otherwise by an approximation of BPE tokenizers that
+counts words, numbers and symbols.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from metrics import record_window_tokens
+
+logger = logging.getLogger("token_budget")
+
+# Chat format overhead: tokens per message and for priming the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REQUEST = 3
+
+# Pieces of the approximate tokenizer: words with their leading space, numbers,
+# whitespace runs and single symbols
+TOKEN_PIECES = re.compile(r" ?[A-Za-z]+| ?\d+|\s+|[^\sA-Za-z\d]")
+
+def approximate_tokens(text):
+    """Token count of text as a BPE tokenizer would roughly split it"""
+    count = 0
+    for piece in TOKEN_PIECES.findall(text):
+        if piece[-1].isdigit():
+            # Numbers are split into runs of up to three digits
+            count += (len(piece.strip()) + 2) // 3
+        elif len(piece) > 9 and piece[-1].isalpha():
+            # Long words take a token per 8 characters or so
+            count += (len(piece) + 7) // 8
+        else:
+            count += 1
+    return count
+
+def create_tokenizer(name):
+    """
+    Return a function counting the tokens of a string.
+
+    Args:
+        name: approximate, or tiktoken[:<encoding>] (default encoding o200k_base)
+
+    Raises:
+        ValueError: If the tokenizer is unknown or tiktoken is not installed
+    """
+    if name == "approximate":
+        count = approximate_tokens
+    elif name.split(":")[0] == "tiktoken":
+        try:
+            import tiktoken
+        except ImportError:
+            raise ValueError("TOKENIZER=tiktoken requires the tiktoken package")
+        encoding = tiktoken.get_encoding(name.split(":", 1)[1] if ":" in name else "o200k_base")
+        count = lambda text: len(encoding.encode(text, disallowed_special=()))
+    else:
+        raise ValueError(f"Unknown TOKENIZER '{name}' (expected approximate or tiktoken[:<encoding>])")
+    # Messages stay in the window for several requests; count each once
+    return lru_cache(maxsize=2048)(count)
+
+class TokenBudget:
+    """
+    Fits conversation windows into per-context token budgets.
+
+    Thread-safe. Counts, per context, the tokens sent, messages left out and
+    requests that went over budget.
+    """
+
+    def __init__(self, budget=8000, context_budgets=None, min_prompts=2, max_messages=30,
+                 tokenizer=approximate_tokens, layout="window"):
+        self.budget = budget
+        self.context_budgets = dict(context_budgets or {})
+        self.min_prompts = max(1, min_prompts)
+        self.max_messages = max_messages
+        self.layout = layout
+        # Messages left out at once with the cache layout: whole exchanges
+        self.cache_block = 2 * max(1, max_messages // 4)
+        self.count_tokens = tokenizer
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._tokens = defaultdict(int)
+        self._max_tokens = defaultdict(int)
+        self._dropped = defaultdict(int)
+        self._over_budget = defaultdict(int)
+
+    def message_tokens(self, message):
+        return self.count_tokens(message.get("content") or "") + TOKENS_PER_MESSAGE
+
+    def fit(self, messages, context, prompts_needed=1):
+        """
+        Pack a conversation into the context's token budget.
+
+        Args:
+            messages: System prompt (if any) followed by the conversation, ending
+                with the current prompt
+            context: Decision context, for its budget
+            prompts_needed: Latest prompts (including the current one) the
+                current prompt refers back to, sent regardless of the budget
+
+        Returns:
+            Tuple of (messages to send, their token count)
+        """
+        budget = self.context_budgets.get(context, self.budget)
+        head = messages[:1] if messages and messages[0]["role"] == "system" else []
+        history = messages[len(head):]
+
+        tokens = TOKENS_PER_REQUEST + sum(self.message_tokens(m) for m in head)
+        prompts = 0
+        start = len(history)
+        required_start = start
+        while start > 0:
+            message = history[start - 1]
+            message_tokens = self.message_tokens(message)
+            required = prompts < prompts_needed or start == len(history)
+            if not required and tokens + message_tokens > budget:
+                break
+            tokens += message_tokens
+            if message["role"] == "user":
+                prompts += 1
+            start -= 1
+            if required:
+                required_start = start
+        if self.layout == "cache" and start > 0:
+            # Leave out whole blocks, so the next requests start at the same message
+            cut = -(-start // self.cache_block) * self.cache_block
+            if cut <= required_start:
+                tokens -= sum(self.message_tokens(m) for m in history[start:cut])
+                start = cut
+        # Do not start the history with a reply to a prompt that was left out
+        while start < len(history) - 1 and history[start]["role"] == "assistant":
+            tokens -= self.message_tokens(history[start])
+            start += 1
+
+        with self._lock:
+            self._requests[context] += 1
+            self._tokens[context] += tokens
+            self._max_tokens[context] = max(self._max_tokens[context], tokens)
+            self._dropped[context] += start
+            if tokens > budget:
+                self._over_budget[context] += 1
+        record_window_tokens(context, tokens, tokens > budget)
+        return head + history[start:], tokens
+
+    def stats(self):
+        """Budgets and, per context, tokens sent, messages left out and requests over budget"""
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "context_budgets": self.context_budgets,
+                "min_prompts": self.min_prompts,
+                "max_messages": self.max_messages,
+                "contexts": {
+                    context: {
+                        "requests": requests,
+                        "mean_tokens": self._tokens[context] / requests,
+                        "max_tokens": self._max_tokens[context],
+                        "dropped_messages": self._dropped[context],
+                        "over_budget": self._over_budget[context]
+                    }
+                    for context, requests in self._requests.items()
+                }
+            }
+
+def create_token_budget():
+    """
+    Create the token budget configured by the environment, or None if disabled.
+
+        TOKEN_BUDGET              tokens per request, system prompt included (default 0, window of
+                                  HISTORY_WINDOW messages instead)
+        TOKEN_BUDGET_CONTEXTS     per-context budgets, e.g. declareBlockers:3000,chooseSpellAbilityToPlay:6000
+        TOKEN_BUDGET_MIN_PROMPTS  prompts every request carries, even over budget (default 2)
+        TOKEN_BUDGET_MAX_MESSAGES messages kept per conversation to pack from (default 30)
+        TOKENIZER                 approximate (default) or tiktoken[:<encoding>]
+        PROMPT_LAYOUT             with cache, older messages are left out in fixed blocks (see module docstring)
+    """
+    budget = int(os.getenv("TOKEN_BUDGET", 0))
+    if budget <= 0:
+        return None
+    context_budgets = {}
+    for entry in os.getenv("TOKEN_BUDGET_CONTEXTS", "").split(","):
+        if entry.strip():
+            context, _, tokens = entry.partition(":")
+            context_budgets[context.strip()] = int(tokens)
+    token_budget = TokenBudget(
+        budget,
+        context_budgets=context_budgets,
+        min_prompts=int(os.getenv("TOKEN_BUDGET_MIN_PROMPTS", 2)),
+        max_messages=int(os.getenv("TOKEN_BUDGET_MAX_MESSAGES", 30)),
+        tokenizer=create_tokenizer(os.getenv("TOKENIZER", "approximate")),
+        layout=os.getenv("PROMPT_LAYOUT", "window").lower()
+    )
+    logger.info(f"Token budget of {budget} tokens per request"
+                + (f" ({', '.join(f'{c}: {t}' for c, t in context_budgets.items())})" if context_budgets else ""))
+    return token_budget
@@ -0,0 +1,103 @@
+"""
+Traces of /act traffic for offline replay.
+
+With ACT_TRACE=1 the servers record every /act request and reply, and every
+game end, as JSON lines through a ConversationLog writer (batched and
+compressed off the request path):
+
+    {"kind": "act", "t": <arrival time>, "request": "<body>", "deadline_ms": "30000",
+     "status": 200, "response": "<body>", "latency": 0.81}
+    {"kind": "end", "t": <arrival time>, "game_id": "g1_0123abcd"}
+
+Bodies are kept verbatim, so replay_trace.py sends exactly the bytes Forge
+sent, including malformed requests.
+"""
+
+import glob
+import gzip
+import io
+import json
+import os
+import time
+
+from conversation_log import ConversationLog
+
+class TraceRecorder:
+    """Records /act exchanges and game ends to a trace file"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    @property
+    def path(self):
+        return self.writer.path
+
+    def record_act(self, arrival, body, deadline_ms, status, response_body):
+        """Queue an /act exchange that arrived at time.time() arrival"""
+        self.writer.log({
+            "kind": "act",
+            "t": arrival,
+            "request": body.decode("utf-8", "replace") if isinstance(body, bytes) else body,
+            "deadline_ms": deadline_ms,
+            "status": status,
+            "response": response_body.decode("utf-8", "replace") if isinstance(response_body, bytes) else response_body,
+            "latency": time.time() - arrival
+        })
+
+    def record_end(self, arrival, game_id):
+        """Queue the end of a game"""
+        self.writer.log({"kind": "end", "t": arrival, "game_id": game_id})
+
+    def stats(self):
+        return self.writer.stats()
+
+    def close(self):
+        self.writer.close()
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(f"Reading {path} requires the zstandard package")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+def read_trace(patterns):
+    """
+    Read trace records from files or glob patterns, ordered by arrival time.
+
+    Prefork workers write one file each, so a deployment's trace is usually a
+    pattern such as logs/trace_20250101_120000_w*.jsonl.gz.
+    """
+    paths = sorted({path for pattern in patterns for path in (glob.glob(pattern) or [pattern])})
+    records = []
+    for path in paths:
+        with _open(path) as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        records.append(json.loads(line))
+            except (json.JSONDecodeError, EOFError, OSError):
+                # The last batch was cut short by a crash
+                pass
+    records.sort(key=lambda record: record["t"])
+    return records
+
+def create_trace_recorder(base_path):
+    """
+    Create the /act trace recorder configured by the environment, or None if disabled.
+
+        ACT_TRACE              record /act traffic for replay_trace.py (default 0)
+        ACT_TRACE_COMPRESSION  none, gzip or zstd (default gzip)
+        ACT_TRACE_MAX_BYTES    rotate after this many bytes (default 1 GB)
+    """
+    if os.getenv("ACT_TRACE", "0") == "0":
+        return None
+    return TraceRecorder(ConversationLog(
+        base_path,
+        compression=os.getenv("ACT_TRACE_COMPRESSION", "gzip").lower(),
+        max_bytes=int(os.getenv("ACT_TRACE_MAX_BYTES", 1024 * 1024 * 1024))
+    ))